@@ -1,147 +1,248 @@
 """
 Agent Definitions
 This module contains all agent definitions used in the newsletter automation workflow.
+
+Agents, their tools and the ADK/MCP modules behind them are built lazily, on
+first use (get_agent), so commands that only need some stages (or none, like
+--help or enqueueing a job) don't pay for the rest. The old module-level
+names (Data_Collection_Agent, ...) still work and build the agent on access.
 """
 
+import json
 import os
+import re
+import time
+from pathlib import Path
 
 # Load environment variables from .env file
 try:
     from dotenv import load_dotenv
     load_dotenv()
-    print("Loaded environment variables from .env file")
 except ImportError:
     pass
 
-# Try to get API key from environment
-if "GOOGLE_API_KEY" in os.environ and os.environ["GOOGLE_API_KEY"]:
-    print("Using GOOGLE_API_KEY from environment.")
-else:
-    print("Warning: GOOGLE_API_KEY not found.")
-    print("   Please set it in the .env file or as an environment variable.")
-
-# Import ADK components
-from google.adk.models.google_llm import Gemini
-from google.genai import types
-from google.adk.agents import Agent, SequentialAgent
-from google.adk.runners import InMemoryRunner
-from google.adk.tools import AgentTool, FunctionTool, google_search
-
-from google.adk.tools.mcp_tool.mcp_toolset import McpToolset
-from google.adk.tools.mcp_tool.mcp_session_manager import StdioConnectionParams
-from mcp import StdioServerParameters
-
-from google.adk.apps.app import App, ResumabilityConfig
-from pathlib import Path
-
 # Import prompts
 from prompts import (
     Data_Collection_Agent_Prompt,
+    Document_Insights_Agent_Prompt,
     Trend_Finding_Agent_Prompt,
     Content_Writing_Agent_Prompt,
-    Visual_Design_Agent_Prompt
+    Visual_Design_Agent_Prompt,
+    Section_Repair_Agent_Prompt
 )
 
-# Import tools
-from func_tools.html_reader_tools import read_html_tool, list_html_files_tool
-from func_tools.mcp_pdf_reader import mcp_pdf_reader_server
-from func_tools.newsletter_file_tools import (
-    write_file_tool,
-    check_content_file_tool,
-    read_content_file_tool
-)
+from func_tools.output_store import DEFAULT_OUTPUT_DIR, OUTPUT_DIR_KEY, atomic_write_text, get_output_store
+from orchestration.model_routing import agent_deadline, model_chain
+from orchestration.pipeline import MANIFEST_NAME, Stage, StagePipeline, format_report, run_agent
 
-# Import image gen tool if available
-try:
-    from func_tools.mcp_image_gen import mcp_image_gen_server
-    MCP_IMAGE_GEN_AVAILABLE = mcp_image_gen_server is not None
-except ImportError:
-    mcp_image_gen_server = None
-    MCP_IMAGE_GEN_AVAILABLE = False
-    print("Warning: mcp_image_gen not available - image generation will be described in text.")
+MODEL_NAME = "gemini-2.5-flash-lite"
 
-import warnings
-warnings.filterwarnings("ignore")
+# PDF reader backend for Data_Collection_Agent:
+#   "native" - in-process, page-streaming extraction (no subprocess, no cold start)
+#   "mcp"    - additionally expose the uvx pdf-reader-mcp server (OCR etc.)
+PDF_READER_BACKEND = os.environ.get("PDF_READER_BACKEND", "native").lower()
 
-print("ADK components imported successfully.")
+# Design stage of the pipeline:
+#   "template"     - render the structured content into a style sample template locally (no LLM)
+#   "template+llm" - render locally, then let Visual_Design_Agent make layout tweaks
+#   "llm"          - Visual_Design_Agent generates the whole HTML document
+DESIGN_MODES = ("template", "template+llm", "llm")
+DESIGN_MODE = os.environ.get("DESIGN_MODE", "template")
+# Part of the style sample path to render into (default: first template)
+NEWSLETTER_TEMPLATE = os.environ.get("NEWSLETTER_TEMPLATE", "")
 
-retry_config = types.HttpRetryOptions(
-    attempts=5,
-    exp_base=7,
-    initial_delay=1,
-    http_status_codes=[429, 500, 503, 504],
-)
+# Where the research stage gets external trends from:
+#   "search" - Trend_Finding_Agent (Google Search), shared through a snapshot cache with a TTL
+#   "file"   - a local trend report (TREND_FILE), for offline runs
+TREND_SOURCES = ("search", "file")
+TREND_SOURCE = os.environ.get("TREND_SOURCE", "search").lower()
 
-# Create Data_Collection_Agent
-Data_Collection_Agent = Agent(
-    name="DataCollectionAgent",
-    model=Gemini(
-        model="gemini-2.5-flash-lite",
-        retry_options=retry_config
-    ),
-    instruction=Data_Collection_Agent_Prompt,
-    tools=[mcp_pdf_reader_server],
-    output_key="internal_insights",
-)
-print("Data_Collection_Agent created.")
-
-# Create Trend_Finding_Agent
-Trend_Finding_Agent = Agent(
-    name="TrendFindingAgent",
-    model=Gemini(
-        model="gemini-2.5-flash-lite",
-        retry_options=retry_config
-    ),
-    instruction=Trend_Finding_Agent_Prompt,
-    tools=[google_search],
-    output_key="external_trends",
-)
-print("Trend_Finding_Agent created.")
+# Where the research stage gets internal product insights from:
+#   "documents" - each new or changed PDF is summarized once (Document_Insights_Agent) and the
+#                 summaries, kept in a manifest keyed by content hash, are merged locally
+#   "agent"     - Data_Collection_Agent searches and reads all of product_data on every run
+INSIGHTS_SOURCES = ("documents", "agent")
+INSIGHTS_SOURCE = os.environ.get("INSIGHTS_SOURCE", "documents").lower()
 
-# Create Sequential Research Team
-Sequential_Research_Team = SequentialAgent(
-    name="SequentialResearchTeam",
-    sub_agents=[Data_Collection_Agent, Trend_Finding_Agent],
-)
+# Session state keys written by the research agents (output_key)
+RESEARCH_KEYS = ["internal_insights", "external_trends"]
 
-# Create Content_Writing_Agent
-Content_Writing_Agent = Agent(
-    name="ContentWritingAgent",
-    model=Gemini(
-        model="gemini-2.5-flash-lite",
-        retry_options=retry_config
-    ),
-    instruction=Content_Writing_Agent_Prompt,
-    tools=[write_file_tool],  # Add write_file tool so it can save newsletter_content.txt
-    output_key="text_content",
-)
-print("Content_Writing_Agent created.")
-
-# Create Visual_Design_Agent
-
-visual_design_tools = [google_search, read_html_tool, list_html_files_tool]
-# Add file reading and writing tools to visual design tools
-visual_design_tools_with_file_read = visual_design_tools + [read_content_file_tool, write_file_tool]
-
-Visual_Design_Agent = Agent(
-    name="VisualDesignAgent",
-    model=Gemini(
-        model="gemini-2.5-flash-lite",  # Changed from gemini-2.0-flash-vision (not available)
-        retry_options=retry_config
-    ),
-    instruction=Visual_Design_Agent_Prompt,
-    tools=visual_design_tools_with_file_read,  # Includes file reading capability
-    output_key="final_design",
-)
 
-# Create Marketing_Coordinator_Agent (simplified - only coordinates content and design)
-Marketing_Coordinator_Agent = Agent(
-    name="marketing_coordinator",
-    model=Gemini(
-        model="gemini-2.5-flash-lite",
-        retry_options=retry_config
-    ),
-    instruction="""You are Marketing_Coordinator_Agent for Step 2: Content Generation.
+def check_environment():
+    """Report whether a Gemini API key is configured (for commands that call Gemini)."""
+    if "GOOGLE_API_KEY" in os.environ and os.environ["GOOGLE_API_KEY"]:
+        print("Using GOOGLE_API_KEY from environment.")
+    else:
+        print("Warning: GOOGLE_API_KEY not found.")
+        print("   Please set it in the .env file or as an environment variable.")
+
+
+def _model(agent: str):
+    """Gemini model of one agent (a name in AGENT_NAMES): its model chain and deadline (AGENT_MODELS, AGENT_DEADLINES)."""
+    from google.genai import types
+    from orchestration.models import ManagedGemini
+
+    # Retries happen in ManagedGemini (shared rate limiter + jittered backoff),
+    # so the HTTP client itself makes a single attempt.
+    retry_config = types.HttpRetryOptions(
+        attempts=1,
+    )
+    models = model_chain(agent, MODEL_NAME)
+    return ManagedGemini(model=models[0], fallback_models=models[1:], deadline_s=agent_deadline(agent),
+                         route=agent, retry_options=retry_config)
+
+
+def _primary_model(agent: str) -> str:
+    """The model an agent's output normally comes from (part of stage fingerprints)."""
+    return model_chain(agent, MODEL_NAME)[0]
+
+
+def _pdf_reader_tools():
+    from func_tools.pdf_cache import read_product_pdfs_tool, read_pdf_text_tool
+    from func_tools.pdf_text_reader import read_pdf_pages_tool
+    from func_tools.product_index import search_product_data_tool
+    from orchestration.llm_cache import get_llm_cache
+
+    # Retrieval over the indexed product_data comes first so the agent only sees relevant passages
+    tools = [search_product_data_tool, read_pdf_pages_tool, read_product_pdfs_tool, read_pdf_text_tool]
+    if PDF_READER_BACKEND == "mcp" and get_llm_cache().mode == "replay":
+        print("LLM cache replay mode: MCP PDF reader not started (offline run).")
+    elif PDF_READER_BACKEND == "mcp":
+        from func_tools.mcp_pdf_reader import mcp_pdf_reader_server
+        # Cached extraction first; the MCP server stays available as a fallback
+        tools.append(mcp_pdf_reader_server)
+    print(f"PDF reader backend: {PDF_READER_BACKEND}")
+    return tools
+
+
+def _build_data_collection():
+    from google.adk.agents import Agent
+
+    return Agent(
+        name="DataCollectionAgent",
+        model=_model("data_collection"),
+        instruction=Data_Collection_Agent_Prompt,
+        tools=_pdf_reader_tools(),
+        output_key=RESEARCH_KEYS[0],
+    )
+
+
+def _build_document_insights():
+    from google.adk.agents import Agent
+
+    # No tools: the document text is in the message (see orchestration/insights.py)
+    return Agent(
+        name="DocumentInsightsAgent",
+        model=_model("document_insights"),
+        instruction=Document_Insights_Agent_Prompt,
+        output_key="document_insights",
+    )
+
+
+def _build_insights_source():
+    from orchestration.insights import DOCUMENT_BUDGET_TOKENS, build_insights_source
+
+    # A summary changes with the prompt, the model and how much of the document it sees
+    return build_insights_source(
+        get_agent("document_insights"),
+        output_key=RESEARCH_KEYS[0],
+        fingerprint=f"{_primary_model('document_insights')}\n{Document_Insights_Agent_Prompt}\n{DOCUMENT_BUDGET_TOKENS}",
+    )
+
+
+def _build_trend_finding():
+    from google.adk.agents import Agent
+    from google.adk.tools import google_search
+    from orchestration.trends import TREND_TOPICS, format_topics
+
+    return Agent(
+        name="TrendFindingAgent",
+        model=_model("trend_finding"),
+        instruction=Trend_Finding_Agent_Prompt.format(topics=format_topics(TREND_TOPICS)),
+        tools=[google_search],
+        output_key=RESEARCH_KEYS[1],
+    )
+
+
+def _build_trend_source():
+    from orchestration.trends import build_trend_source
+
+    if TREND_SOURCE not in TREND_SOURCES:
+        raise ValueError(f"Unknown trend source {TREND_SOURCE!r}, expected one of {TREND_SOURCES}")
+    if TREND_SOURCE == "file":
+        # Trend_Finding_Agent is not even built
+        return build_trend_source(output_key=RESEARCH_KEYS[1])
+    # Trends are the same for every campaign: one search per topic list, prompt and model per TTL
+    return build_trend_source(
+        get_agent("trend_finding"),
+        output_key=RESEARCH_KEYS[1],
+        fingerprint=f"{_primary_model('trend_finding')}\n{Trend_Finding_Agent_Prompt}",
+    )
+
+
+def _build_parallel_research():
+    from orchestration.parallel_research import build_parallel_research_team
+
+    if INSIGHTS_SOURCE not in INSIGHTS_SOURCES:
+        raise ValueError(f"Unknown insights source {INSIGHTS_SOURCE!r}, expected one of {INSIGHTS_SOURCES}")
+    insights = get_agent("insights_source" if INSIGHTS_SOURCE == "documents" else "data_collection")
+    # The two research agents have independent inputs (PDFs vs. web search), so they
+    # run concurrently; each writes its own output_key and a <output_key>_status record.
+    return build_parallel_research_team(
+        [insights, get_agent("trend_source")],
+        name="ParallelResearchTeam",
+    )
+
+
+def _build_content_writing():
+    from google.adk.agents import Agent
+    from func_tools.template_renderer import save_newsletter_content_tool
+
+    return Agent(
+        name="ContentWritingAgent",
+        model=_model("content_writing"),
+        instruction=Content_Writing_Agent_Prompt,
+        tools=[save_newsletter_content_tool],  # Saves newsletter_content.json and newsletter_content.txt
+        output_key="text_content",
+    )
+
+
+def _build_visual_design():
+    from google.adk.agents import Agent
+    from google.adk.tools import google_search
+    from func_tools.html_reader_tools import read_html_tool, list_html_files_tool
+    from func_tools.newsletter_file_tools import read_content_file_tool, write_file_tool
+    from func_tools.style_digest import get_style_digests_tool
+    from func_tools.template_renderer import render_newsletter_tool
+
+    # Compact style digests first; raw template HTML only when a detail is missing
+    visual_design_tools = [google_search, render_newsletter_tool, get_style_digests_tool, read_html_tool, list_html_files_tool]
+    # Add file reading and writing tools to visual design tools
+    visual_design_tools_with_file_read = visual_design_tools + [read_content_file_tool, write_file_tool]
+
+    return Agent(
+        name="VisualDesignAgent",
+        model=_model("visual_design"),  # gemini-2.0-flash-vision is not available
+        instruction=Visual_Design_Agent_Prompt,
+        tools=visual_design_tools_with_file_read,  # Includes file reading capability
+        output_key="final_design",
+    )
+
+
+def _build_section_repair():
+    from google.adk.agents import Agent
+
+    # No tools: it only rewrites the one section it is given (see orchestration/html_repair.py)
+    return Agent(
+        name="SectionRepairAgent",
+        model=_model("section_repair"),
+        instruction=Section_Repair_Agent_Prompt,
+        output_key="repaired_section",
+    )
+
+
+# Marketing_Coordinator_Agent (simplified - only coordinates content and design)
+MARKETING_COORDINATOR_INSTRUCTION = """You are Marketing_Coordinator_Agent for Step 2: Content Generation.
 
     CRITICAL - Check file existence first:
     1. FIRST: Call the check_newsletter_content_exists tool to check if ./output/newsletter_content.txt exists
@@ -149,9 +250,9 @@ Marketing_Coordinator_Agent = Agent(
     Based on the file check result:
     
     IF ./output/newsletter_content.txt DOES NOT EXIST:
-        Run all agents sequentially:
-        1. Call Sequential_Research_Team to get both internal product insights (from Data_Collection_Agent) and external trends (from Trend_Finding_Agent)
-        2. Call ContentWritingAgent that uses the output from Sequential_Research_Team to write the newsletter content
+        Run all agents in order:
+        1. Call ParallelResearchTeam to get both internal product insights (from Data_Collection_Agent) and external trends (from Trend_Finding_Agent) - both run concurrently
+        2. Call ContentWritingAgent that uses the output from ParallelResearchTeam to write the newsletter content
         3. Call VisualDesignAgent that uses the output from ContentWritingAgent to create the newsletter HTML
     
     IF ./output/newsletter_content.txt EXISTS:
@@ -162,68 +263,642 @@ Marketing_Coordinator_Agent = Agent(
     - Do NOT describe what you will do - just check the file and call the appropriate agents immediately
     - Always check the file first before deciding which agents to call
     - The VisualDesignAgent can read from ./output/newsletter_content.txt if it exists
-    - Use Sequential_Research_Team instead of calling Data_Collection_Agent and Trend_Finding_Agent separately
-
-    """,
-    tools=[
-        check_content_file_tool,
-        AgentTool(agent=Sequential_Research_Team),
-        AgentTool(agent=Content_Writing_Agent),
-        AgentTool(agent=Visual_Design_Agent),
-    ],
-)
+    - Use ParallelResearchTeam instead of calling Data_Collection_Agent and Trend_Finding_Agent separately
+    - If one research branch reports "[... unavailable: ...]", continue with the research that did succeed
+
+    """
+
+
+def _build_marketing_coordinator():
+    from google.adk.agents import Agent
+    from google.adk.tools import AgentTool
+    from func_tools.newsletter_file_tools import check_content_file_tool
+
+    return Agent(
+        name="marketing_coordinator",
+        model=_model("marketing_coordinator"),
+        instruction=MARKETING_COORDINATOR_INSTRUCTION,
+        tools=[
+            check_content_file_tool,
+            AgentTool(agent=get_agent("parallel_research")),
+            AgentTool(agent=get_agent("content_writing")),
+            AgentTool(agent=get_agent("visual_design")),
+        ],
+    )
+
+
+_AGENT_BUILDERS = {
+    "data_collection": _build_data_collection,
+    "document_insights": _build_document_insights,
+    "insights_source": _build_insights_source,
+    "trend_finding": _build_trend_finding,
+    "trend_source": _build_trend_source,
+    "parallel_research": _build_parallel_research,
+    "content_writing": _build_content_writing,
+    "visual_design": _build_visual_design,
+    "section_repair": _build_section_repair,
+    "marketing_coordinator": _build_marketing_coordinator,
+}
+AGENT_NAMES = tuple(_AGENT_BUILDERS)
+# Module attribute names used before agents were built lazily
+_LEGACY_NAMES = {
+    "Data_Collection_Agent": "data_collection",
+    "Trend_Finding_Agent": "trend_finding",
+    "Parallel_Research_Team": "parallel_research",
+    "Content_Writing_Agent": "content_writing",
+    "Visual_Design_Agent": "visual_design",
+    "Marketing_Coordinator_Agent": "marketing_coordinator",
+}
+
+_agents = {}
+
+
+def get_agent(name: str):
+    """Return the process-wide agent `name` (one of AGENT_NAMES), building it on first use."""
+    agent = _agents.get(name)
+    if agent is None:
+        started = time.perf_counter()
+        agent = _agents[name] = _AGENT_BUILDERS[name]()
+        print(f"{agent.name} created in {time.perf_counter() - started:.2f}s.")
+    return agent
+
+
+def built_agents() -> list:
+    """Agents constructed so far in this process."""
+    return list(_agents.values())
+
+
+def __getattr__(name):
+    if name in _LEGACY_NAMES:
+        return get_agent(_LEGACY_NAMES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _mtime_ns(path):
+    return path.stat().st_mtime_ns if path.exists() else None
+
+
+def _extract_html(text):
+    """Return the <html>...</html> document from an agent reply, or None."""
+    match = re.search(r"<!DOCTYPE html.*?</html>|<html.*?</html>", text or "", re.S | re.I)
+    return match.group(0) if match else None
+
+
+async def regenerate_section(message: str) -> str:
+    """Have Section_Repair_Agent rewrite one failing newsletter section (see orchestration/html_repair.py)."""
+    state = await run_agent(get_agent("section_repair"), message)
+    return state.get("repaired_section", "")
+
+
+def build_stage_pipeline(output_dir=DEFAULT_OUTPUT_DIR, product_data_dir="./product_data",
+                         style_samples_dir="./style_samples", audience="",
+                         design_mode=None, template=None, research_path=None, brief=""):
+    """Build the deterministic research -> content -> design stage pipeline.
+
+    Each stage is skipped when its inputs (PDFs, prompts, style samples and
+    upstream outputs) are unchanged since its last successful run, so no
+    coordinator LLM call is needed to decide what to rerun. All paths the
+    agents are told to read or write come from the arguments, and the tools
+    resolve ./output through the session state (OUTPUT_DIR_KEY), so
+    pipelines with different output_dirs can run side by side. All outputs
+    are written atomically through the run's OutputStore.
+
+    The content stage produces structured content (newsletter_content.json);
+    by default the design stage renders it into a style sample template
+    locally, so design-only reruns take milliseconds (see DESIGN_MODE).
 
-# Define a runner
-runner = InMemoryRunner(agent=Marketing_Coordinator_Agent)
+    With research_path, the pipeline has no research stage of its own and
+    writes content from that (shared) research.json instead; brief is an
+    extra instruction for the content, e.g. the angle of an A/B variant.
+    """
+    from func_tools.html_postprocess import HTML_BYTE_BUDGET, POSTPROCESS_VERSION, postprocess_newsletter
+    from func_tools.html_postprocess import format_report as format_postprocess_report
+    from func_tools.html_validator import VALIDATOR_VERSION
+    from func_tools.image_optimizer import IMAGE_JPEG_QUALITY, IMAGE_MAX_WIDTH
+    from func_tools.template_renderer import (
+        RENDERER_VERSION,
+        parse_content,
+        render_newsletter,
+        select_template,
+        write_content
+    )
+    from orchestration.context_budget import compact_text, estimate_tokens, get_context_budget
+    from orchestration.html_repair import HTML_REPAIR_ROUNDS, repair_newsletter
+    from orchestration.html_repair import format_report as format_validation_report
+    from orchestration.insights import DOCUMENT_BUDGET_TOKENS, INSIGHTS_BUDGET_TOKENS, PRODUCT_DATA_KEY, insights_info_key
+    from orchestration.instrumentation import get_instrumentation, run_label, usage_delta
+    from orchestration.parallel_research import branch_status_key
+    from orchestration.sessions import run_agent_resumable
+    from orchestration.trends import TREND_CACHE_TTL, TREND_FILE, TREND_TOPICS, trend_info_key
+
+    design_mode = design_mode or DESIGN_MODE
+    if design_mode not in DESIGN_MODES:
+        raise ValueError(f"Unknown design mode {design_mode!r}, expected one of {DESIGN_MODES}")
+    template = NEWSLETTER_TEMPLATE if template is None else template
+    store = get_output_store(output_dir)
+    output_dir = store.root
+    shared_research = research_path is not None
+    research_path = Path(research_path) if shared_research else output_dir / "research.json"
+    content_path = output_dir / "newsletter_content.txt"
+    content_json_path = output_dir / "newsletter_content.json"
+    html_path = output_dir / "newsletter.html"
+
+    # Each research text gets a third of ContentWritingAgent's budget; the rest is prompt, tool calls and reply
+    research_budget = get_context_budget().budget_for("ContentWritingAgent") // 3
+
+    def run_key(stage, context):
+        # Same stage + same inputs -> an interrupted run is resumed, not restarted
+        return f"{output_dir}:{stage}:{context['stage_fingerprint'][:16]}"
+
+    async def run_research(context):
+        instrumentation = get_instrumentation()
+        usage_before = instrumentation.usage(run=run_label.get())
+        started = time.perf_counter()
+        state = await run_agent_resumable(
+            get_agent("parallel_research"),
+            f"Research the product materials in {product_data_dir} (pass directory=\"{product_data_dir}\" "
+            "to the product data tools) and the latest industry trends for the newsletter.",
+            state={OUTPUT_DIR_KEY: str(output_dir), PRODUCT_DATA_KEY: str(product_data_dir)},
+            run_key=run_key("research", context)
+        )
+        research = {key: state.get(key, "") for key in RESEARCH_KEYS}
+        research["branches"] = {key: state.get(branch_status_key(key)) for key in RESEARCH_KEYS}
+        insights = state.get(insights_info_key(RESEARCH_KEYS[0]))
+        if insights:
+            # Documents summarized this run vs. reused from the manifest (and dropped since the last research)
+            try:
+                previous = json.loads(research_path.read_text(encoding="utf-8")).get("insights") or {}
+            except (OSError, ValueError):
+                previous = {}
+            insights["removed"] = sorted(set(previous.get("names", [])) - set(insights["names"]))
+            research["insights"] = insights
+            print(f"Product insights: {insights['documents']} documents, {insights['summarized']} summarized, "
+                  f"{insights['reused']} reused, {len(insights['removed'])} removed, {len(insights['failed'])} failed")
+        # Search, shared snapshot (and its age) or local file
+        research["trends"] = state.get(trend_info_key(RESEARCH_KEYS[1]))
+        # What one research pass costs, for comparisons when it is shared (variant runs)
+        research["usage"] = {
+            **usage_delta(instrumentation.usage(run=run_label.get()), usage_before),
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+        store.write_text(research_path, json.dumps(research, indent=2))
+        context["research"] = research
+        # A failed branch still lets content proceed, but the stage is retried next run
+        return all((b or {}).get("status") == "ok" for b in research["branches"].values())
+
+    async def run_content(context):
+        research = json.loads(research_path.read_text(encoding="utf-8"))
+        # Selling points and metrics of the research, within ContentWritingAgent's context budget
+        upstream = {}
+        for key in RESEARCH_KEYS:
+            upstream[key] = compact_text(research[key], research_budget) if research_budget else research[key]
+            if upstream[key] != research[key]:
+                print(f"{key} for ContentWritingAgent: {estimate_tokens(research[key])} -> "
+                      f"{estimate_tokens(upstream[key])} tokens")
+        before = _mtime_ns(content_json_path)
+        state = await run_agent_resumable(
+            get_agent("content_writing"),
+            "Write the newsletter content from this research.\n\n"
+            + (f"Target audience: {audience}\n\n" if audience else "")
+            + (f"Variant brief: {brief}\n\n" if brief else "") +
+            f"internal_insights:\n{upstream['internal_insights']}\n\n"
+            f"external_trends:\n{upstream['external_trends']}\n\n"
+            "Save it with the save_newsletter_content tool.",
+            state={OUTPUT_DIR_KEY: str(output_dir), **{key: research[key] for key in RESEARCH_KEYS}},
+            run_key=run_key("content", context)
+        )
+        if _mtime_ns(content_json_path) == before:
+            # The agent replied without saving: take the structured content from its reply
+            write_content(parse_content(state.get("text_content", "")), store=store)
+
+    async def finish_design(html_path):
+        # Validate (LLM designs: regenerate failing sections), then inline CSS, optimize images
+        # and minify, so the email stays under Gmail's clipping size
+        if not html_path.exists():
+            return
+        llm_design = design_mode != "template"
+        validation = await repair_newsletter(html_path, regenerate_section if llm_design else None)
+        print(format_validation_report(validation))
+        search_dirs = [Path(style_samples_dir)]
+        try:
+            search_dirs.append(select_template(style_samples_dir, template).parent)
+        except FileNotFoundError:
+            pass
+        report = postprocess_newsletter(html_path, search_dirs=search_dirs, extra={"validation": validation})
+        print(format_postprocess_report(report))
+        if llm_design and not validation["valid"]:
+            raise RuntimeError(
+                f"{html_path.name} still fails validation after {len(validation['rounds'])} repair rounds "
+                f"(HTML_REPAIR_ROUNDS); see {report['report_path']}"
+            )
+        if not report["within_budget"]:
+            raise RuntimeError(
+                f"{html_path.name} is {report['html_bytes']} bytes after post-processing, over the "
+                f"{report['budget']} byte budget (HTML_BYTE_BUDGET); see {report['report_path']}"
+            )
+
+    async def run_design(context):
+        content = content_path.read_text(encoding="utf-8")
+        if design_mode != "llm":
+            template_path = select_template(style_samples_dir, template)
+            structured = json.loads(content_json_path.read_text(encoding="utf-8"))
+            result = render_newsletter(structured, template_path, html_path)
+            if not result["success"]:
+                raise RuntimeError(f"Rendering {template_path} failed: {result['error']}")
+            if design_mode == "template":
+                await finish_design(html_path)
+                return
+            content = (
+                f"{content}\n\nIt has already been rendered into the style sample {template_path} "
+                f"and saved to {html_path}:\n\n{html_path.read_text(encoding='utf-8')}\n\n"
+                "Only make layout tweaks that are really needed; if none are, reply with the HTML unchanged."
+            )
+        before = _mtime_ns(html_path)
+        state = await run_agent_resumable(
+            get_agent("visual_design"),
+            "Create the HTML newsletter for this content (already read for you, "
+            "no need to call read_newsletter_content).\n\n"
+            f"{content}\n\n"
+            f"Style samples are in {style_samples_dir} (pass directory=\"{style_samples_dir}\" "
+            "to get_style_digests). "
+            f"Save the HTML with the write_file tool to {html_path}",
+            state={OUTPUT_DIR_KEY: str(output_dir), "text_content": content},
+            run_key=run_key("design", context)
+        )
+        html = _extract_html(state.get("final_design"))
+        if _mtime_ns(html_path) == before and html:
+            store.write_text(html_path, html)
+        await finish_design(html_path)
+
+    design_inputs = {
+        "style_samples": Path(style_samples_dir),
+        "design_mode": design_mode,
+        "validator": VALIDATOR_VERSION,
+        "postprocess": POSTPROCESS_VERSION,
+        "html_byte_budget": HTML_BYTE_BUDGET,
+        "images": f"{IMAGE_MAX_WIDTH}:{IMAGE_JPEG_QUALITY}",
+    }
+    if design_mode != "llm":
+        design_inputs.update(template=template, renderer=RENDERER_VERSION)
+    if design_mode != "template":
+        design_inputs.update(visual_design_prompt=Visual_Design_Agent_Prompt, model=_primary_model("visual_design"),
+                             section_repair_prompt=Section_Repair_Agent_Prompt, html_repair_rounds=HTML_REPAIR_ROUNDS)
+
+    content_inputs = {
+        "audience": audience,
+        "content_writing_prompt": Content_Writing_Agent_Prompt,
+        "model": _primary_model("content_writing"),
+        "research_budget": research_budget,
+    }
+    if brief:
+        content_inputs["brief"] = brief
+    if shared_research:
+        content_inputs["research"] = research_path
+
+    insights_agent = "document_insights" if INSIGHTS_SOURCE == "documents" else "data_collection"
+    research_inputs = {
+        # Any PDF change reruns research, but with the "documents" source only changed PDFs are summarized
+        "product_data": Path(product_data_dir),
+        "insights_source": INSIGHTS_SOURCE,
+        "trend_source": TREND_SOURCE,
+        "model": ",".join(dict.fromkeys(_primary_model(a) for a in (insights_agent, "trend_finding"))),
+    }
+    if INSIGHTS_SOURCE == "documents":
+        research_inputs.update(document_insights_prompt=Document_Insights_Agent_Prompt,
+                               insights_budget=f"{DOCUMENT_BUDGET_TOKENS}:{INSIGHTS_BUDGET_TOKENS}")
+    else:
+        research_inputs["data_collection_prompt"] = Data_Collection_Agent_Prompt
+    if TREND_SOURCE == "file":
+        research_inputs["trend_file"] = Path(TREND_FILE)
+    else:
+        research_inputs.update(trend_finding_prompt=Trend_Finding_Agent_Prompt, trend_topics=TREND_TOPICS)
+        if TREND_CACHE_TTL > 0:
+            # Searched trends go stale: research reruns (and refetches them) once per TTL window
+            research_inputs["trend_window"] = int(time.time() // TREND_CACHE_TTL)
+
+    stages = [
+        Stage(
+            "research",
+            run_research,
+            inputs=research_inputs,
+            outputs=[research_path],
+        ),
+        Stage(
+            "content",
+            run_content,
+            inputs=content_inputs,
+            outputs=[content_path, content_json_path],
+            deps=[] if shared_research else ["research"],
+        ),
+        Stage(
+            "design",
+            run_design,
+            inputs=design_inputs,
+            outputs=[html_path],
+            deps=["content"],
+        ),
+    ]
+    if shared_research:
+        stages = stages[1:]
+    return StagePipeline(stages, manifest_path=output_dir / MANIFEST_NAME)
+
+
+def print_output_files(output_dir=DEFAULT_OUTPUT_DIR):
+    output_dir = Path(output_dir)
+    if output_dir.exists():
+        files = list(output_dir.glob("*"))
+        print(f"\nFiles in output directory: {len(files)}")
+        for f in files:
+            print(f"  - {f.name} ({f.stat().st_size} bytes)")
+    else:
+        print("\nOutput directory does not exist!")
+
+
+async def run_coordinator(output_dir=DEFAULT_OUTPUT_DIR):
+    """Run the LLM-driven Marketing_Coordinator_Agent workflow.
+
+    The session is durable: if a previous coordinator run was interrupted,
+    it resumes from the last completed agent with internal_insights,
+    external_trends and text_content restored from session state.
+    """
+    from orchestration.parallel_research import branch_status_key, format_branch_timings
+    from orchestration.sessions import run_agent_resumable
+
+    state = await run_agent_resumable(
+        get_agent("marketing_coordinator"),
+        "Generate a newsletter HTML file. Show me the intermediate steps.",
+        # AgentTool sub-agents get a copy of this state, so their tools write here too
+        state={OUTPUT_DIR_KEY: str(get_output_store(output_dir).root)},
+        run_key=f"{get_output_store(output_dir).root}:coordinator"
+    )
+
+    print("\n" + "="*60)
+    print("Agent Execution Completed")
+    print("="*60)
+
+    # Report per-branch timing of the parallel research stage (if it ran)
+    if any(branch_status_key(k) in state for k in RESEARCH_KEYS):
+        print("\nResearch branch timings:")
+        print(format_branch_timings(state, RESEARCH_KEYS))
+
+    for key in RESEARCH_KEYS + ["text_content", "final_design"]:
+        value = state.get(key)
+        if value:
+            print(f"\n{key} (first 500 chars):\n{str(value)[:500]}...")
+
+    html_path = get_output_store(output_dir).path("newsletter.html")
+    if html_path.exists():
+        from func_tools.html_postprocess import format_report, postprocess_newsletter
+        from orchestration.html_repair import format_report as format_validation_report
+        from orchestration.html_repair import repair_newsletter
+        validation = await repair_newsletter(html_path, regenerate_section)
+        print("\n" + format_validation_report(validation))
+        report = postprocess_newsletter(html_path, search_dirs=["./style_samples"], extra={"validation": validation})
+        print(format_report(report))
+        if not validation["valid"]:
+            print(f"Warning: {html_path.name} still fails validation; see {report['report_path']}")
+        if not report["within_budget"]:
+            print(f"Warning: {html_path.name} is over the HTML byte budget; see {report['report_path']}")
+    return state
+
+
+async def run_pipeline(force=(), only=None, output_dir=DEFAULT_OUTPUT_DIR):
+    """Run the stage pipeline, skipping stages whose inputs are unchanged."""
+    pipeline = build_stage_pipeline(output_dir=output_dir)
+    report = await pipeline.run(force=force, only=only)
+
+    print("\n" + "="*60)
+    print("Pipeline Completed")
+    print("="*60)
+    print(format_report(report))
+
+    research_path = Path(output_dir) / "research.json"
+    if report.get("research", {}).get("status") == "ran" and research_path.exists():
+        from orchestration.parallel_research import branch_status_key, format_branch_timings
+
+        research = json.loads(research_path.read_text(encoding="utf-8"))
+        print("\nResearch branch timings:")
+        print(format_branch_timings(
+            {branch_status_key(k): v for k, v in research["branches"].items()}, RESEARCH_KEYS
+        ))
+    return report
+
+
+async def run_campaign(job):
+    """Run the stage pipeline for one campaign job (batch manifest or service queue).
+
+    Returns:
+        dict: {stage name: status}
+    """
+    pipeline = build_stage_pipeline(
+        output_dir=job["output_dir"],
+        product_data_dir=job["product_data_dir"],
+        style_samples_dir=job["style_samples_dir"],
+        audience=job["audience"],
+        template=job["template"],
+    )
+    report = await pipeline.run()
+    return {name: result["status"] for name, result in report.items()}
+
+
+async def run_batch_from_manifest(manifest_path, concurrency=None, report_path=None):
+    """Generate one newsletter per campaign in a batch manifest.
+
+    Jobs run concurrently (bounded by concurrency) and share the agent
+    definitions, model clients and tool state (PDF cache, product index)
+    of this process. Each job writes only to its own output_dir.
+    """
+    from orchestration.batch import format_batch_report, load_manifest, run_batch
+
+    manifest = load_manifest(manifest_path)
+    concurrency = concurrency or manifest["concurrency"]
+
+    report = await run_batch(manifest["jobs"], run_campaign, concurrency=concurrency)
 
-async def main():
+    print("\n" + "="*60)
+    print("Batch Completed")
+    print("="*60)
+    print(format_batch_report(report))
+    if report_path:
+        atomic_write_text(report_path, json.dumps(report, indent=2))
+    return report
+
+
+async def run_variants(count, templates=(), concurrency=None, output_dir=DEFAULT_OUTPUT_DIR):
+    """Generate `count` A/B variants from a single research pass.
+
+    Research runs (or is reused, if up to date) once in output_dir; then
+    Content_Writing_Agent and the design stage are fanned out concurrently
+    against the shared research.json, each variant with its own brief,
+    template and output directory (output_dir/variants/variant-N).
+    """
+    from orchestration.batch import run_batch
+    from orchestration.instrumentation import get_instrumentation, run_label
+    from orchestration.variants import build_variant_jobs, compare_variant_runs, format_variant_report
+
+    output_dir = Path(output_dir)
+    research_path = output_dir / "research.json"
+    run_label.set("research")
+    research_report = await build_stage_pipeline(output_dir=output_dir).run(only={"research"})
+    research = json.loads(research_path.read_text(encoding="utf-8"))
+    research_usage = research.get("usage") or {
+        "model_calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0, "seconds": 0.0
+    }
+
+    jobs = build_variant_jobs(count, output_dir, templates=templates)
+
+    async def run_job(job):
+        pipeline = build_stage_pipeline(
+            output_dir=job["output_dir"],
+            template=job["template"],
+            research_path=research_path,
+            brief=job["brief"],
+        )
+        await pipeline.run()
+
+    report = await run_batch(jobs, run_job, concurrency=concurrency or count)
+    instrumentation = get_instrumentation()
+    variant_usage = {job["name"]: instrumentation.usage(run=job["name"]) for job in jobs}
+    comparison = compare_variant_runs(research_usage, report, variant_usage,
+                                      research_skipped=research_report["research"]["status"] == "skipped")
+
+    print("\n" + "="*60)
+    print("Variants Completed")
+    print("="*60)
+    print(f"Research: {research_report['research']['status']} "
+          f"({research_usage['model_calls']} model calls, ${research_usage['cost_usd']:.4f} per pass)")
+    print(format_variant_report(jobs, report, variant_usage, comparison))
+    return {"research": research_report, "batch": report, "usage": variant_usage, "comparison": comparison}
+
+
+async def warm_up(product_data_dir="./product_data", style_samples_dir="./style_samples"):
+    """Load everything a job would otherwise pay for on first use.
+
+    Builds the pipeline agents, the product index (PDF text cache), the
+    style digests and the HTML listing, and starts the MCP servers of the
+    agents' toolsets (every process of an McpSessionPool).
+    """
+    import asyncio
+
+    from google.adk.tools.base_toolset import BaseToolset
+    from func_tools.html_reader_tools import html_file_index
+    from func_tools.product_index import product_index
+    from func_tools.style_digest import style_digest_index
+
+    started = time.perf_counter()
+    timings = {}
+    agents = [get_agent(name) for name in ("parallel_research", "content_writing", "visual_design")]
+    timings["agents"] = round(time.perf_counter() - started, 3)
+    for name, warm in (
+        ("product_index", lambda: product_index.refresh(product_data_dir)),
+        ("style_digests", lambda: style_digest_index.refresh(style_samples_dir)),
+        ("html_index", lambda: html_file_index.list_files(Path(style_samples_dir))),
+    ):
+        step_started = time.perf_counter()
+        try:
+            warm()
+        except OSError as e:
+            print(f"Warm-up of {name} skipped: {e}")
+        timings[name] = round(time.perf_counter() - step_started, 3)
+
+    toolsets = {
+        id(tool): tool
+        for agent in agents + [get_agent("data_collection")]
+        for tool in getattr(agent, "tools", [])
+        if isinstance(tool, BaseToolset)
+    }
+    if toolsets:
+        step_started = time.perf_counter()
+        await asyncio.gather(*(toolset.get_tools() for toolset in toolsets.values()))
+        timings["mcp_toolsets"] = round(time.perf_counter() - step_started, 3)
+    timings["total"] = round(time.perf_counter() - started, 3)
+    return timings
+
+
+async def run_service(workers=None, host=None, port=None, drain=False):
+    """Serve queued campaign jobs with warm agents, model clients and tool caches."""
+    from orchestration.service import DEFAULT_WORKERS, SERVICE_HOST, NewsletterService
+
+    timings = await warm_up()
+    print("Warm-up: " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items()))
+    service = NewsletterService(run_campaign, workers=workers or DEFAULT_WORKERS)
+    try:
+        await service.serve(host=host or SERVICE_HOST, port=port, drain=drain)
+    finally:
+        print("\n" + service.format_metrics())
+    return service.metrics()
+
+
+def enqueue_jobs(path):
+    """Add the job(s) in a JSON file (one campaign object or a list) to the service queue."""
+    from orchestration.service import JobQueue
+
+    path = Path(path)
+    specs = json.loads(path.read_text(encoding="utf-8"))
+    queue = JobQueue()
+    for spec in specs if isinstance(specs, list) else [specs]:
+        job = queue.enqueue(spec, base_dir=path.parent)
+        print(f"Enqueued job {job['id']} ({job['name']}) -> {job['output_dir']}")
+
+
+def print_run_stats():
+    """Cache, limiter, MCP pool and instrumentation stats of this process."""
+    from func_tools.html_reader_tools import html_file_index
+    from func_tools.image_optimizer import image_optimizer
+    from func_tools.pdf_cache import pdf_text_cache
+    from orchestration.context_budget import get_context_budget
+    from orchestration.instrumentation import get_instrumentation
+    from orchestration.llm_cache import get_llm_cache
+    from orchestration.model_routing import get_latency_tracker
+    from orchestration.rate_limit import get_rate_limiter
+
+    print(f"\n{pdf_text_cache.format_stats()}")
+    print(html_file_index.format_stats())
+    print(get_rate_limiter().format_stats())
+    if image_optimizer.stats["images"]:
+        print(image_optimizer.format_stats())
+    for agent in built_agents():
+        for tool in getattr(agent, "tools", []):
+            if hasattr(tool, "format_stats"):
+                print(tool.format_stats())
+    if get_llm_cache().enabled:
+        print(get_llm_cache().format_stats())
+    if "trend_source" in _agents and TREND_SOURCE == "search":
+        from orchestration.trends import get_trend_cache
+        print(get_trend_cache().format_stats())
+    if "insights_source" in _agents:
+        from orchestration.insights import get_insights_manifest
+        print(get_insights_manifest().format_stats())
+    if get_latency_tracker().stats["requests"]:
+        print(get_latency_tracker().format_stats())
+    if get_context_budget().stats:
+        print(f"\n{get_context_budget().format_stats()}")
+    print(f"\n{get_instrumentation().format_summary()}")
+
+
+async def main(force=(), use_coordinator=False, batch_manifest=None, concurrency=None,
+               variants=None, templates=(), output_dir=DEFAULT_OUTPUT_DIR, only=None):
     """Main async function to run the agent."""
     print("\n" + "="*60)
     print("Starting Newsletter Generation Workflow")
     print("="*60 + "\n")
-    
+
     try:
-        response = await runner.run_debug(
-            "Generate a newsletter HTML file. Show me the intermediate steps."
-        )
-        
-        print("\n" + "="*60)
-        print("Agent Execution Completed")
-        print("="*60)
-        
-        # Log the response
-        if response:
-            print(f"\nResponse type: {type(response)}")
-            if hasattr(response, 'content'):
-                print(f"Response has content: {response.content is not None}")
-                if hasattr(response.content, 'parts'):
-                    print(f"Number of parts: {len(response.content.parts) if response.content.parts else 0}")
-                    for i, part in enumerate(response.content.parts if response.content.parts else []):
-                        print(f"\nPart {i+1}:")
-                        if hasattr(part, 'text') and part.text:
-                            print(f"  Text (first 500 chars): {part.text[:500]}...")
-                        if hasattr(part, 'function_call'):
-                            print(f"  Function call: {part.function_call}")
-            
-            # Try to get text content
-            try:
-                if hasattr(response, 'text'):
-                    print(f"\nResponse text (first 1000 chars):\n{response.text[:1000]}...")
-            except Exception as e:
-                print(f"Could not extract text: {e}")
-        
-        # Check output directory
-        output_dir = Path("./output")
-        if output_dir.exists():
-            files = list(output_dir.glob("*"))
-            print(f"\nFiles in output directory: {len(files)}")
-            for f in files:
-                print(f"  - {f.name} ({f.stat().st_size} bytes)")
+        if batch_manifest:
+            result = await run_batch_from_manifest(batch_manifest, concurrency=concurrency)
+        elif variants:
+            result = await run_variants(variants, templates=templates, concurrency=concurrency,
+                                        output_dir=output_dir)
+        elif use_coordinator:
+            result = await run_coordinator(output_dir=output_dir)
         else:
-            print("\nOutput directory does not exist!")
-        
-        return response
-        
+            result = await run_pipeline(force=force, only=only, output_dir=output_dir)
+
+        print_run_stats()
+        if not batch_manifest and not variants:
+            print_output_files(output_dir)
+        return result
+
     except Exception as e:
         print(f"\nError during agent execution: {e}")
         import traceback
@@ -231,17 +906,9 @@ async def main():
         raise
 
 if __name__ == "__main__":
-    import asyncio
-    import logging
-    
-    # Set up logging for more verbose output
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    
-    # Enable verbose logging for ADK
-    logger = logging.getLogger('google.adk')
-    logger.setLevel(logging.DEBUG)
-    
-    asyncio.run(main())
\ No newline at end of file
+    # Old-style flags (python agent.py --batch ...) map onto the subcommands in cli.py
+    import sys
+
+    from cli import main as cli_main
+
+    sys.exit(cli_main(sys.argv[1:], legacy=True))
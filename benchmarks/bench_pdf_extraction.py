@@ -0,0 +1,200 @@
+# bench_pdf_extraction.py
+# Benchmark: in-process page-streaming PDF extraction vs. the uvx pdf-reader-mcp server
+#
+# Usage:
+#   python benchmarks/bench_pdf_extraction.py --pages 300 --copies 4 --json bench_output.json
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import ContentStream, DictionaryObject, NameObject
+
+from func_tools.pdf_text_reader import (
+    DEFAULT_MAX_WORKERS,
+    extract_pdf_pages,
+    extract_pdfs_parallel,
+    iter_pdf_pages
+)
+
+SOURCE_PDF = Path(__file__).resolve().parent.parent / "product_data" / "Mock_Product_Data.pdf"
+
+
+# Lines of text per generated page; a dense manual page holds a few KB of text
+LINES_PER_PAGE = 70
+
+
+def _pdf_string(text: str) -> str:
+    return "(" + text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ")"
+
+
+def build_large_pdf(target: Path, pages: int) -> Path:
+    """Write a PDF with `pages` text-dense pages made from the mock product data.
+
+    Every page has its own content stream (the lines of the mock product
+    text, cycled, tagged with the page number), so the extracted text grows
+    with the page count like a real manual's instead of being one shared page.
+    """
+    lines = [line.strip() for page in PdfReader(str(SOURCE_PDF)).pages
+             for line in (page.extract_text() or "").splitlines() if line.strip()]
+    writer = PdfWriter()
+    # One font for the whole document, inherited from the page tree like a real manual's
+    # shared resources (a copy on every page would make each page dictionary heavier)
+    writer.root_object["/Pages"].get_object()[NameObject("/Resources")] = DictionaryObject({
+        NameObject("/Font"): DictionaryObject({NameObject("/F1"): DictionaryObject({
+            NameObject("/Type"): NameObject("/Font"),
+            NameObject("/Subtype"): NameObject("/Type1"),
+            NameObject("/BaseFont"): NameObject("/Helvetica"),
+        })}),
+    })
+    for page_number in range(pages):
+        page = writer.add_blank_page(612, 792)
+        page.pop(NameObject("/Resources"), None)
+        ops = ["BT /F1 7 Tf 24 776 Td 10.5 TL"]
+        for i in range(LINES_PER_PAGE):
+            line = lines[(page_number * LINES_PER_PAGE + i) % len(lines)]
+            ops.append(f"{_pdf_string(f'[p{page_number + 1}] {line}'[:160])} '")
+        ops.append("ET")
+        contents = ContentStream(None, writer)
+        contents.set_data("\n".join(ops).encode("latin-1", "replace"))
+        page.replace_contents(contents)
+    with open(target, "wb") as f:
+        writer.write(f)
+    return target
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def peak_memory_mb(fn) -> float:
+    """Run fn under tracemalloc and return its peak allocation in MB."""
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1e6, 2)
+
+
+def consume_stream(pdf_path: Path) -> None:
+    for _page_number, _text in iter_pdf_pages(pdf_path):
+        pass
+
+
+def bench_native(pdf_path: Path, copies: list) -> dict:
+    # Timings are taken without tracemalloc, which slows pure-Python code a lot
+    results = {}
+
+    pages, seconds = timed(extract_pdf_pages, pdf_path)
+    results["pages"] = len(pages)
+    results["full_document_s"] = round(seconds, 4)
+
+    started = time.perf_counter()
+    for _page_number, _text in iter_pdf_pages(pdf_path):
+        results["stream_first_page_s"] = round(time.perf_counter() - started, 4)
+        break
+
+    _, seconds = timed(lambda: list(iter_pdf_pages(pdf_path, 1, 10)))
+    results["page_range_1_10_s"] = round(seconds, 4)
+
+    _, seconds = timed(extract_pdfs_parallel, copies, max_workers=1)
+    results[f"{len(copies)}_docs_sequential_s"] = round(seconds, 4)
+    _, seconds = timed(extract_pdfs_parallel, copies)
+    results[f"{len(copies)}_docs_pool_s"] = round(seconds, 4)
+    results["pool_workers"] = min(DEFAULT_MAX_WORKERS, len(copies))
+
+    # Peak memory: keeping every page vs. streaming pages through
+    results["full_document_peak_mb"] = peak_memory_mb(lambda: extract_pdf_pages(pdf_path))
+    results["stream_peak_mb"] = peak_memory_mb(lambda: consume_stream(pdf_path))
+    return results
+
+
+async def _bench_mcp(pdf_path: Path) -> dict:
+    from mcp import ClientSession, StdioServerParameters
+    from mcp.client.stdio import stdio_client
+
+    params = StdioServerParameters(
+        command="uvx",
+        args=["--from=pdf-reader-mcp", "pdf-reader-mcp", "--transport=stdio"],
+        env={k: v for k, v in os.environ.items() if k != "GOOGLE_API_KEY"},
+    )
+    results = {}
+    started = time.perf_counter()
+    async with stdio_client(params) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            results["cold_start_s"] = round(time.perf_counter() - started, 4)
+
+            tools = (await session.list_tools()).tools
+            tool, path_arg = None, None
+            for candidate in tools:
+                props = (candidate.inputSchema or {}).get("properties", {})
+                path_args = [p for p in props if "path" in p.lower() or "file" in p.lower()]
+                if path_args and any(w in candidate.name.lower() for w in ("extract", "read", "text")):
+                    tool, path_arg = candidate, path_args[0]
+                    break
+            if tool is None:
+                results["error"] = f"No text extraction tool found in {[t.name for t in tools]}"
+                return results
+
+            call_started = time.perf_counter()
+            await session.call_tool(tool.name, {path_arg: str(pdf_path)})
+            results["tool"] = tool.name
+            results["full_document_s"] = round(time.perf_counter() - call_started, 4)
+    results["total_s"] = round(time.perf_counter() - started, 4)
+    return results
+
+
+def bench_mcp(pdf_path: Path) -> dict:
+    if shutil.which("uvx") is None:
+        return {"skipped": "uvx not found on PATH"}
+    try:
+        return asyncio.run(_bench_mcp(pdf_path))
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark native vs. MCP PDF text extraction")
+    parser.add_argument("--pages", type=int, default=300, help="Pages in the generated PDF")
+    parser.add_argument("--copies", type=int, default=4, help="Documents for the worker-pool run")
+    parser.add_argument("--skip-mcp", action="store_true", help="Only benchmark the native reader")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = build_large_pdf(Path(tmp) / "large.pdf", args.pages)
+        copies = []
+        for i in range(args.copies):
+            copy = Path(tmp) / f"copy_{i}.pdf"
+            shutil.copyfile(pdf_path, copy)
+            copies.append(copy)
+
+        results = {
+            "pdf_pages": args.pages,
+            "pdf_bytes": pdf_path.stat().st_size,
+            "native": bench_native(pdf_path, copies),
+            "mcp": {"skipped": "--skip-mcp"} if args.skip_mcp else bench_mcp(pdf_path),
+        }
+
+    print(json.dumps(results, indent=2))
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# bench_startup.py
+# Startup time of the CLI: interpreter, `import agent`, `cli.py --help` and agent construction
+#
+# Every measurement runs in a fresh interpreter (nothing warm in sys.modules or
+# the page cache of this process) and is repeated; medians are reported. The
+# slowest imports come from `python -X importtime`. With --budget the script
+# exits non-zero when `cli.py --help` takes longer, so it can guard CI.
+#
+# Usage:
+#   python benchmarks/bench_startup.py --repeat 5 --budget 0.5 --json bench_startup.json
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from bench_workflow import git_commit  # noqa: E402
+
+STARTUP_BUDGET_S = float(os.environ.get("STARTUP_BUDGET_S", 0.5))
+
+# Prints the seconds spent in the timed statement as the last line of output
+_TIMED = "import time; t = time.perf_counter(); {stmt}; print(time.perf_counter() - t)"
+
+
+def _python(*args, env=None) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args], cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+        env={**os.environ, "PDF_READER_BACKEND": "native", **(env or {})},
+    )
+
+
+def wall_seconds(*args, repeat: int) -> float:
+    """Median wall time of a whole `python <args>` process."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        _python(*args)
+        samples.append(time.perf_counter() - started)
+    return round(statistics.median(samples), 3)
+
+
+def timed_seconds(stmt: str, repeat: int) -> float:
+    """Median in-process time of `stmt`, each run in a fresh interpreter."""
+    samples = [float(_python("-c", _TIMED.format(stmt=stmt)).stdout.split()[-1]) for _ in range(repeat)]
+    return round(statistics.median(samples), 3)
+
+
+def top_imports(stmt: str, count: int) -> list:
+    """Modules with the largest cumulative import time while running `stmt`."""
+    stderr = _python("-X", "importtime", "-c", stmt).stderr
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _self_us, cumulative_us, name = line.split("|")
+        # Nested imports are indented; their time is already in their parent's cumulative time
+        if name[1:2] != " ":
+            modules.append({"module": name.strip(), "cumulative_s": round(int(cumulative_us) / 1e6, 3)})
+    return sorted(modules, key=lambda m: m["cumulative_s"], reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure CLI startup and agent construction time")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh-interpreter runs per measurement")
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to list")
+    parser.add_argument("--budget", type=float, default=STARTUP_BUDGET_S,
+                        help="Maximum seconds for `cli.py --help` (default: STARTUP_BUDGET_S or 0.5)")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    import agent
+
+    pipeline_agents = ["parallel_research", "content_writing"]
+    build_pipeline = "import agent; " + "; ".join(f"agent.get_agent({n!r})" for n in pipeline_agents)
+    results = {
+        "benchmark": "startup",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "settings": {"repeat": args.repeat, "budget_s": args.budget},
+        "interpreter_s": wall_seconds("-c", "pass", repeat=args.repeat),
+        "cli_help_s": wall_seconds("cli.py", "--help", repeat=args.repeat),
+        "import_agent_s": timed_seconds("import agent", args.repeat),
+        # Import + construction of one agent (and its tools) in a cold process
+        "agent_build_s": {
+            name: timed_seconds(f"import agent; agent.get_agent({name!r})", args.repeat)
+            for name in agent.AGENT_NAMES
+        },
+        "pipeline_build_s": timed_seconds(build_pipeline, args.repeat),
+        "top_imports": {
+            "cli_help": top_imports("import cli; cli.build_parser()", args.top),
+            "pipeline_build": top_imports(build_pipeline, args.top),
+        },
+    }
+    results["within_budget"] = results["cli_help_s"] <= args.budget
+    print(json.dumps(results, indent=2))
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    if not results["within_budget"]:
+        print(f"cli.py --help took {results['cli_help_s']:.3f}s, over the {args.budget:.3f}s budget",
+              file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
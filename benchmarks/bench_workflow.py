@@ -0,0 +1,346 @@
+# bench_workflow.py
+# Offline end-to-end benchmark of the research -> content -> design pipeline
+#
+# Gemini is replaced by a scripted, deterministic stand-in with configurable
+# latency, Google Search by canned trend results, and PDFs are read with the
+# local (in-process) tools, so no API key, network or uvx is needed. The real
+# agents, prompts, tools, rate limiter and instrumentation stay in the loop.
+#
+# Usage:
+#   python benchmarks/bench_workflow.py --latency 0.2 --batch-sizes 1 2 4 --json bench_workflow.json
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+FAKE_SEARCH_RESULTS = """1. Personalised, AI-assisted onboarding is the most requested feature in 2025 buyer surveys.
+2. Teams consolidate tools: integrations and single sign-on drive purchase decisions.
+3. Sustainability and energy efficiency are now listed in most enterprise RFPs."""
+
+FAKE_INSIGHTS = """- Key features: real-time dashboards, automated reporting, role-based access (Mock_Product_Data.pdf p.1)
+- Benefits: saves analysts several hours per week; integrates with existing data sources (p.2)
+- Use cases: sales pipeline reviews, marketing attribution, operations monitoring (p.2)"""
+
+FAKE_CONTENT = {
+    "title": "Your data, ready when you are",
+    "subtitle": "Real-time dashboards and automated reporting in one place",
+    "intro": "Buyers want personalised onboarding and fewer, better-integrated tools.",
+    "highlights": [
+        {"title": "Real-time dashboards", "text": "The numbers your team needs, always current."},
+        {"title": "Automated reporting", "text": "Saves analysts several hours per week."},
+    ],
+    "bullets": [
+        "Product data: dashboards, reporting and role-based access",
+        "Trend: teams consolidate tools around integrations",
+        "Timely: budgets favour tools that save analyst time",
+    ],
+    "cta_text": "Book a demo",
+    "cta_url": "",
+}
+
+FAKE_HTML = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Newsletter</title></head>
+<body style="font-family: Arial, sans-serif; max-width: 600px; margin: auto;">
+<h1>Your data, ready when you are</h1>
+<p>Real-time dashboards and automated reporting put the numbers your team needs in one place.</p>
+<p><a href="#">Book a demo today</a></p>
+</body></html>"""
+
+
+def _agent_role(llm_request) -> str:
+    """Identify the calling agent from the tools it declares."""
+    tools = set(llm_request.tools_dict)
+    instruction = str(llm_request.config.system_instruction or "")
+    # Agents without tools are told apart by their prompt
+    if "Section_Repair_Agent" in instruction:
+        return "section_repair"
+    if "Document_Insights_Agent" in instruction:
+        return "document_insights"
+    if "search_product_data" in tools:
+        return "data_collection"
+    if "list_html_files" in tools:
+        return "visual_design"
+    if "save_newsletter_content" in tools:
+        return "content_writing"
+    return "trend_finding"
+
+
+def _user_text(llm_request) -> str:
+    for content in llm_request.contents or []:
+        if content.role == "user":
+            for part in content.parts or []:
+                if part.text:
+                    return part.text
+    return ""
+
+
+def _function_responses(llm_request) -> list:
+    return [
+        part.function_response
+        for content in llm_request.contents or []
+        for part in content.parts or []
+        if part.function_response is not None
+    ]
+
+
+def _script_step(role: str, llm_request):
+    """Next (function_call_name, args) or (None, final_text) for the agent's script."""
+    message = _user_text(llm_request)
+    done = _function_responses(llm_request)
+    step = len(done)
+
+    if role == "data_collection":
+        match = re.search(r'directory="([^"]+)"', message)
+        directory = match.group(1) if match else "./product_data"
+        queries = ["key features and benefits", "use cases and customers"]
+        if step < len(queries):
+            return "search_product_data", {"query": queries[step], "top_k": 5, "directory": directory}
+        return None, FAKE_INSIGHTS
+    if role == "document_insights":
+        return None, FAKE_INSIGHTS
+    if role == "trend_finding":
+        return None, FAKE_SEARCH_RESULTS
+    if role == "content_writing":
+        # The tool resolves the run's output directory from the session state
+        if step == 0:
+            return "save_newsletter_content", dict(FAKE_CONTENT)
+        return None, json.dumps(FAKE_CONTENT)
+    if role == "visual_design":
+        match = re.search(r'directory="([^"]+)"', message)
+        html_path = re.search(r"write_file tool to (\S+)", message)
+        if step == 0:
+            return "get_style_digests", {"directory": match.group(1) if match else "./style_samples"}
+        if step == 1 and html_path:
+            return "write_file", {"file_path": html_path.group(1), "content": FAKE_HTML}
+        return None, FAKE_HTML
+    if role == "section_repair":
+        # Turn the section's plain link into a filled button (FAKE_HTML has no CTA button)
+        section = re.search(r"```html\n(.*?)\n```", message, re.S).group(1)
+        return None, section.replace("<a ", '<a style="background-color: #0b5fff; color: #ffffff; padding: 12px 24px;" ', 1)
+    raise ValueError(f"No script for agent role {role}")
+
+
+def install_stub_model(latency: float, search_latency: float, slow_fraction: float = 0.0,
+                       slow_latency: float = 0.0) -> dict:
+    """Replace Gemini calls with the scripted stand-in; returns live call counters.
+
+    A (seeded) slow_fraction of the calls take slow_latency instead of latency,
+    which gives runs a latency tail for measuring deadlines and hedging.
+    """
+    from google.adk.models.google_llm import Gemini
+    from google.adk.models.llm_response import LlmResponse
+    from google.genai import types
+
+    from orchestration.models import estimate_request_tokens
+
+    counters = {"model_calls": 0}
+    tail = random.Random(0)
+
+    async def generate_content_async(self, llm_request, stream=False):
+        role = _agent_role(llm_request)
+        counters["model_calls"] += 1
+        call_latency = slow_latency if tail.random() < slow_fraction else latency
+        await asyncio.sleep(call_latency + (search_latency if role == "trend_finding" else 0.0))
+        name, payload = _script_step(role, llm_request)
+        if name is not None:
+            part = types.Part(function_call=types.FunctionCall(name=name, args=payload))
+            completion_tokens = len(json.dumps(payload)) // 4
+        else:
+            part = types.Part(text=payload)
+            completion_tokens = len(payload) // 4
+        prompt_tokens = estimate_request_tokens(llm_request)
+        yield LlmResponse(
+            content=types.Content(role="model", parts=[part]),
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=prompt_tokens,
+                candidates_token_count=completion_tokens,
+                total_token_count=prompt_tokens + completion_tokens,
+            ),
+        )
+
+    Gemini.generate_content_async = generate_content_async
+    return counters
+
+
+def max_rss_mb() -> float:
+    """Peak resident set size of this process so far (high-water mark)."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(rss / (1e6 if sys.platform == "darwin" else 1024), 1)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def usage_since(instrumentation, before: dict) -> dict:
+    after = instrumentation.usage()
+    keys = ("model_calls", "prompt_tokens", "completion_tokens", "tool_calls", "tool_errors")
+    return {key: after[key] - before[key] for key in keys}
+
+
+async def bench_single(agent, instrumentation, output_dir: Path, force=()) -> dict:
+    usage_before = instrumentation.usage()
+    pipeline = agent.build_stage_pipeline(output_dir=str(output_dir))
+    started = time.perf_counter()
+    report = await pipeline.run(force=force)
+    total = time.perf_counter() - started
+    return {
+        "stages": {name: {"status": r["status"], "seconds": r["seconds"]} for name, r in report.items()},
+        "total_s": round(total, 3),
+        **usage_since(instrumentation, usage_before),
+        "max_rss_mb": max_rss_mb(),
+    }
+
+
+async def bench_batch(agent, instrumentation, root: Path, size: int, concurrency: int) -> dict:
+    from orchestration.batch import run_batch
+
+    jobs = [
+        {
+            "name": f"campaign_{i}",
+            "output_dir": str(root / f"batch_{size}" / f"campaign_{i}"),
+            "product_data_dir": "./product_data",
+            "style_samples_dir": "./style_samples",
+            "audience": "",
+        }
+        for i in range(size)
+    ]
+
+    async def run_job(job):
+        pipeline = agent.build_stage_pipeline(output_dir=job["output_dir"])
+        await pipeline.run()
+
+    usage_before = instrumentation.usage()
+    report = await run_batch(jobs, run_job, concurrency=concurrency)
+    seconds = [j["seconds"] for j in report["jobs"]]
+    return {
+        "batch_size": size,
+        "concurrency": concurrency,
+        "wall_s": report["wall_seconds"],
+        "succeeded": report["succeeded"],
+        "failed": report["failed"],
+        "newsletters_per_minute": report["newsletters_per_minute"],
+        "job_mean_s": round(sum(seconds) / len(seconds), 3),
+        "job_max_s": round(max(seconds), 3),
+        **usage_since(instrumentation, usage_before),
+        "max_rss_mb": max_rss_mb(),
+    }
+
+
+async def run_benchmarks(args, root: Path) -> dict:
+    # agent.py reads its configuration at import time, so import it only now
+    import agent
+    from orchestration.instrumentation import get_instrumentation
+
+    counters = install_stub_model(args.latency, args.search_latency, args.slow_fraction, args.slow_latency)
+    instrumentation = get_instrumentation()
+
+    results = {
+        "import_max_rss_mb": max_rss_mb(),
+        # Cold: empty PDF text cache and product index; warm: same caches, all stages forced
+        "single_cold": await bench_single(agent, instrumentation, root / "single"),
+        "single_warm": await bench_single(
+            agent, instrumentation, root / "single", force=("research", "content", "design")
+        ),
+        "batches": [],
+    }
+    for size in args.batch_sizes:
+        concurrency = args.concurrency or size
+        results["batches"].append(await bench_batch(agent, instrumentation, root, size, concurrency))
+    results["total_model_calls"] = counters["model_calls"]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the newsletter pipeline with a stub LLM")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per stub model call")
+    parser.add_argument("--search-latency", type=float, default=0.3,
+                        help="Extra seconds per TrendFindingAgent call (fake Google Search)")
+    parser.add_argument("--slow-fraction", type=float, default=0.0,
+                        help="Fraction of stub model calls that are slow (a latency tail)")
+    parser.add_argument("--slow-latency", type=float, default=2.0, help="Seconds per slow stub model call")
+    parser.add_argument("--hedge", action="store_true",
+                        help="Hedge model requests slower than GEMINI_HEDGE_PERCENTILE (see GEMINI_HEDGE)")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4],
+                        help="Campaigns per batch run")
+    parser.add_argument("--concurrency", type=int,
+                        help="Batch concurrency (default: the batch size)")
+    parser.add_argument("--design-mode", choices=["template", "template+llm", "llm"], default="template",
+                        help="Design stage mode (see DESIGN_MODE in agent.py)")
+    parser.add_argument("--insights", choices=["documents", "agent"], default="documents",
+                        help="Internal insights source (see INSIGHTS_SOURCE in agent.py)")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        # Keep sessions, caches and traces out of the working tree and start cold
+        os.environ.update({
+            "NEWSLETTER_SESSION_DB": str(root / "sessions.db"),
+            "NEWSLETTER_TRACE_DIR": str(root / "traces"),
+            "PDF_CACHE_DIR": str(root / "pdf_text"),
+            "PRODUCT_INDEX_PATH": str(root / "product_index.json"),
+            "INSIGHTS_MANIFEST_PATH": str(root / "product_insights.json"),
+            "STYLE_DIGEST_PATH": str(root / "style_digests.json"),
+            "TREND_SNAPSHOT_DIR": str(root / "trends"),
+            "IMAGE_CACHE_DIR": str(root / "images"),
+            "MODEL_LATENCY_PATH": str(root / "model_latency.json"),
+            "LLM_CACHE_MODE": "off",
+            "PDF_READER_BACKEND": "native",
+            "DESIGN_MODE": args.design_mode,
+            "INSIGHTS_SOURCE": args.insights,
+            # The stub has no quota; keep the limiter from shaping the measurement
+            "GEMINI_RPM": "1000000",
+            "GEMINI_TPM": "1000000000",
+            "GEMINI_MAX_CONCURRENCY": "64",
+            "GEMINI_HEDGE": "1" if args.hedge else "0",
+        })
+        # Tools resolve ./product_data and ./style_samples from the working directory
+        os.chdir(REPO_ROOT)
+        measurements = asyncio.run(run_benchmarks(args, root))
+
+    results = {
+        "benchmark": "workflow",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "settings": {
+            "latency_s": args.latency,
+            "search_latency_s": args.search_latency,
+            "slow_fraction": args.slow_fraction,
+            "slow_latency_s": args.slow_latency,
+            "hedge": args.hedge,
+            "design_mode": args.design_mode,
+            "insights": args.insights,
+            "batch_sizes": args.batch_sizes,
+            "concurrency": args.concurrency,
+        },
+        **measurements,
+    }
+    print(json.dumps(results, indent=2))
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
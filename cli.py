@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# cli.py
+# Command-line entry point: full run, research-only, design-only, batch, variants and service commands
+#
+# Importing agent.py is cheap: ADK, the Gemini client, the PDF tools and the
+# MCP servers are only loaded when a command builds the agents its stages
+# need (see agent.get_agent), so --help and enqueue never load them.
+
+import argparse
+import asyncio
+import logging
+import sys
+
+import agent
+from orchestration.llm_cache import MODES as LLM_CACHE_MODES
+from orchestration.service import DEFAULT_WORKERS, SERVICE_PORT
+
+STAGES = ("research", "content", "design")
+
+# Old-style mode flags of `python agent.py` -> subcommand (True: the flag takes the command's argument)
+_LEGACY_MODES = (("--enqueue", "enqueue", True), ("--serve", "serve", False),
+                 ("--batch", "batch", True), ("--variants", "variants", True))
+
+
+def _setup_logging():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    # Enable verbose logging for ADK
+    logging.getLogger('google.adk').setLevel(logging.DEBUG)
+
+
+def _configure(args, calls_llm=True):
+    """Apply the options shared by all commands."""
+    if args.design:
+        agent.DESIGN_MODE = args.design
+    if args.trends:
+        agent.TREND_SOURCE = args.trends
+    if args.insights:
+        agent.INSIGHTS_SOURCE = args.insights
+    if getattr(args, "refresh_trends", False):
+        from orchestration.trends import get_trend_cache
+        get_trend_cache().invalidate()
+    if args.llm_cache:
+        from orchestration.llm_cache import set_llm_cache_mode
+        set_llm_cache_mode(args.llm_cache)
+    if calls_llm:
+        agent.check_environment()
+    _setup_logging()
+
+
+def _run(args):
+    _configure(args)
+    # Fresh trends only reach the newsletter if research runs again
+    force = set(args.force) | ({"research"} if args.refresh_trends else set())
+    asyncio.run(agent.main(force=force, use_coordinator=args.coordinator, output_dir=args.output_dir))
+
+
+def _run_stage(stage):
+    def handler(args):
+        # Template design renders locally; only research and LLM design call Gemini
+        _configure(args, calls_llm=stage == "research" or (args.design or agent.DESIGN_MODE) != "template")
+        force = args.force or getattr(args, "refresh_trends", False)
+        asyncio.run(agent.main(force={stage} if force else (), only={stage},
+                               output_dir=args.output_dir))
+    return handler
+
+
+def _batch(args):
+    _configure(args)
+    asyncio.run(agent.main(batch_manifest=args.manifest, concurrency=args.concurrency))
+
+
+def _variants(args):
+    _configure(args)
+    asyncio.run(agent.main(variants=args.count, templates=args.templates, concurrency=args.concurrency,
+                           output_dir=args.output_dir))
+
+
+def _serve(args):
+    _configure(args)
+    try:
+        asyncio.run(agent.run_service(workers=args.workers, port=args.port or None, drain=args.drain))
+    except KeyboardInterrupt:
+        pass
+
+
+def _enqueue(args):
+    _configure(args, calls_llm=False)
+    agent.enqueue_jobs(args.jobs)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--llm-cache", choices=LLM_CACHE_MODES,
+                        help="LLM response cache mode (default: LLM_CACHE_MODE or off); "
+                             "replay runs fully offline from recorded responses")
+    common.add_argument("--design", choices=agent.DESIGN_MODES,
+                        help="Design stage: render a template locally (default), render then let the "
+                             "LLM tweak the layout, or have the LLM generate the whole HTML")
+    common.add_argument("--trends", choices=agent.TREND_SOURCES,
+                        help="External trends: Google Search through the shared snapshot cache (default), "
+                             "or the local TREND_FILE (offline)")
+    common.add_argument("--insights", choices=agent.INSIGHTS_SOURCES,
+                        help="Internal insights: summarize only new or changed product PDFs and merge the stored "
+                             "summaries (default), or have Data_Collection_Agent read all of product_data")
+    refresh = argparse.ArgumentParser(add_help=False)
+    refresh.add_argument("--refresh-trends", action="store_true",
+                         help="Search for trends again even if the cached snapshot is still fresh")
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument("--output-dir", default=agent.DEFAULT_OUTPUT_DIR,
+                        help="Output directory of this run (default: NEWSLETTER_OUTPUT_DIR or ./output); "
+                             "give concurrent runs on one host different directories")
+
+    parser = argparse.ArgumentParser(prog="cli.py", description="Generate marketing newsletters")
+    commands = parser.add_subparsers(dest="command", required=True, metavar="COMMAND")
+
+    run = commands.add_parser("run", parents=[common, output, refresh], help="Run the full research -> content -> design pipeline")
+    run.add_argument("--force", nargs="*", default=[], choices=STAGES,
+                     help="Rerun these stages even if their inputs are unchanged")
+    run.add_argument("--coordinator", action="store_true",
+                     help="Let Marketing_Coordinator_Agent decide which agents to run")
+    run.set_defaults(handler=_run)
+
+    for stage, parents, text in (
+        ("research", [common, output, refresh], "Run only the research stage (internal insights + external trends)"),
+        ("design", [common, output], "Run only the design stage, from the existing content"),
+    ):
+        sub = commands.add_parser(stage, parents=parents, help=text)
+        sub.add_argument("--force", action="store_true", help="Rerun the stage even if its inputs are unchanged")
+        sub.set_defaults(handler=_run_stage(stage))
+
+    batch = commands.add_parser("batch", parents=[common], help="Generate a newsletter per campaign in a JSON manifest")
+    batch.add_argument("manifest", metavar="MANIFEST")
+    batch.add_argument("--concurrency", type=int, help="Maximum concurrent campaigns")
+    batch.set_defaults(handler=_batch)
+
+    variants = commands.add_parser("variants", parents=[common, output],
+                                   help="Generate N content/design variants from one shared research pass")
+    variants.add_argument("count", type=int, metavar="N")
+    variants.add_argument("--templates", nargs="*", default=[],
+                          help="Style sample templates (parts of their paths) cycled across the variants")
+    variants.add_argument("--concurrency", type=int, help="Maximum concurrent variants")
+    variants.set_defaults(handler=_variants)
+
+    serve = commands.add_parser("serve", parents=[common],
+                                help="Run as a long-lived service that processes queued campaign jobs")
+    serve.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Jobs processed concurrently")
+    serve.add_argument("--port", type=int, default=SERVICE_PORT,
+                       help="HTTP port of the service API (0: no HTTP API)")
+    serve.add_argument("--drain", action="store_true", help="Exit once the queue is empty")
+    serve.set_defaults(handler=_serve)
+
+    enqueue = commands.add_parser("enqueue", parents=[common],
+                                  help="Add the campaign job(s) in a JSON file to the service queue")
+    enqueue.add_argument("jobs", metavar="JOBS_JSON")
+    enqueue.set_defaults(handler=_enqueue)
+    return parser
+
+
+def from_legacy_args(argv: list) -> list:
+    """Map `python agent.py [--batch M | --serve | --enqueue F | --variants N] ...` onto a subcommand."""
+    argv = list(argv)
+    if argv and argv[0] in ("-h", "--help"):
+        return argv
+    for flag, command, takes_value in _LEGACY_MODES:
+        for i, arg in enumerate(argv):
+            if arg == flag or arg.startswith(flag + "="):
+                value = arg.split("=", 1)[1:] if "=" in arg else argv[i + 1:i + 2] if takes_value else []
+                rest = argv[:i] + argv[i + 1 + (takes_value and "=" not in arg):]
+                return [command, *value, *rest]
+    return ["run", *argv]
+
+
+def main(argv=None, legacy=False) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if legacy:
+        argv = from_legacy_args(argv)
+    args = build_parser().parse_args(argv)
+    args.handler(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
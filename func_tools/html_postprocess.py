@@ -0,0 +1,346 @@
+# html_postprocess.py
+# Email-size-aware post-processing of the newsletter HTML: CSS inlining, minification, images, byte budget
+
+import html
+import json
+import os
+import re
+import time
+from pathlib import Path
+
+from func_tools.image_optimizer import display_width, image_optimizer
+from func_tools.output_store import get_output_store
+from func_tools.template_renderer import is_remote, parse_elements
+
+# Gmail clips messages whose HTML exceeds ~102KB (0 disables the check)
+HTML_BYTE_BUDGET = int(os.environ.get("HTML_BYTE_BUDGET", 102_000))
+POSTPROCESS_VERSION = "postprocess-1"
+
+_COMMENT_RE = re.compile(r"<!--(?!\[if)(?!<!\[endif\]).*?-->", re.S)
+_CSS_COMMENT_RE = re.compile(r"/\*.*?\*/", re.S)
+_PROTECTED_RE = re.compile(r"(<(pre|textarea|script|style)\b.*?</\2\s*>)", re.S | re.I)
+_BLOCK_TAGS = (
+    "html|head|body|title|meta|link|style|table|thead|tbody|tfoot|tr|td|th|div|p|h[1-6]|ul|ol|li|"
+    "center|br|hr|section|header|footer|main|article|!doctype|!--\\[if|!\\[endif"
+)
+_SPACE_BEFORE_BLOCK_RE = re.compile(rf"\s+(</?(?:{_BLOCK_TAGS})\b)", re.I)
+_SPACE_AFTER_BLOCK_RE = re.compile(rf"(<(?:/?(?:{_BLOCK_TAGS}))\b[^>]*>)\s+", re.I)
+_STYLE_ATTR_RE = re.compile(r'(\sstyle\s*=\s*)(["\'])(.*?)\2', re.S | re.I)
+_COMPOUND_RE = re.compile(r"^([a-z][a-z0-9-]*|\*)?((?:[.#][\w-]+)*)$", re.I)
+
+
+# CSS
+
+def minify_css(css: str) -> str:
+    css = _CSS_COMMENT_RE.sub("", css)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};:,>])\s*", r"\1", css)
+    return css.replace(";}", "}").strip().rstrip(";")
+
+
+def _declarations(body: str) -> list:
+    """'color: red; margin: 0 !important' -> [(name, value, important), ...]"""
+    declarations = []
+    for declaration in body.split(";"):
+        if ":" not in declaration:
+            continue
+        name, value = declaration.split(":", 1)
+        important = "!important" in value.lower()
+        value = re.sub(r"\s*!important\s*", "", value, flags=re.I).strip()
+        if name.strip() and value:
+            declarations.append((name.strip().lower(), value, important))
+    return declarations
+
+
+def _split_rules(css: str) -> list:
+    """Top-level CSS -> [(prelude, body)]; statements like @import are returned with body None."""
+    rules = []
+    i = 0
+    while i < len(css):
+        brace = css.find("{", i)
+        if brace == -1:
+            rules.extend((s.strip(), None) for s in css[i:].split(";") if s.strip())
+            break
+        *statements, prelude = css[i:brace].split(";")
+        rules.extend((s.strip(), None) for s in statements if s.strip())
+        depth, j = 1, brace + 1
+        while j < len(css) and depth:
+            depth += {"{": 1, "}": -1}.get(css[j], 0)
+            j += 1
+        rules.append((prelude.strip(), css[brace + 1:j - 1]))
+        i = j
+    return rules
+
+
+def _parse_selector(selector: str):
+    """'table.card > td .note' -> [(compound, combinator), ...] right to left, or None if unsupported."""
+    tokens = re.sub(r"\s*>\s*", " > ", selector.strip()).split()
+    steps = []
+    combinator = " "
+    for token in reversed(tokens):
+        if token == ">":
+            combinator = ">"
+            continue
+        match = _COMPOUND_RE.match(token)
+        if not match:
+            return None
+        tag = (match.group(1) or "*").lower()
+        ids = re.findall(r"#([\w-]+)", match.group(2))
+        classes = frozenset(re.findall(r"\.([\w-]+)", match.group(2)))
+        if len(ids) > 1:
+            return None
+        if steps:
+            steps[-1] = (steps[-1][0], combinator)
+        steps.append(((tag, ids[0] if ids else None, classes), None))
+        combinator = " "
+    return steps or None
+
+
+def _specificity(steps) -> tuple:
+    ids = sum(1 for (tag, id_, classes), _ in steps if id_)
+    classes = sum(len(classes) for (tag, id_, classes), _ in steps)
+    tags = sum(1 for (tag, id_, classes), _ in steps if tag != "*")
+    return ids, classes, tags
+
+
+def _compound_matches(compound, element) -> bool:
+    tag, id_, classes = compound
+    if tag != "*" and element.tag != tag:
+        return False
+    if id_ and element.attrs.get("id") != id_:
+        return False
+    return not classes or classes.issubset((element.attrs.get("class") or "").split())
+
+
+def _matches(steps, i, element) -> bool:
+    compound, combinator = steps[i]
+    if not _compound_matches(compound, element):
+        return False
+    if i + 1 == len(steps):
+        return True
+    if combinator == ">":
+        return element.parent is not None and _matches(steps, i + 1, element.parent)
+    return any(_matches(steps, i + 1, ancestor) for ancestor in element.ancestors())
+
+
+def _start_tag(element, attrs: dict, raw: str) -> str:
+    parts = [element.tag]
+    for name, value in attrs.items():
+        parts.append(name if value is None else f'{name}="{html.escape(value, quote=True)}"')
+    return f"<{' '.join(parts)}{' /' if raw.rstrip().endswith('/>') else ''}>"
+
+
+def inline_css(source: str) -> tuple:
+    """Move <style> rules onto the style attributes of the elements they match.
+
+    Rules with simple selectors (tag, .class, #id, descendant and child
+    combinators) are inlined, ordered by specificity; existing inline
+    declarations win unless the rule is !important. Rules that can't be
+    inlined (@media, :hover, attribute selectors, ...) stay in a <style>
+    block for the clients that support it.
+
+    Returns:
+        tuple: (html, number of inlined rules)
+    """
+    elements = parse_elements(source)
+    blocks = [e for e in elements if e.tag == "style" and e.end > e.content_start]
+    if not blocks:
+        return source, 0
+
+    rules = []        # (specificity, order, steps, declarations)
+    kept = {}         # style element -> leftover CSS
+    for block in blocks:
+        leftover = []
+        media = (block.attrs.get("media") or "all").lower()
+        for prelude, body in _split_rules(_CSS_COMMENT_RE.sub("", source[block.content_start:block.content_end])):
+            if body is None or prelude.startswith("@") or media not in ("all", "screen"):
+                leftover.append(prelude + ";" if body is None else f"{prelude}{{{body}}}")
+                continue
+            declarations = _declarations(body)
+            inlined = []
+            for selector in prelude.split(","):
+                steps = _parse_selector(selector)
+                if steps is None:
+                    inlined = None
+                    break
+                inlined.append(steps)
+            if inlined is None:
+                leftover.append(f"{prelude}{{{body}}}")
+                continue
+            for steps in inlined:
+                rules.append((_specificity(steps), len(rules), steps, declarations))
+        kept[block] = minify_css("".join(leftover))
+
+    head_ranges = [(e.start, e.end) for e in elements if e.tag == "head"]
+    edits = []
+    for element in elements:
+        if element.tag in ("style", "script", "head", "html") or any(s <= element.start < t for s, t in head_ranges):
+            continue
+        matched = sorted((r for r in rules if _matches(r[2], 0, element)), key=lambda r: (r[0], r[1]))
+        if not matched:
+            continue
+        style = {}
+        for *_, declarations in matched:
+            for name, value, important in declarations:
+                if not important:
+                    style[name] = value
+        for name, value, _important in _declarations(element.attrs.get("style") or ""):
+            style[name] = value
+        for *_, declarations in matched:
+            for name, value, important in declarations:
+                if important:
+                    style[name] = value
+        attrs = dict(element.attrs)
+        attrs["style"] = "; ".join(f"{name}: {value}" for name, value in style.items())
+        raw = source[element.start:element.content_start]
+        edits.append((element.start, element.content_start, _start_tag(element, attrs, raw)))
+
+    for block, css in kept.items():
+        if css:
+            edits.append((block.content_start, block.content_end, css))
+        else:
+            edits.append((block.start, block.end, ""))
+    for start, end, text in sorted(edits, key=lambda e: e[0], reverse=True):
+        source = source[:start] + text + source[end:]
+    return source, len(rules)
+
+
+# Markup
+
+def minify_html(source: str) -> str:
+    """Remove comments (except Outlook conditional comments) and collapse whitespace.
+
+    <pre>, <textarea>, <script> and <style> contents are kept as they are
+    (style blocks are CSS-minified); whitespace between inline elements is
+    reduced to one space, so text never runs together.
+    """
+    protected = []
+
+    def protect(match):
+        block = match.group(1)
+        if match.group(2).lower() == "style":
+            open_end = block.find(">") + 1
+            close_start = block.lower().rfind("</style")
+            block = block[:open_end] + minify_css(block[open_end:close_start]) + block[close_start:]
+        protected.append(block)
+        return f"\x00{len(protected) - 1}\x00"
+
+    source = _COMMENT_RE.sub("", source)
+    source = _PROTECTED_RE.sub(protect, source)
+    source = re.sub(r"\s+", " ", source)
+    source = _SPACE_BEFORE_BLOCK_RE.sub(r"\1", source)
+    source = _SPACE_AFTER_BLOCK_RE.sub(r"\1", source)
+    source = _STYLE_ATTR_RE.sub(lambda m: f"{m.group(1)}{m.group(2)}{minify_css(m.group(3))}{m.group(2)}", source)
+    source = re.sub(r"\x00(\d+)\x00", lambda m: protected[int(m.group(1))], source)
+    return source.strip()
+
+
+# Images
+
+def _find_image(src: str, search_dirs) -> Path:
+    path = Path(html.unescape(src).split("?", 1)[0].split("#", 1)[0])
+    if path.is_absolute():
+        return path if path.is_file() else None
+    for directory in search_dirs:
+        candidate = Path(directory) / path
+        if candidate.is_file():
+            return candidate
+    return None
+
+
+def optimize_images(source: str, store, search_dirs=()) -> tuple:
+    """Point every local <img> at an optimized copy in the output directory's images/.
+
+    Relative srcs are looked up in the output directory, then search_dirs
+    (e.g. the style samples), then the working directory.
+
+    Returns:
+        tuple: (html, images, missing) - images as {"src", "file", "bytes_in", "bytes"} records
+    """
+    search_dirs = [store.root, *search_dirs, Path.cwd()]
+    images, missing, edits = [], [], []
+    for element in parse_elements(source):
+        src = element.attrs.get("src")
+        if element.tag != "img" or not src or is_remote(src):
+            continue
+        path = _find_image(src, search_dirs)
+        if path is None:
+            missing.append(src)
+            continue
+        image = image_optimizer.optimize(path, store, display_width=display_width(element.attrs))
+        images.append({"src": src, "file": image["file"], "bytes_in": image["bytes_in"], "bytes": image["bytes"]})
+        if image["file"] != src:
+            attrs = dict(element.attrs, src=image["file"])
+            raw = source[element.start:element.content_start]
+            edits.append((element.start, element.content_start, _start_tag(element, attrs, raw)))
+    for start, end, text in sorted(edits, key=lambda e: e[0], reverse=True):
+        source = source[:start] + text + source[end:]
+    return source, images, missing
+
+
+# Newsletter
+
+def postprocess_html(source: str, store, search_dirs=(), budget: int = HTML_BYTE_BUDGET) -> tuple:
+    """Inline CSS, optimize images and minify a newsletter document.
+
+    Returns:
+        tuple: (html, report) - report has the HTML size before/after, the
+        budget and whether it is met, inlined rules, images and timings
+    """
+    started = time.perf_counter()
+    bytes_in = len(source.encode("utf-8"))
+    source, rules = inline_css(source)
+    inlined = time.perf_counter()
+    source, images, missing = optimize_images(source, store, search_dirs)
+    optimized = time.perf_counter()
+    source = minify_html(source)
+    html_bytes = len(source.encode("utf-8"))
+    report = {
+        "version": POSTPROCESS_VERSION,
+        "html_bytes_in": bytes_in,
+        "html_bytes": html_bytes,
+        "budget": budget,
+        "within_budget": not budget or html_bytes <= budget,
+        "css_rules_inlined": rules,
+        "images": images,
+        "missing_images": missing,
+        "image_bytes": sum(i["bytes"] for i in images),
+        "ms": {
+            "inline_css": round((inlined - started) * 1000, 2),
+            "images": round((optimized - inlined) * 1000, 2),
+            "minify": round((time.perf_counter() - optimized) * 1000, 2),
+            "total": round((time.perf_counter() - started) * 1000, 2),
+        },
+    }
+    return source, report
+
+
+def postprocess_newsletter(html_path, search_dirs=(), budget: int = HTML_BYTE_BUDGET, extra: dict = None) -> dict:
+    """Post-process a written newsletter in place and save <name>_report.json next to it.
+
+    extra is added to the saved report (e.g. the validation result).
+
+    Returns:
+        dict: The report (see postprocess_html) with "file_path" and "report_path"
+    """
+    html_path = Path(html_path).absolute()
+    store = get_output_store(html_path.parent)
+    processed, report = postprocess_html(store.read_text(html_path), store, search_dirs, budget)
+    store.write_text(html_path, processed)
+    report_path = html_path.with_name(f"{html_path.stem}_report.json")
+    report.update(extra or {}, file_path=str(html_path), report_path=str(report_path))
+    store.write_text(report_path, json.dumps(report, indent=2))
+    return report
+
+
+def format_report(report: dict) -> str:
+    saved = sum(i["bytes_in"] - i["bytes"] for i in report["images"])
+    budget = f" (budget {report['budget'] / 1024:.1f} KB)" if report["budget"] else ""
+    line = (
+        f"Post-processing: HTML {report['html_bytes_in'] / 1024:.1f} KB -> {report['html_bytes'] / 1024:.1f} KB"
+        f"{budget}, {report['css_rules_inlined']} CSS rules inlined, {len(report['images'])} images "
+        f"({report['image_bytes'] / 1024:.1f} KB, {saved / 1024:.1f} KB saved), {report['ms']['total']:.1f} ms"
+    )
+    if report["missing_images"]:
+        line += f"; missing images: {', '.join(report['missing_images'])}"
+    return line
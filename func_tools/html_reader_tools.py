@@ -1,95 +1,297 @@
 # html_reader_tools.py
-# Function tools for reading HTML files from style_samples directory
+# Function tools for reading HTML files from style_samples directory,
+# backed by a cached, incrementally refreshed file index and an LRU content cache
 
-from google.adk.tools.function_tool import FunctionTool
+import fnmatch
+import logging
+import os
+import threading
+from collections import OrderedDict
 from pathlib import Path
 
+from google.adk.tools.function_tool import FunctionTool
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # optional: only used when HTML_INDEX_WATCH=1
+    FileSystemEventHandler = object
+    Observer = None
+
+logger = logging.getLogger(__name__)
+
+HTML_SUFFIXES = (".html", ".htm")
+DEFAULT_CONTENT_CACHE_BYTES = int(os.environ.get("HTML_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+# Long-lived processes can watch the style library instead of stat-ing its directories
+WATCH_ENABLED = os.environ.get("HTML_INDEX_WATCH", "0") == "1"
+MAX_PAGE_SIZE = 500
+
+
+def _resolve(path: str) -> Path:
+    path = Path(path)
+    if not path.is_absolute():
+        # Try relative to current directory
+        path = Path.cwd() / path
+    return path
+
+
+def _display_path(path: Path) -> str:
+    """Path relative to the working directory when possible (what the agent passes back)."""
+    try:
+        return str(path.relative_to(Path.cwd()))
+    except ValueError:
+        return str(path)
+
+
+class _DirectoryListing:
+    """HTML files under one root, with the mtime of every directory scanned.
+
+    A directory's mtime changes when entries are added, removed or renamed
+    in it, so refresh() only stats the known directories and rescans the
+    ones that changed, instead of walking the whole tree on every call.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.dirs = {}    # directory -> (mtime_ns, [html files directly in it], [subdirectories])
+        self.dirty = True
+
+    def _scan_dir(self, directory: str) -> None:
+        files, subdirs = [], []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.name.lower().endswith(HTML_SUFFIXES) and entry.is_file():
+                    files.append(entry.path)
+        self.dirs[directory] = (os.stat(directory).st_mtime_ns, sorted(files), sorted(subdirs))
+        for subdir in subdirs:
+            if subdir not in self.dirs:
+                self._scan_dir(subdir)
+
+    def refresh(self, check_mtimes: bool = True) -> int:
+        """Rescan new or changed directories; returns how many were rescanned."""
+        if not self.dirty and not check_mtimes:
+            return 0
+        rescanned = 0
+        pending = [str(self.root)]
+        seen = set()
+        while pending:
+            directory = pending.pop()
+            seen.add(directory)
+            known = self.dirs.get(directory)
+            try:
+                mtime = os.stat(directory).st_mtime_ns
+            except OSError:
+                self.dirs.pop(directory, None)
+                continue
+            if known is None or known[0] != mtime:
+                self.dirs.pop(directory, None)
+                self._scan_dir(directory)
+                rescanned += 1
+            pending.extend(self.dirs[directory][2])
+        for directory in set(self.dirs) - seen:
+            del self.dirs[directory]
+        self.dirty = False
+        return rescanned
+
+    def files(self) -> list:
+        return sorted(f for _mtime, files, _subdirs in self.dirs.values() for f in files)
+
+
+class _WatchHandler(FileSystemEventHandler):
+    def __init__(self, index, root: str):
+        self.index = index
+        self.root = root
+
+    def on_any_event(self, event):
+        self.index._on_change(self.root, getattr(event, "src_path", None), getattr(event, "dest_path", None))
+
+
+class HtmlFileIndex:
+    """In-process index of HTML files per directory plus an LRU cache of their contents.
+
+    Listings are refreshed incrementally from directory mtimes (or, with a
+    watchdog observer, only after a change event). File contents are cached
+    up to max_bytes, least recently used first out, and revalidated with one
+    stat of the file on every read.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_CONTENT_CACHE_BYTES, watch: bool = WATCH_ENABLED):
+        self.max_bytes = max_bytes
+        self.watch = watch and Observer is not None
+        if watch and Observer is None:
+            logger.warning("HTML_INDEX_WATCH=1 but watchdog is not installed; using mtime checks")
+        self._lock = threading.Lock()
+        self._listings = {}
+        self._contents = OrderedDict()   # path -> (mtime_ns, size, text)
+        self._cached_bytes = 0
+        self._observer = None
+        self.stats = {"list_calls": 0, "dirs_rescanned": 0, "hits": 0, "misses": 0, "evictions": 0}
+
+    def _on_change(self, root: str, *paths) -> None:
+        with self._lock:
+            listing = self._listings.get(root)
+            if listing is not None:
+                listing.dirty = True
+            for path in paths:
+                if path:
+                    self._drop(str(path))
 
-    def read_html_file(file_path: str) -> dict:
-        """Read HTML content from a file.
-        
-        Args:
-            file_path: Path to the HTML file (relative or absolute)
-            
-        Returns:
-            dict: {"success": bool, "content": str, "file_path": str, "error": str}
-        """
-        try:
-            path = Path(file_path)
-            if not path.is_absolute():
-                # Try relative to current directory
-                path = Path.cwd() / path
-            
-            if path.exists() and path.is_file():
-                content = path.read_text(encoding='utf-8')
-                return {
-                    "success": True,
-                    "content": content,
-                    "file_path": str(path.absolute())
-                }
-            else:
-                return {
-                    "success": False,
-                    "content": "",
-                    "file_path": str(path.absolute()),
-                    "error": "File does not exist"
-                }
-        except Exception as e:
+    def _start_watch(self, root: str) -> None:
+        if self._observer is None:
+            self._observer = Observer()
+            self._observer.daemon = True
+            self._observer.start()
+        self._observer.schedule(_WatchHandler(self, root), root, recursive=True)
+
+    def list_files(self, directory: Path) -> list:
+        root = str(directory.absolute())
+        with self._lock:
+            self.stats["list_calls"] += 1
+            listing = self._listings.get(root)
+            if listing is None:
+                listing = self._listings[root] = _DirectoryListing(Path(root))
+                if self.watch:
+                    self._start_watch(root)
+            self.stats["dirs_rescanned"] += listing.refresh(check_mtimes=not self.watch)
+            return listing.files()
+
+    def _drop(self, path: str) -> None:
+        entry = self._contents.pop(path, None)
+        if entry is not None:
+            self._cached_bytes -= entry[1]
+
+    def read(self, path: Path) -> str:
+        key = str(path.absolute())
+        st = path.stat()
+        with self._lock:
+            entry = self._contents.get(key)
+            if entry is not None and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+                self._contents.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry[2]
+            self.stats["misses"] += 1
+        text = path.read_text(encoding="utf-8")
+        with self._lock:
+            self._drop(key)
+            if st.st_size <= self.max_bytes:
+                self._contents[key] = (st.st_mtime_ns, st.st_size, text)
+                self._cached_bytes += st.st_size
+                while self._cached_bytes > self.max_bytes:
+                    _, evicted = self._contents.popitem(last=False)
+                    self._cached_bytes -= evicted[1]
+                    self.stats["evictions"] += 1
+        return text
+
+    def format_stats(self) -> str:
+        s = self.stats
+        return (
+            f"HTML file index: {s['list_calls']} listings ({s['dirs_rescanned']} directory rescans), "
+            f"{s['hits']} content hits, {s['misses']} misses, {s['evictions']} evictions, "
+            f"{self._cached_bytes / 1e6:.1f} MB cached"
+        )
+
+
+# Process-wide index used by the tools below
+html_file_index = HtmlFileIndex()
+
+
+def read_html_file(file_path: str) -> dict:
+    """Read HTML content from a file.
+
+    Args:
+        file_path: Path to the HTML file (relative or absolute)
+
+    Returns:
+        dict: {"success": bool, "content": str, "file_path": str, "error": str}
+    """
+    try:
+        path = _resolve(file_path)
+
+        if path.exists() and path.is_file():
+            content = html_file_index.read(path)
+            return {
+                "success": True,
+                "content": content,
+                "file_path": str(path.absolute())
+            }
+        else:
             return {
                 "success": False,
                 "content": "",
-                "file_path": file_path,
-                "error": str(e)
+                "file_path": str(path.absolute()),
+                "error": "File does not exist"
             }
-    
-
-    def list_html_files(directory: str = "./style_samples") -> dict:
-        """List HTML files in a directory (recursively searches subdirectories).
-        
-        Args:
-            directory: Directory path to search (default: ./style_samples)
-            
-        Returns:
-            dict: {"success": bool, "files": list, "directory": str, "error": str}
-        """
-        try:
-            dir_path = Path(directory)
-            if not dir_path.is_absolute():
-                dir_path = Path.cwd() / dir_path
-            
-            if dir_path.exists() and dir_path.is_dir():
-                # Use rglob for recursive search to find HTML files in subdirectories
-                html_files = list(dir_path.rglob("*.html")) + list(dir_path.rglob("*.htm"))
-                return {
-                    "success": True,
-                    "files": [str(f.relative_to(Path.cwd())) for f in html_files],
-                    "directory": str(dir_path.absolute())
-                }
-            else:
-                return {
-                    "success": False,
-                    "files": [],
-                    "directory": str(dir_path.absolute()),
-                    "error": "Directory does not exist"
-                }
-        except Exception as e:
+    except Exception as e:
+        return {
+            "success": False,
+            "content": "",
+            "file_path": file_path,
+            "error": str(e)
+        }
+
+
+def list_html_files(directory: str = "./style_samples", pattern: str = "",
+                    offset: int = 0, limit: int = 100) -> dict:
+    """List HTML files in a directory (recursively searches subdirectories).
+
+    Args:
+        directory: Directory path to search (default: ./style_samples)
+        pattern: Optional filter on the file path, a substring or glob such as "*promo*" (case-insensitive)
+        offset: Index of the first file to return, for paging through large template libraries (default: 0)
+        limit: Maximum number of files to return (default: 100)
+
+    Returns:
+        dict: {"success": bool, "files": list, "directory": str, "total": int, "next_offset": int | None, "error": str}
+    """
+    try:
+        dir_path = _resolve(directory)
+
+        if dir_path.exists() and dir_path.is_dir():
+            files = [_display_path(Path(f)) for f in html_file_index.list_files(dir_path)]
+            if pattern:
+                needle = pattern.lower()
+                if any(c in needle for c in "*?["):
+                    files = [f for f in files
+                             if fnmatch.fnmatch(f.lower(), needle) or fnmatch.fnmatch(Path(f).name.lower(), needle)]
+                else:
+                    files = [f for f in files if needle in f.lower()]
+            offset = max(0, offset)
+            limit = max(1, min(limit, MAX_PAGE_SIZE))
+            end = offset + limit
+            return {
+                "success": True,
+                "files": files[offset:end],
+                "directory": str(dir_path.absolute()),
+                "total": len(files),
+                "next_offset": end if end < len(files) else None
+            }
+        else:
             return {
                 "success": False,
                 "files": [],
-                "directory": directory,
-                "error": str(e)
+                "directory": str(dir_path.absolute()),
+                "error": "Directory does not exist"
             }
-    
+    except Exception as e:
+        return {
+            "success": False,
+            "files": [],
+            "directory": directory,
+            "error": str(e)
+        }
+
 
 # Create FunctionTool instances
-    read_html_tool = FunctionTool(
-        func=read_html_file
-    )
-    
-    list_html_files_tool = FunctionTool(
-        func=list_html_files
-    )
-    
+read_html_tool = FunctionTool(
+    func=read_html_file
+)
+
+list_html_files_tool = FunctionTool(
+    func=list_html_files
+)
+
 # Export tools as a list for easy import
 html_reader_tools = [read_html_tool, list_html_files_tool]
 
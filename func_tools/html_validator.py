@@ -0,0 +1,266 @@
+# html_validator.py
+# Deterministic checks of a newsletter against Visual_Design_Agent_Prompt and email-client constraints,
+# split by section so a failing part can be regenerated on its own
+
+import html
+import os
+import re
+
+from func_tools.template_renderer import is_button, parse_document
+
+VALIDATOR_VERSION = "validator-1"
+
+# Widest fixed width (px) a single-column email layout may use
+EMAIL_MAX_WIDTH = int(os.environ.get("EMAIL_MAX_WIDTH", 700))
+
+# rule -> (severity, what the document must satisfy). Errors fail validation, warnings are reported.
+RULES = {
+    "document": ("error", "A complete HTML document with <html> and <body>"),
+    "unclosed_tag": ("error", "Every table, block and inline element is closed in the right order"),
+    "stray_end_tag": ("error", "No end tags without a matching start tag"),
+    "script": ("error", "No scripts, event handler attributes or javascript: links"),
+    "external_font": ("error", "No external fonts (font stylesheet links, @import, @font-face with url())"),
+    "external_stylesheet": ("error", "No external stylesheets; CSS is inline"),
+    "unsupported_element": ("error", "No forms, iframes, video, audio, object or embed (email clients drop them)"),
+    "missing_title": ("error", "A title heading (h1)"),
+    "missing_cta": ("error", "A clear CTA button: a link with a URL, styled with a background color"),
+    "cta_link": ("warning", "The CTA button links to a real URL, not a placeholder"),
+    "too_wide": ("warning", f"A single column no wider than {EMAIL_MAX_WIDTH}px"),
+    "viewport": ("warning", "A <meta name=\"viewport\"> tag for mobile clients"),
+    "image_alt": ("warning", "Images have alt text"),
+}
+
+# End tags HTML lets you leave out; email clients cope with these
+_OPTIONAL_END_TAGS = {"html", "head", "body", "p", "li", "dt", "dd", "tr", "td", "th", "thead", "tbody", "tfoot",
+                      "option", "colgroup"}
+_UNSUPPORTED_TAGS = {"form", "input", "button", "select", "textarea", "iframe", "video", "audio", "object",
+                     "embed", "frame", "frameset"}
+# Wrappers descended into when looking for the document's sections
+_CONTAINER_TAGS = {"table", "tbody", "tr", "td", "div", "center", "section", "main", "article"}
+_NON_SECTION_TAGS = {"style", "script", "meta", "link", "title", "head"}
+
+_FONT_HOSTS_RE = re.compile(r"fonts\.(?:googleapis|gstatic)\.com|use\.typekit\.net|fonts\.bunny\.net", re.I)
+_IMPORT_RE = re.compile(r"@import\b[^;]*;?", re.I)
+_FONT_FACE_RE = re.compile(r"@font-face\s*\{[^}]*\}", re.I)
+_REMOTE_URL_RE = re.compile(r"url\(\s*['\"]?(?:https?:)?//", re.I)
+_WIDTH_RE = re.compile(r"(?:^|;)\s*(?:min-)?width\s*:\s*(\d+)px", re.I)
+_TAG_RE = re.compile(r"<[^>]+>")
+_SCRIPT_BLOCK_RE = re.compile(r"<script\b.*?(?:</script\s*>|$)", re.S | re.I)
+_EVENT_ATTR_RE = re.compile(r"""\s+on[a-z]+\s*=\s*(?:"[^"]*"|'[^']*'|[^\s>]+)""", re.I)
+_JS_HREF_RE = re.compile(r"""(\shref\s*=\s*)(["'])\s*javascript:[^"']*\2""", re.I)
+_LINK_TAG_RE = re.compile(r"<link\b[^>]*>", re.I)
+_STYLE_BLOCK_RE = re.compile(r"(<style\b[^>]*>)(.*?)(</style\s*>)", re.S | re.I)
+
+
+def _text(fragment: str) -> str:
+    return " ".join(html.unescape(_TAG_RE.sub(" ", fragment)).split())
+
+
+def _fixed_width(element):
+    width = (element.attrs.get("width") or "").strip().lower().removesuffix("px")
+    if width.isdigit():
+        return int(width)
+    match = _WIDTH_RE.search(element.attrs.get("style") or "")
+    return int(match.group(1)) if match else None
+
+
+def _is_stylesheet(element) -> bool:
+    return element.tag == "link" and "stylesheet" in (element.attrs.get("rel") or "").lower()
+
+
+def find_sections(elements: list, length: int) -> list:
+    """Top-level content blocks of a document as (element, start, end) source spans.
+
+    From <body>, single wrappers (the centering table, its row and cell,
+    the 600px inner table, ...) are descended into until a container with
+    several children is found; those children are the sections (header,
+    hero, body, CTA, footer rows in a typical email layout).
+    """
+    children = {}
+    for element in elements:
+        children.setdefault(element.parent, []).append(element)
+    node = next((e for e in elements if e.tag == "body"), None)
+    while True:
+        kids = [k for k in children.get(node, []) if k.tag not in _NON_SECTION_TAGS]
+        if len(kids) == 1 and kids[0].tag in _CONTAINER_TAGS and children.get(kids[0]):
+            node = kids[0]
+            continue
+        break
+    limit = node.content_end if node is not None and node.end > node.content_start else length
+    sections = []
+    for i, kid in enumerate(kids):
+        end = kid.end
+        if end <= kid.content_start:
+            # Void or never closed: the section runs up to the next one
+            end = kids[i + 1].start if i + 1 < len(kids) else max(limit, kid.end)
+        sections.append((kid, kid.start, end))
+    return sections
+
+
+def validate_html(source: str) -> dict:
+    """Check a newsletter document against RULES.
+
+    Returns:
+        dict: {"version", "valid", "errors", "warnings", "issues", "sections"} -
+        each issue is {"rule", "severity", "message", "offset", "section"}, with
+        section the index into "sections" ({"index", "tag", "start", "end",
+        "label"}) or None for document-level problems
+    """
+    document = parse_document(source)
+    elements = document.elements
+    sections = find_sections(elements, len(source))
+    issues = []
+
+    def section_of(offset):
+        if offset is None:
+            return None
+        for index, (_element, start, end) in enumerate(sections):
+            if start <= offset < end:
+                return index
+        return None
+
+    def issue(rule, message, offset=None, section=None):
+        issues.append({"rule": rule, "severity": RULES[rule][0], "message": message, "offset": offset,
+                       "section": section_of(offset) if section is None else section})
+
+    def line(offset):
+        return source.count("\n", 0, offset) + 1
+
+    tags = {e.tag for e in elements}
+    if "html" not in tags or "body" not in tags:
+        issue("document", "The document has no " + " or ".join(
+            f"<{t}>" for t in ("html", "body") if t not in tags))
+
+    for element in document.unclosed:
+        if element.tag not in _OPTIONAL_END_TAGS:
+            issue("unclosed_tag", f"<{element.tag}> opened on line {line(element.start)} is never closed",
+                  element.start)
+    for tag, offset in document.stray_end_tags:
+        issue("stray_end_tag", f"</{tag}> on line {line(offset)} has no matching <{tag}>", offset)
+
+    buttons = []
+    links = []
+    for element in elements:
+        attrs = element.attrs
+        if element.tag == "script":
+            issue("script", f"<script> on line {line(element.start)}", element.start)
+        for name, value in attrs.items():
+            if name.startswith("on"):
+                issue("script", f"{name} handler on <{element.tag}> (line {line(element.start)})", element.start)
+            elif name == "href" and (value or "").strip().lower().startswith("javascript:"):
+                issue("script", f"javascript: link on line {line(element.start)}", element.start)
+        if _is_stylesheet(element):
+            href = attrs.get("href") or ""
+            if _FONT_HOSTS_RE.search(href):
+                issue("external_font", f"Font stylesheet {href}", element.start)
+            elif href:
+                issue("external_stylesheet", f"Stylesheet link {href}", element.start)
+        if element.tag == "style":
+            css = source[element.content_start:element.content_end]
+            if _IMPORT_RE.search(css):
+                issue("external_font" if _FONT_HOSTS_RE.search(css) else "external_stylesheet",
+                      f"@import in <style> on line {line(element.start)}", element.start)
+            for face in _FONT_FACE_RE.findall(css):
+                if _REMOTE_URL_RE.search(face):
+                    issue("external_font", f"@font-face loading a remote font (line {line(element.start)})",
+                          element.start)
+        if element.tag in _UNSUPPORTED_TAGS:
+            issue("unsupported_element", f"<{element.tag}> on line {line(element.start)}", element.start)
+        if element.tag in ("table", "div", "td") and (_fixed_width(element) or 0) > EMAIL_MAX_WIDTH:
+            issue("too_wide", f"<{element.tag}> on line {line(element.start)} is {_fixed_width(element)}px wide",
+                  element.start)
+        if element.tag == "img" and not (attrs.get("alt") or "").strip():
+            issue("image_alt", f"Image {attrs.get('src') or ''} on line {line(element.start)} has no alt text",
+                  element.start)
+        if element.tag == "a":
+            links.append(element)
+            if is_button(element):
+                buttons.append(element)
+
+    if not any(e.tag == "h1" and _text(source[e.content_start:e.content_end]) for e in elements):
+        # Repair where a lower heading stands in for the title, else in the first section with text
+        heading = next((e for e in elements if e.tag in ("h2", "h3")
+                        and section_of(e.start) is not None and _text(source[e.content_start:e.content_end])), None)
+        if heading is not None:
+            target = section_of(heading.start)
+        else:
+            target = next((i for i, (_element, start, end) in enumerate(sections) if _text(source[start:end])),
+                          None)
+        issue("missing_title", "No h1 title", section=target)
+
+    if not buttons:
+        # Repair where a plain link stands in for the button, else in the longest text section
+        if links:
+            target = section_of(links[-1].start)
+        else:
+            lengths = [len(_text(source[start:end])) for _element, start, end in sections]
+            target = lengths.index(max(lengths)) if lengths else None
+        issue("missing_cta", "No CTA button (a link styled with a background color)", section=target)
+    elif all((b.attrs.get("href") or "").strip() in ("", "#") for b in buttons):
+        issue("cta_link", "The CTA button has no URL", buttons[0].start)
+
+    if not any(e.tag == "meta" and (e.attrs.get("name") or "").lower() == "viewport" for e in elements):
+        issue("viewport", "No <meta name=\"viewport\"> tag")
+
+    errors = sum(1 for i in issues if i["severity"] == "error")
+    return {
+        "version": VALIDATOR_VERSION,
+        "valid": errors == 0,
+        "errors": errors,
+        "warnings": len(issues) - errors,
+        "issues": issues,
+        "sections": [
+            {"index": index, "tag": element.tag, "start": start, "end": end,
+             "label": _text(source[start:end])[:60]}
+            for index, (element, start, end) in enumerate(sections)
+        ],
+    }
+
+
+def autofix_html(source: str) -> tuple:
+    """Remove what the prompt forbids and needs no model to fix.
+
+    Drops <script> blocks, event handler attributes, javascript: links (to
+    "#"), external font/stylesheet links and @import/remote @font-face rules.
+
+    Returns:
+        tuple: (html, rules) - the fixed document and the rules it fixed
+    """
+    fixed = []
+
+    def sub(pattern, replacement, text, rule):
+        text, count = pattern.subn(replacement, text)
+        if count and rule not in fixed:
+            fixed.append(rule)
+        return text
+
+    source = sub(_SCRIPT_BLOCK_RE, "", source, "script")
+    source = sub(_EVENT_ATTR_RE, "", source, "script")
+    source = sub(_JS_HREF_RE, r'\1\2#\2', source, "script")
+
+    def drop_link(match):
+        tag = match.group(0)
+        if "stylesheet" not in tag.lower():
+            return tag
+        fixed_rule = "external_font" if _FONT_HOSTS_RE.search(tag) else "external_stylesheet"
+        if fixed_rule not in fixed:
+            fixed.append(fixed_rule)
+        return ""
+
+    source = _LINK_TAG_RE.sub(drop_link, source)
+
+    def clean_style(match):
+        css = _IMPORT_RE.sub("", match.group(2))
+        css = _FONT_FACE_RE.sub(lambda m: "" if _REMOTE_URL_RE.search(m.group(0)) else m.group(0), css)
+        if css != match.group(2) and "external_font" not in fixed:
+            fixed.append("external_font")
+        return match.group(1) + css + match.group(3)
+
+    source = _STYLE_BLOCK_RE.sub(clean_style, source)
+    return source, fixed
+
+
+def format_issues(issues: list) -> str:
+    return "\n".join(f"- [{i['severity']}] {i['rule']}: {i['message']} (must have: {RULES[i['rule']][1]})"
+                     for i in issues)
+
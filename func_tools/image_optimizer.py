@@ -0,0 +1,142 @@
+# image_optimizer.py
+# Resizes and recompresses newsletter images into the output directory, with a content-hash cache
+
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+try:
+    from PIL import Image
+except ImportError:  # optional: without Pillow images are copied unchanged (still deduplicated)
+    Image = None
+
+from func_tools.output_store import atomic_write_bytes
+
+IMAGE_CACHE_DIR = os.environ.get("IMAGE_CACHE_DIR", "./.cache/images")
+# Emails are ~600px wide; 2x that stays sharp on high-density screens
+IMAGE_MAX_WIDTH = int(os.environ.get("IMAGE_MAX_WIDTH", 1200))
+IMAGE_JPEG_QUALITY = int(os.environ.get("IMAGE_JPEG_QUALITY", 82))
+OPTIMIZER_VERSION = "images-1"
+
+IMAGES_DIR = "images"
+
+
+def display_width(attrs: dict):
+    """Pixel width an <img> is shown at, from its width attribute or style (None if unknown)."""
+    width = (attrs.get("width") or "").strip().lower().removesuffix("px")
+    if width.isdigit():
+        return int(width)
+    match = re.search(r"(?:^|;)\s*(?:max-)?width\s*:\s*(\d+)px", attrs.get("style") or "", re.I)
+    return int(match.group(1)) if match else None
+
+
+def _short_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:10]
+
+
+class ImageOptimizer:
+    """Writes email-ready copies of images into a run's output directory.
+
+    Images wider than twice their display width (or IMAGE_MAX_WIDTH) are
+    downscaled; JPEGs are recompressed (progressive, IMAGE_JPEG_QUALITY) and
+    PNGs re-encoded with optimize, keeping whichever of the original and the
+    new file is smaller. Results are cached by the hash of the source bytes
+    and settings in IMAGE_CACHE_DIR, so each distinct image is processed
+    once across runs and campaigns. Output names carry the hash of their
+    content (images/<name>-<hash>.<ext>), which dedupes identical images and
+    makes a second pass over already optimized files a no-op.
+    """
+
+    def __init__(self, cache_dir=IMAGE_CACHE_DIR, max_width: int = IMAGE_MAX_WIDTH,
+                 jpeg_quality: int = IMAGE_JPEG_QUALITY):
+        self.cache_dir = Path(cache_dir)
+        self.max_width = max_width
+        self.jpeg_quality = jpeg_quality
+        self._lock = threading.Lock()
+        self.stats = {"images": 0, "cache_hits": 0, "processed": 0, "bytes_in": 0, "bytes_out": 0, "seconds": 0.0}
+
+    def _target_width(self, display_width) -> int:
+        if display_width:
+            return min(self.max_width, 2 * display_width)
+        return self.max_width
+
+    def _process(self, data: bytes, target_width: int) -> bytes:
+        if Image is None:
+            return data
+        with Image.open(io.BytesIO(data)) as image:
+            image_format = image.format
+            if image_format not in ("JPEG", "PNG"):
+                return data   # GIF (maybe animated), WebP, ...: left as they are
+            resized = image.width > target_width
+            if resized:
+                height = max(1, round(image.height * target_width / image.width))
+                image = image.resize((target_width, height), Image.LANCZOS)
+            out = io.BytesIO()
+            if image_format == "JPEG":
+                if image.mode not in ("RGB", "L"):
+                    image = image.convert("RGB")
+                image.save(out, "JPEG", quality=self.jpeg_quality, optimize=True, progressive=True)
+            else:
+                image.save(out, "PNG", optimize=True)
+        optimized = out.getvalue()
+        return optimized if resized or len(optimized) < len(data) else data
+
+    def optimize(self, source, store, display_width: int = None) -> dict:
+        """Write an optimized copy of source into store's images/ directory.
+
+        Args:
+            source: Image file
+            store: OutputStore of the run
+            display_width: Width the image is shown at (e.g. the img width attribute)
+
+        Returns:
+            dict: {"file": "images/<name>-<hash>.<ext>", "bytes_in": int, "bytes": int, "cached": bool}
+        """
+        started = time.perf_counter()
+        source = Path(source)
+        data = source.read_bytes()
+        images_dir = store.path(IMAGES_DIR)
+        if source.parent.absolute() == images_dir and source.stem.endswith(f"-{_short_hash(data)}"):
+            # Already an output of this optimizer
+            return {"file": f"{IMAGES_DIR}/{source.name}", "bytes_in": len(data), "bytes": len(data), "cached": True}
+
+        settings = {"version": OPTIMIZER_VERSION, "width": self._target_width(display_width),
+                    "quality": self.jpeg_quality, "pillow": Image is not None}
+        key = hashlib.sha256(data + json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()[:32]
+        cache_path = self.cache_dir / f"{key}{source.suffix.lower()}"
+        cached = cache_path.is_file()
+        if cached:
+            optimized = cache_path.read_bytes()
+        else:
+            optimized = self._process(data, settings["width"])
+            atomic_write_bytes(cache_path, optimized)
+
+        name = f"{source.stem}-{_short_hash(optimized)}{source.suffix.lower()}"
+        target = images_dir / name
+        if not target.is_file():
+            store.write_bytes(target, optimized)
+        with self._lock:
+            self.stats["images"] += 1
+            self.stats["cache_hits" if cached else "processed"] += 1
+            self.stats["bytes_in"] += len(data)
+            self.stats["bytes_out"] += len(optimized)
+            self.stats["seconds"] += time.perf_counter() - started
+        return {"file": f"{IMAGES_DIR}/{name}", "bytes_in": len(data), "bytes": len(optimized), "cached": cached}
+
+    def format_stats(self) -> str:
+        saved = self.stats["bytes_in"] - self.stats["bytes_out"]
+        return (
+            f"Image optimizer: {self.stats['images']} images ({self.stats['cache_hits']} cached, "
+            f"{self.stats['processed']} processed), {saved / 1024:.1f} KB saved, "
+            f"{self.stats['seconds'] * 1000:.0f} ms"
+            + ("" if Image is not None else " [Pillow not installed: copied only]")
+        )
+
+
+# Process-wide optimizer (shared by the renderer, post-processor and concurrent runs)
+image_optimizer = ImageOptimizer()
@@ -1,17 +1,22 @@
 # mcp_pdf_reader.py
-from google.adk.tools.mcp_tool.mcp_toolset import McpToolset
 from google.adk.tools.mcp_tool.mcp_session_manager import StdioConnectionParams
 from mcp import StdioServerParameters
-import os
+
+from func_tools.mcp_pool import McpSessionPool, mcp_server_env
 
 # MCP PDF Reader Server
 # Using pdf-reader-mcp from PyPI - extracts text from PDFs
 # Supports: text extraction, OCR, directory processing
+#
+# Served from a pool of pre-started server processes (MCP_POOL_SIZE, default 2)
+# that is shared by all agent invocations and concurrent runs of this process,
+# so Data_Collection_Agent does not pay the uvx cold start on every call.
 
-# Exclude GOOGLE_API_KEY from env to avoid any validation errors
-env_vars = {k: v for k, v in os.environ.items() if k != "GOOGLE_API_KEY"}
+# Minimal environment (computed once); GOOGLE_API_KEY and other secrets are not passed on
+env_vars = mcp_server_env()
 
-mcp_pdf_reader_server = McpToolset(
+mcp_pdf_reader_server = McpSessionPool(
+    "pdf-reader",
     connection_params=StdioConnectionParams(
         server_params=StdioServerParameters(
             command="uvx",  # Run MCP server via uvx
@@ -29,4 +34,3 @@ mcp_pdf_reader_server = McpToolset(
 )
 
 print("MCP PDF Reader Tool created")
-
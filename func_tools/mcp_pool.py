@@ -0,0 +1,233 @@
+# mcp_pool.py
+# Pool of pre-started MCP server sessions, shared across agents and concurrent runs, with health checks
+
+import asyncio
+import logging
+import os
+import time
+
+import anyio
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.base_toolset import BaseToolset
+from google.adk.tools.mcp_tool.mcp_toolset import McpToolset
+from mcp.types import CONNECTION_CLOSED
+
+logger = logging.getLogger(__name__)
+
+MCP_POOL_SIZE = int(os.environ.get("MCP_POOL_SIZE", 2))
+# Seconds between pings of idle servers (0 disables the background check)
+MCP_HEALTH_INTERVAL = float(os.environ.get("MCP_HEALTH_INTERVAL", 30))
+MCP_PING_TIMEOUT = float(os.environ.get("MCP_PING_TIMEOUT", 5))
+
+# What a server process needs from our environment (never the API keys)
+_ENV_PASSTHROUGH = {"PATH", "HOME", "USER", "LANG", "TMPDIR", "TEMP", "TMP", "SYSTEMROOT", "APPDATA",
+                    "LOCALAPPDATA", "HTTP_PROXY", "HTTPS_PROXY", "NO_PROXY", "SSL_CERT_FILE", "SSL_CERT_DIR"}
+_ENV_PREFIXES = ("LC_", "UV_", "XDG_")
+
+
+def mcp_server_env(extra: dict = None) -> dict:
+    """Minimal environment for MCP server subprocesses."""
+    env = {k: v for k, v in os.environ.items() if k in _ENV_PASSTHROUGH or k.startswith(_ENV_PREFIXES)}
+    env.update(extra or {})
+    return env
+
+
+def is_transport_error(error: BaseException) -> bool:
+    """Whether a failed call means the server process or its connection is gone.
+
+    Tool errors (bad arguments, a file the server cannot read) leave the
+    server usable and must not restart it.
+    """
+    if isinstance(error, (OSError, EOFError, asyncio.TimeoutError, anyio.ClosedResourceError,
+                          anyio.BrokenResourceError, anyio.EndOfStream)):
+        return True
+    # MCP reports a closed connection as an error with this code (McpError/MCPError by version)
+    return getattr(getattr(error, "error", None), "code", None) == CONNECTION_CLOSED
+
+
+class _Member:
+    """One server process of the pool (an McpToolset with its own session)."""
+
+    def __init__(self, index: int, toolset: McpToolset):
+        self.index = index
+        self.toolset = toolset
+        self.tools = {}
+        self.healthy = False
+        self.in_flight = 0
+        # Restart deferred until the calls still running on this server have returned
+        self.restart_pending = False
+
+
+class _PooledMcpTool(BaseTool):
+    """Tool whose calls go to the least busy healthy server of the pool."""
+
+    def __init__(self, pool, template: BaseTool):
+        super().__init__(name=template.name, description=template.description)
+        self._pool = pool
+        self._template = template
+
+    async def process_llm_request(self, *, tool_context, llm_request):
+        # The server's own tool declares itself (as ADK formats MCP tools); calls come to the pool
+        await self._template.process_llm_request(tool_context=tool_context, llm_request=llm_request)
+        llm_request.tools_dict[self.name] = self
+
+    async def run_async(self, *, args, tool_context):
+        return await self._pool.call(self.name, args, tool_context)
+
+
+class McpSessionPool(BaseToolset):
+    """Drop-in for McpToolset that keeps `size` server processes warm.
+
+    The servers are started (spawn + MCP handshake + tool listing) once, on
+    first use or by start(), and then shared by every agent invocation and
+    concurrent run in the process; the tool list is not fetched again on
+    each model step. A background task checks idle servers (a tools/list
+    round trip through McpToolset.get_tools()) and restarts the ones that
+    do not answer. A call that fails at the transport level (see
+    is_transport_error) takes its server out of rotation; the server is
+    restarted once the calls still running on it have returned, while tool
+    errors leave it alone. Only public McpToolset/BaseTool APIs are used.
+    Spawn/handshake latency, restarts and calls are kept in stats.
+
+    Args:
+        name: Name used in logs and stats
+        connection_params: Connection parameters, as for McpToolset
+        size: Number of server processes (default: MCP_POOL_SIZE)
+    """
+
+    def __init__(self, name: str, connection_params, size: int = MCP_POOL_SIZE, tool_filter=None):
+        super().__init__(tool_filter=tool_filter)
+        self.name = name
+        self.size = max(1, size)
+        self._connection_params = connection_params
+        self._members = [_Member(i, McpToolset(connection_params=connection_params)) for i in range(self.size)]
+        self._tools = None
+        self._loop = None
+        self._start_lock = None
+        self._health_task = None
+        self._restarting = {}
+        self.stats = {"spawns": 0, "restarts": 0, "calls": 0, "failures": 0, "spawn_seconds": []}
+
+    async def _spawn(self, member: _Member) -> None:
+        started = time.perf_counter()
+        tools = await member.toolset.get_tools()
+        member.tools = {tool.name: tool for tool in tools}
+        member.healthy = True
+        seconds = time.perf_counter() - started
+        self.stats["spawns"] += 1
+        self.stats["spawn_seconds"].append(round(seconds, 3))
+        logger.info("MCP %s server %d ready in %.2fs (%d tools)", self.name, member.index, seconds, len(tools))
+
+    async def start(self) -> None:
+        """Start all servers concurrently (idempotent per event loop)."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Sessions are bound to the loop they were created in
+            self._loop, self._tools, self._start_lock = loop, None, asyncio.Lock()
+            self._restarting = {}
+        async with self._start_lock:
+            if self._tools is not None:
+                return
+            results = await asyncio.gather(*(self._spawn(m) for m in self._members), return_exceptions=True)
+            for member, result in zip(self._members, results):
+                if isinstance(result, Exception):
+                    member.healthy = False
+                    logger.warning("MCP %s server %d failed to start: %s", self.name, member.index, result)
+            ready = [m for m in self._members if m.healthy]
+            if not ready:
+                raise ConnectionError(f"No MCP {self.name} server could be started: {results[0]}")
+            self._tools = [_PooledMcpTool(self, tool) for tool in ready[0].tools.values()]
+            if MCP_HEALTH_INTERVAL > 0:
+                self._health_task = loop.create_task(self._health_loop())
+
+    async def get_tools(self, readonly_context=None) -> list:
+        if self._tools is None or self._loop is not asyncio.get_running_loop():
+            await self.start()
+        return [tool for tool in self._tools if self._is_tool_selected(tool, readonly_context)]
+
+    async def _acquire(self) -> _Member:
+        healthy = [m for m in self._members if m.healthy]
+        if not healthy:
+            # Everything is down: wait for (or start) a restart of the least busy server
+            await self._restart(min(self._members, key=lambda m: m.in_flight))
+            healthy = [m for m in self._members if m.healthy]
+        return min(healthy, key=lambda m: m.in_flight)
+
+    async def call(self, name: str, args: dict, tool_context):
+        member = await self._acquire()
+        member.in_flight += 1
+        self.stats["calls"] += 1
+        try:
+            return await member.tools[name].run_async(args=args, tool_context=tool_context)
+        except Exception as e:
+            self.stats["failures"] += 1
+            if is_transport_error(e):
+                # No new calls go to this server; the ones in flight finish (or fail) first
+                member.healthy = False
+                member.restart_pending = True
+            raise
+        finally:
+            member.in_flight -= 1
+            if member.restart_pending and member.in_flight == 0:
+                member.restart_pending = False
+                asyncio.get_running_loop().create_task(self._restart(member))
+
+    async def _restart(self, member: _Member) -> None:
+        # One restart per member at a time; concurrent callers wait for it
+        task = self._restarting.get(member.index)
+        if task is None:
+            task = self._restarting[member.index] = asyncio.get_running_loop().create_task(
+                self._do_restart(member)
+            )
+            task.add_done_callback(lambda _t: self._restarting.pop(member.index, None))
+        await asyncio.shield(task)
+
+    async def _do_restart(self, member: _Member) -> None:
+        member.healthy = False
+        logger.warning("Restarting MCP %s server %d", self.name, member.index)
+        try:
+            await member.toolset.close()
+        except Exception as e:
+            logger.debug("Closing MCP %s server %d failed: %s", self.name, member.index, e)
+        member.toolset = McpToolset(connection_params=self._connection_params)
+        self.stats["restarts"] += 1
+        await self._spawn(member)
+
+    async def check(self) -> dict:
+        """List every idle server's tools; restart the ones that don't answer. Returns {index: healthy}."""
+        for member in self._members:
+            if member.in_flight:
+                continue   # busy means alive enough; don't queue a check behind a long call
+            try:
+                await asyncio.wait_for(member.toolset.get_tools(), MCP_PING_TIMEOUT)
+                member.healthy = True
+            except Exception as e:
+                logger.warning("MCP %s server %d failed its health check: %s", self.name, member.index, e)
+                try:
+                    await self._restart(member)
+                except Exception as restart_error:
+                    logger.warning("MCP %s server %d restart failed: %s", self.name, member.index, restart_error)
+        return {m.index: m.healthy for m in self._members}
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(MCP_HEALTH_INTERVAL)
+            await self.check()
+
+    async def close(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        for member in self._members:
+            await member.toolset.close()
+            member.healthy = False
+        self._tools = None
+
+    def format_stats(self) -> str:
+        spawn = self.stats["spawn_seconds"]
+        healthy = sum(1 for m in self._members if m.healthy)
+        return (
+            f"MCP {self.name} pool: {healthy}/{self.size} healthy, {self.stats['spawns']} spawns "
+            f"(mean {sum(spawn) / len(spawn) if spawn else 0.0:.2f}s, max {max(spawn, default=0.0):.2f}s), "
+            f"{self.stats['restarts']} restarts, {self.stats['calls']} calls, {self.stats['failures']} failures"
+        )
@@ -1,30 +1,31 @@
 # newsletter_file_tools.py
 # Function tools for newsletter file operations
+#
+# Paths are resolved in the output directory of the current run (session
+# state "output_dir", default ./output), so concurrent runs never write to
+# the same files. "./output/<file>" means <file> in that directory.
 
 from google.adk.tools.function_tool import FunctionTool
-from pathlib import Path
+from google.adk.tools.tool_context import ToolContext
 
+from func_tools.output_store import output_store_for
 
-def write_file(file_path: str, content: str) -> dict:
+CONTENT_FILE_NAME = "newsletter_content.txt"
+
+
+def write_file(file_path: str, content: str, tool_context: ToolContext = None) -> dict:
     """Write content to a file.
     
     Args:
-        file_path: Path to the file (relative or absolute)
+        file_path: Path to the file (relative to the run's output directory, or absolute)
         content: Content to write to the file
         
     Returns:
         dict: {"success": bool, "file_path": str, "error": str}
     """
     try:
-        path = Path(file_path)
-        if not path.is_absolute():
-            path = Path.cwd() / path
-        
-        # Create parent directories if they don't exist
-        path.parent.mkdir(parents=True, exist_ok=True)
-        
-        # Write the file
-        path.write_text(content, encoding='utf-8')
+        # Written to a temporary file and renamed into place (atomic)
+        path = output_store_for(tool_context).write_text(file_path, content)
         return {
             "success": True,
             "file_path": str(path.absolute()),
@@ -38,13 +39,13 @@ def write_file(file_path: str, content: str) -> dict:
         }
 
 
-def check_newsletter_content_exists() -> dict:
+def check_newsletter_content_exists(tool_context: ToolContext = None) -> dict:
     """Check if ./output/newsletter_content.txt exists.
     
     Returns:
         dict: {"exists": bool, "file_path": str}
     """
-    file_path = Path("./output/newsletter_content.txt")
+    file_path = output_store_for(tool_context).path(CONTENT_FILE_NAME)
     exists = file_path.exists() and file_path.is_file()
     return {
         "exists": exists,
@@ -52,13 +53,13 @@ def check_newsletter_content_exists() -> dict:
     }
 
 
-def read_newsletter_content() -> dict:
+def read_newsletter_content(tool_context: ToolContext = None) -> dict:
     """Read the content from ./output/newsletter_content.txt file.
     
     Returns:
         dict: {"content": str, "file_path": str, "success": bool}
     """
-    file_path = Path("./output/newsletter_content.txt")
+    file_path = output_store_for(tool_context).path(CONTENT_FILE_NAME)
     try:
         if file_path.exists() and file_path.is_file():
             content = file_path.read_text(encoding='utf-8')
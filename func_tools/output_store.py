@@ -0,0 +1,155 @@
+# output_store.py
+# Run-scoped output directories with atomic writes and a versioned artifact manifest
+
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:   # Windows: merges into a shared file run without a cross-process lock
+    fcntl = None
+
+# Session state key holding the run's output directory; tools resolve their paths through it
+OUTPUT_DIR_KEY = "output_dir"
+DEFAULT_OUTPUT_DIR = os.environ.get("NEWSLETTER_OUTPUT_DIR", "./output")
+ARTIFACTS_NAME = ".artifacts.json"
+
+# mkstemp creates 0600 files; renamed artifacts get the usual umask-based mode
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def atomic_write_bytes(path, data: bytes) -> Path:
+    """Write data to a temporary file next to path, then rename it into place.
+
+    Readers (and a concurrent run of the same output_dir) see either the old
+    or the new file, never a partial one.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_name, 0o666 & ~_UMASK)
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+    return path
+
+
+def atomic_write_text(path, text: str) -> Path:
+    return atomic_write_bytes(path, text.encode("utf-8"))
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """Exclusive lock on a sidecar file, so processes merging into path take turns."""
+    if fcntl is None:
+        yield
+        return
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_name(path.name + ".lock"), "a") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+class OutputStore:
+    """Artifacts of one run, kept in their own directory.
+
+    Every write is atomic and recorded in <root>/.artifacts.json with its
+    sha256, size and a version number that increases each time the content
+    changes, so concurrent runs never share files and a run's outputs can be
+    checked against what was written.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root).absolute()
+        self._lock = threading.Lock()
+
+    def path(self, name) -> Path:
+        """Absolute path of an artifact; relative names are placed under the run directory."""
+        path = Path(name)
+        if path.is_absolute():
+            return path
+        # Prompts say "./output/<file>": that means this run's directory
+        if path.parts and path.parts[0] == "output":
+            path = Path(*path.parts[1:])
+        return (self.root / path).absolute()
+
+    def _load_artifacts(self) -> dict:
+        try:
+            return json.loads((self.root / ARTIFACTS_NAME).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def artifacts(self) -> dict:
+        with self._lock:
+            return self._load_artifacts()
+
+    def write_bytes(self, name, data: bytes) -> Path:
+        path = atomic_write_bytes(self.path(name), data)
+        digest = hashlib.sha256(data).hexdigest()
+        try:
+            key = str(path.relative_to(self.root))
+        except ValueError:
+            return path   # outside the run directory: written, but not tracked
+        with self._lock:
+            artifacts = self._load_artifacts()
+            previous = artifacts.get(key, {})
+            if previous.get("sha256") != digest:
+                artifacts[key] = {
+                    "sha256": digest,
+                    "bytes": len(data),
+                    "version": previous.get("version", 0) + 1,
+                    "written_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                }
+                atomic_write_text(self.root / ARTIFACTS_NAME, json.dumps(artifacts, indent=2))
+        return path
+
+    def write_text(self, name, text: str) -> Path:
+        return self.write_bytes(name, text.encode("utf-8"))
+
+    def read_text(self, name) -> str:
+        return self.path(name).read_text(encoding="utf-8")
+
+    def exists(self, name) -> bool:
+        return self.path(name).is_file()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_output_store(output_dir=None) -> OutputStore:
+    """Process-wide store for an output directory (one lock per directory)."""
+    root = str(Path(output_dir or DEFAULT_OUTPUT_DIR).absolute())
+    with _stores_lock:
+        store = _stores.get(root)
+        if store is None:
+            store = _stores[root] = OutputStore(root)
+        return store
+
+
+def output_store_for(tool_context=None) -> OutputStore:
+    """Store of the run a tool is called in, from the session state (default: ./output)."""
+    output_dir = None
+    if tool_context is not None:
+        output_dir = tool_context.state.get(OUTPUT_DIR_KEY)
+    return get_output_store(output_dir)
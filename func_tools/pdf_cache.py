@@ -0,0 +1,284 @@
+# pdf_cache.py
+# On-disk, content-addressed cache of extracted PDF text (per page)
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from google.adk.tools.function_tool import FunctionTool
+
+from func_tools.pdf_text_reader import (
+    EXTRACTOR_VERSION,
+    extract_pdf_pages,
+    extract_pdfs_parallel
+)
+
+DEFAULT_CACHE_DIR = os.environ.get("PDF_CACHE_DIR", "./.cache/pdf_text")
+DEFAULT_MAX_BYTES = int(os.environ.get("PDF_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path) -> str:
+    """Return the hex sha256 of a file's content, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PdfTextCache:
+    """Content-addressed store for per-page PDF text.
+
+    Entries are keyed by the sha256 of the PDF bytes plus the extractor
+    version, so a renamed file still hits and an edited file always misses.
+    The cache directory is bounded by max_bytes; least recently used entries
+    (by file mtime, refreshed on every hit) are evicted first.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES,
+                 extractor=extract_pdf_pages, extractor_version=EXTRACTOR_VERSION):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.extractor = extractor
+        self.extractor_version = extractor_version
+        self._lock = threading.Lock()
+        # (path, size, mtime_ns) -> sha256, avoids rehashing unchanged files
+        self._hash_memo = {}
+        self._counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def content_hash(self, path) -> str:
+        path = Path(path)
+        st = path.stat()
+        memo_key = (str(path.resolve()), st.st_size, st.st_mtime_ns)
+        sha = self._hash_memo.get(memo_key)
+        if sha is None:
+            sha = file_sha256(path)
+            self._hash_memo[memo_key] = sha
+        return sha
+
+    def _entry_path(self, content_sha: str) -> Path:
+        key = hashlib.sha256(f"{self.extractor_version}:{content_sha}".encode()).hexdigest()
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, path):
+        """Return cached pages for a PDF, or None on a miss."""
+        entry_path = self._entry_path(self.content_hash(path))
+        with self._lock:
+            try:
+                entry = json.loads(entry_path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                self._counters["misses"] += 1
+                return None
+            # Refresh mtime so LRU eviction keeps hot entries
+            try:
+                os.utime(entry_path)
+            except OSError:
+                pass
+            self._counters["hits"] += 1
+            return entry["pages"]
+
+    def put(self, path, pages: list) -> None:
+        """Store extracted pages for a PDF and enforce the size bound."""
+        content_sha = self.content_hash(path)
+        entry_path = self._entry_path(content_sha)
+        entry = {
+            "source": str(path),
+            "content_sha256": content_sha,
+            "extractor_version": self.extractor_version,
+            "created": time.time(),
+            "pages": pages,
+        }
+        with self._lock:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = entry_path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(entry), encoding="utf-8")
+            os.replace(tmp_path, entry_path)
+            self._counters["stores"] += 1
+            self._evict_locked(keep=entry_path)
+
+    def get_or_extract(self, path):
+        """Return (pages, cache_hit) for a PDF, extracting only on a miss."""
+        pages = self.get(path)
+        if pages is not None:
+            return pages, True
+        pages = self.extractor(path)
+        self.put(path, pages)
+        return pages, False
+
+    def get_or_extract_many(self, paths) -> dict:
+        """Return {path: (pages, cache_hit)} for several PDFs.
+
+        Cache misses are extracted together in a worker pool. A file that
+        fails to extract maps to the Exception instead of a tuple.
+        """
+        results, misses = {}, []
+        for path in paths:
+            pages = self.get(path)
+            if pages is None:
+                misses.append(path)
+            else:
+                results[str(path)] = (pages, True)
+        for path, pages in extract_pdfs_parallel(misses, extractor=self.extractor).items():
+            if isinstance(pages, Exception):
+                results[path] = pages
+                continue
+            self.put(path, pages)
+            results[path] = (pages, False)
+        return results
+
+    def _entries(self):
+        if not self.cache_dir.exists():
+            return []
+        entries = []
+        for entry_path in self.cache_dir.glob("*.json"):
+            try:
+                st = entry_path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, entry_path))
+        return entries
+
+    def _evict_locked(self, keep=None) -> None:
+        entries = sorted(self._entries(), key=lambda e: e[0])
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_path in entries:
+            if total <= self.max_bytes:
+                break
+            if entry_path == keep:
+                continue
+            try:
+                entry_path.unlink()
+            except OSError:
+                continue
+            total -= size
+            self._counters["evictions"] += 1
+
+    def stats(self) -> dict:
+        """Hit/miss counters for this process plus current cache size."""
+        with self._lock:
+            entries = self._entries()
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "hit_rate": round(self._counters["hits"] / lookups, 3) if lookups else 0.0,
+                "entries": len(entries),
+                "bytes": sum(size for _, size, _ in entries),
+                "max_bytes": self.max_bytes,
+                "extractor_version": self.extractor_version,
+                "cache_dir": str(self.cache_dir.absolute()),
+            }
+
+    def format_stats(self) -> str:
+        s = self.stats()
+        return (
+            f"PDF text cache: {s['hits']} hits / {s['misses']} misses "
+            f"(hit rate {s['hit_rate']:.0%}), {s['stores']} stored, "
+            f"{s['evictions']} evicted, {s['entries']} entries, "
+            f"{s['bytes'] / 1024:.1f} KB of {s['max_bytes'] / (1024 * 1024):.0f} MB"
+        )
+
+
+# Process-wide cache used by the tools below
+pdf_text_cache = PdfTextCache()
+
+
+def _pages_payload(pages: list) -> list:
+    return [{"page": i + 1, "text": text} for i, text in enumerate(pages)]
+
+
+def read_pdf_text(file_path: str) -> dict:
+    """Extract text from a PDF file, page by page, served from cache when unchanged.
+
+    Args:
+        file_path: Path to the PDF file (relative or absolute)
+
+    Returns:
+        dict: {"success": bool, "file_path": str, "pages": list, "error": str}
+    """
+    try:
+        path = Path(file_path)
+        if not path.is_absolute():
+            path = Path.cwd() / path
+        if not (path.exists() and path.is_file()):
+            return {
+                "success": False,
+                "file_path": str(path.absolute()),
+                "pages": [],
+                "error": "File does not exist"
+            }
+        pages, _hit = pdf_text_cache.get_or_extract(path)
+        return {
+            "success": True,
+            "file_path": str(path.absolute()),
+            "pages": _pages_payload(pages)
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "file_path": file_path,
+            "pages": [],
+            "error": str(e)
+        }
+
+
+def read_product_pdfs(directory: str = "./product_data") -> dict:
+    """Extract text from every PDF in a directory (recursively), using the cache.
+
+    Unchanged PDFs are returned from the on-disk cache instantly; only new
+    or modified files are re-extracted, in parallel worker processes.
+
+    Args:
+        directory: Directory to scan (default: ./product_data)
+
+    Returns:
+        dict: {"success": bool, "directory": str, "documents": list, "errors": list}
+    """
+    dir_path = Path(directory)
+    if not dir_path.is_absolute():
+        dir_path = Path.cwd() / dir_path
+    if not (dir_path.exists() and dir_path.is_dir()):
+        return {
+            "success": False,
+            "directory": str(dir_path.absolute()),
+            "documents": [],
+            "error": "Directory does not exist"
+        }
+
+    pdf_paths = sorted(dir_path.rglob("*.pdf"))
+    documents, errors = [], []
+    try:
+        results = pdf_text_cache.get_or_extract_many(pdf_paths)
+    except Exception as e:
+        results = {str(p): e for p in pdf_paths}
+    for pdf_path in pdf_paths:
+        result = results[str(pdf_path)]
+        if isinstance(result, Exception):
+            errors.append({"file_path": str(pdf_path), "error": str(result)})
+            continue
+        pages, _hit = result
+        documents.append({
+            "success": True,
+            "file_path": str(pdf_path.absolute()),
+            "pages": _pages_payload(pages)
+        })
+    return {
+        "success": bool(documents) or not errors,
+        "directory": str(dir_path.absolute()),
+        "documents": documents,
+        "errors": errors
+    }
+
+
+# Create FunctionTool instances
+read_pdf_text_tool = FunctionTool(
+    func=read_pdf_text
+)
+
+read_product_pdfs_tool = FunctionTool(
+    func=read_product_pdfs
+)
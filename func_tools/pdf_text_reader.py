@@ -0,0 +1,159 @@
+# pdf_text_reader.py
+# In-process, page-streaming PDF text extraction (alternative to the uvx MCP server)
+
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from google.adk.tools.function_tool import FunctionTool
+
+try:
+    from pypdf import PdfReader
+    PYPDF_AVAILABLE = True
+except ImportError:
+    PdfReader = None
+    PYPDF_AVAILABLE = False
+
+# Bump when extraction output changes so cached text is never reused across versions
+EXTRACTOR_VERSION = "pypdf-1"
+
+DEFAULT_MAX_WORKERS = int(os.environ.get("PDF_READER_MAX_WORKERS", min(4, os.cpu_count() or 1)))
+
+# Upper bound on characters returned by the read_pdf_pages tool per call
+MAX_TOOL_CHARS = 200_000
+
+# pypdf keeps every object it parses (content streams, fonts) for the life of the reader;
+# streaming drops them after this many pages so memory stays bounded on long documents
+RELEASE_EVERY_PAGES = 16
+
+
+def iter_pdf_pages(path, first_page: int = 1, last_page: int = None):
+    """Yield (page_number, text) for a PDF, one page at a time.
+
+    The file is memory-mapped rather than read into memory, and only the
+    pages in the requested range are parsed. Parsed objects are released
+    every RELEASE_EVERY_PAGES pages, so memory does not grow as pages are
+    read (pypdf's index of the page tree, a few KB per page, is all that
+    scales with the document). Page numbers are 1-based and last_page is
+    inclusive (None means the last page of the document).
+    """
+    if not PYPDF_AVAILABLE:
+        raise RuntimeError("pypdf is not installed (pip install pypdf)")
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            reader = PdfReader(mapped)
+            page_count = len(reader.pages)
+            start = max(first_page, 1)
+            end = min(last_page or page_count, page_count)
+            for page_number in range(start, end + 1):
+                text = reader.pages[page_number - 1].extract_text() or ""
+                if (page_number - start + 1) % RELEASE_EVERY_PAGES == 0:
+                    # Shared objects (fonts) are parsed again on demand
+                    reader.resolved_objects.clear()
+                yield page_number, text
+
+
+def pdf_page_count(path) -> int:
+    """Return the number of pages in a PDF without extracting any text."""
+    if not PYPDF_AVAILABLE:
+        raise RuntimeError("pypdf is not installed (pip install pypdf)")
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return len(PdfReader(mapped).pages)
+
+
+def extract_pdf_pages(path) -> list:
+    """Extract text for every page of a PDF.
+
+    Returns:
+        list: One string per page, in page order
+    """
+    return [text for _, text in iter_pdf_pages(path)]
+
+
+def extract_pdfs_parallel(paths, max_workers: int = DEFAULT_MAX_WORKERS,
+                          extractor=extract_pdf_pages) -> dict:
+    """Extract several PDFs concurrently in a process pool.
+
+    Extraction is CPU-bound pure Python, so processes (not threads) are used.
+    A single file is extracted inline to skip pool startup. The extractor
+    must be a module-level function so it can be sent to worker processes.
+
+    Returns:
+        dict: {path: list of page texts, or the Exception raised for that file}
+    """
+    paths = [str(p) for p in paths]
+    if len(paths) <= 1 or max_workers <= 1:
+        results = {}
+        for path in paths:
+            try:
+                results[path] = extractor(path)
+            except Exception as e:
+                results[path] = e
+        return results
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=min(max_workers, len(paths))) as pool:
+        futures = {pool.submit(extractor, path): path for path in paths}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                results[path] = future.result()
+            except Exception as e:
+                results[path] = e
+    return results
+
+
+def read_pdf_pages(file_path: str, first_page: int = 1, last_page: int = 0) -> dict:
+    """Extract text from a range of pages of a PDF file.
+
+    Use this for large documents: only the requested pages are parsed.
+
+    Args:
+        file_path: Path to the PDF file (relative or absolute)
+        first_page: First page to read, 1-based (default: 1)
+        last_page: Last page to read, inclusive; 0 means the last page of the document
+
+    Returns:
+        dict: {"success": bool, "file_path": str, "page_count": int, "pages": list, "truncated": bool, "error": str}
+    """
+    try:
+        path = Path(file_path)
+        if not path.is_absolute():
+            path = Path.cwd() / path
+        if not (path.exists() and path.is_file()):
+            return {
+                "success": False,
+                "file_path": str(path.absolute()),
+                "pages": [],
+                "error": "File does not exist"
+            }
+
+        pages, total_chars, truncated = [], 0, False
+        for page_number, text in iter_pdf_pages(path, first_page, last_page or None):
+            if total_chars + len(text) > MAX_TOOL_CHARS and pages:
+                truncated = True
+                break
+            pages.append({"page": page_number, "text": text})
+            total_chars += len(text)
+        return {
+            "success": True,
+            "file_path": str(path.absolute()),
+            "page_count": pdf_page_count(path),
+            "pages": pages,
+            "truncated": truncated
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "file_path": file_path,
+            "pages": [],
+            "error": str(e)
+        }
+
+
+# Create FunctionTool instances
+read_pdf_pages_tool = FunctionTool(
+    func=read_pdf_pages
+)
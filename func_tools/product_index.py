@@ -0,0 +1,271 @@
+# product_index.py
+# Local BM25 retrieval index over chunked product_data PDF text
+
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from pathlib import Path
+
+from google.adk.tools.function_tool import FunctionTool
+
+from func_tools.pdf_cache import pdf_text_cache
+
+INDEX_VERSION = 1
+DEFAULT_INDEX_PATH = os.environ.get("PRODUCT_INDEX_PATH", "./.cache/product_index.json")
+
+CHUNK_WORDS = 180
+CHUNK_OVERLAP = 40
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[.%][a-z0-9]+)*")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the "
+    "this to was were will with our your we you they their".split()
+)
+
+
+def tokenize(text: str) -> list:
+    """Lowercase word tokens with stopwords removed (numbers and 12.5% kept)."""
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def chunk_page(text: str, words: int = CHUNK_WORDS, overlap: int = CHUNK_OVERLAP) -> list:
+    """Split a page's text into overlapping word windows."""
+    tokens = text.split()
+    if not tokens:
+        return []
+    step = max(words - overlap, 1)
+    chunks = []
+    for start in range(0, len(tokens), step):
+        chunks.append(" ".join(tokens[start:start + words]))
+        if start + words >= len(tokens):
+            break
+    return chunks
+
+
+class ProductIndex:
+    """BM25 index over fixed-size chunks of every PDF in a directory.
+
+    Documents are tracked by content hash: refresh() only re-chunks PDFs that
+    are new or changed and drops chunks of PDFs that were removed. A PDF that
+    fails to extract is remembered with its hash (memoized by size and
+    mtime), so it is only retried once the file changes, and the chunks of
+    its earlier version are dropped. The index is
+    persisted as JSON; postings are rebuilt in memory on load. The lock
+    covers refresh, search and stats, so a search never sees half-updated
+    postings.
+    """
+
+    def __init__(self, index_path=DEFAULT_INDEX_PATH, cache=pdf_text_cache):
+        self.index_path = Path(index_path)
+        self.cache = cache
+        self._lock = threading.Lock()
+        self.documents = {}   # source path -> {"sha256": str, "pages": int, "chunk_ids": [...]}
+        self.chunks = {}      # chunk id -> {"source", "page", "text", "tf": {term: n}, "length"}
+        self._postings = {}   # term -> {chunk id: tf}
+        self.failed = {}      # source path -> (sha256, error) of the last failed extraction
+        self._total_length = 0
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            data = json.loads(self.index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if data.get("version") != INDEX_VERSION:
+            return
+        self.documents = data["documents"]
+        self.chunks = data["chunks"]
+        for chunk_id, chunk in self.chunks.items():
+            self._add_postings(chunk_id, chunk)
+
+    def save(self) -> None:
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({
+            "version": INDEX_VERSION,
+            "documents": self.documents,
+            "chunks": self.chunks,
+        }), encoding="utf-8")
+        os.replace(tmp_path, self.index_path)
+
+    def _add_postings(self, chunk_id: str, chunk: dict) -> None:
+        for term, tf in chunk["tf"].items():
+            self._postings.setdefault(term, {})[chunk_id] = tf
+        self._total_length += chunk["length"]
+
+    def _remove_document(self, source: str) -> None:
+        for chunk_id in self.documents.pop(source, {}).get("chunk_ids", []):
+            chunk = self.chunks.pop(chunk_id, None)
+            if chunk is None:
+                continue
+            for term in chunk["tf"]:
+                postings = self._postings.get(term)
+                if postings is not None:
+                    postings.pop(chunk_id, None)
+                    if not postings:
+                        del self._postings[term]
+            self._total_length -= chunk["length"]
+
+    def _add_document(self, source: str, sha: str, pages: list) -> None:
+        chunk_ids = []
+        for page_number, page_text in enumerate(pages, start=1):
+            for n, text in enumerate(chunk_page(page_text)):
+                terms = tokenize(text)
+                if not terms:
+                    continue
+                chunk_id = f"{source}#{page_number}:{n}"
+                chunk = {
+                    "source": source,
+                    "page": page_number,
+                    "text": text,
+                    "tf": dict(Counter(terms)),
+                    "length": len(terms),
+                }
+                self.chunks[chunk_id] = chunk
+                self._add_postings(chunk_id, chunk)
+                chunk_ids.append(chunk_id)
+        self.documents[source] = {"sha256": sha, "pages": len(pages), "chunk_ids": chunk_ids}
+
+    def refresh(self, directory) -> dict:
+        """Bring the index in line with the PDFs currently in directory.
+
+        Returns:
+            dict: Counts of added, updated, removed, unchanged and failed (not retried) documents
+        """
+        dir_path = Path(directory).absolute()
+        pdf_paths = sorted(dir_path.rglob("*.pdf"))
+        with self._lock:
+            current = {str(p): self.cache.content_hash(p) for p in pdf_paths}
+            known_in_dir = [s for s in self.documents if Path(s).is_relative_to(dir_path)]
+            removed = [s for s in known_in_dir if s not in current]
+            for source in [s for s in self.failed if Path(s).is_relative_to(dir_path) and s not in current]:
+                del self.failed[source]
+            stale = [s for s, sha in current.items()
+                     if self.documents.get(s, {}).get("sha256") != sha
+                     and self.failed.get(s, (None,))[0] != sha]
+
+            for source in removed:
+                self._remove_document(source)
+            if stale:
+                extracted = self.cache.get_or_extract_many(stale)
+                for source in stale:
+                    result = extracted[source]
+                    # The old version's chunks go even when the new one fails to extract
+                    self._remove_document(source)
+                    if isinstance(result, Exception):
+                        self.failed[source] = (current[source], str(result))
+                        continue
+                    self.failed.pop(source, None)
+                    self._add_document(source, current[source], result[0])
+            if removed or stale:
+                self.save()
+
+            indexed = [s for s in stale if s not in self.failed]
+            changed = sum(1 for s in indexed if s in known_in_dir)
+            failed = sum(1 for s in current if s in self.failed)
+            return {
+                "added": len(indexed) - changed,
+                "updated": changed,
+                "removed": len(removed),
+                "unchanged": len(current) - len(indexed) - failed,
+                "failed": failed,
+            }
+
+    def search(self, query: str, top_k: int = 5) -> list:
+        """Return the top_k chunks for query, ranked by BM25."""
+        terms = set(tokenize(query))
+        with self._lock:
+            return self._search_locked(terms, top_k)
+
+    def _search_locked(self, terms: set, top_k: int) -> list:
+        n_chunks = len(self.chunks)
+        if not terms or not n_chunks:
+            return []
+        avg_length = self._total_length / n_chunks
+        scores = {}
+        for term in terms:
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_chunks - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_id, tf in postings.items():
+                length_norm = 1 - BM25_B + BM25_B * self.chunks[chunk_id]["length"] / avg_length
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * length_norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [
+            {
+                "source": self.chunks[chunk_id]["source"],
+                "page": self.chunks[chunk_id]["page"],
+                "score": round(score, 3),
+                "text": self.chunks[chunk_id]["text"],
+            }
+            for chunk_id, score in ranked
+        ]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "documents": len(self.documents),
+                "pages": sum(d["pages"] for d in self.documents.values()),
+                "chunks": len(self.chunks),
+                "terms": len(self._postings),
+                "failed": len(self.failed),
+            }
+
+
+# Process-wide index used by the tool below
+product_index = ProductIndex()
+
+
+def search_product_data(query: str, top_k: int = 5, directory: str = "./product_data") -> dict:
+    """Search the product documentation and return the most relevant passages.
+
+    The index is refreshed first, so new or modified PDFs are picked up
+    automatically (unchanged files are not re-read).
+
+    Args:
+        query: What to look for, e.g. "key selling points", "performance metrics", "customer results"
+        top_k: Number of passages to return (default: 5)
+        directory: Directory with the product PDFs (default: ./product_data)
+
+    Returns:
+        dict: {"success": bool, "query": str, "passages": list, "index": dict, "error": str}
+    """
+    try:
+        dir_path = Path(directory)
+        if not dir_path.is_absolute():
+            dir_path = Path.cwd() / dir_path
+        if not (dir_path.exists() and dir_path.is_dir()):
+            return {
+                "success": False,
+                "query": query,
+                "passages": [],
+                "error": "Directory does not exist"
+            }
+        product_index.refresh(dir_path)
+        return {
+            "success": True,
+            "query": query,
+            "passages": product_index.search(query, top_k=max(1, min(top_k, 20))),
+            "index": product_index.stats()
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "query": query,
+            "passages": [],
+            "error": str(e)
+        }
+
+
+# Create FunctionTool instances
+search_product_data_tool = FunctionTool(
+    func=search_product_data
+)
@@ -0,0 +1,365 @@
+# style_digest.py
+# Precomputed, incrementally updated style digests of the HTML templates in style_samples
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from collections import Counter
+from html.parser import HTMLParser
+from pathlib import Path
+
+from google.adk.tools.function_tool import FunctionTool
+
+logger = logging.getLogger(__name__)
+
+DIGEST_VERSION = 1
+DEFAULT_DIGEST_PATH = os.environ.get("STYLE_DIGEST_PATH", "./.cache/style_digests.json")
+
+MAX_COLORS = 8
+MAX_SKELETON = 40
+MAX_TEXT = 40
+
+_COLOR_RE = re.compile(r"#[0-9a-fA-F]{6}\b|#[0-9a-fA-F]{3}\b|rgba?\([^)]*\)")
+_BLOCK_TAGS = {"h1", "h2", "h3", "h4", "p", "ul", "ol", "hr", "img"}
+
+
+def parse_style(style: str) -> dict:
+    """Inline style attribute -> {property: value} (lowercased property names)."""
+    declarations = {}
+    for declaration in (style or "").split(";"):
+        if ":" in declaration:
+            name, value = declaration.split(":", 1)
+            declarations[name.strip().lower()] = value.strip()
+    return declarations
+
+
+def _short(text: str) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= MAX_TEXT else text[:MAX_TEXT - 3] + "..."
+
+
+class _StyleDigestParser(HTMLParser):
+    """Collects colors, fonts, buttons, radii, images and a layout outline."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.background_colors = Counter()
+        self.text_colors = Counter()
+        self.border_colors = Counter()
+        self.fonts = Counter()
+        self.font_sizes = Counter()
+        self.border_radius = Counter()
+        self.max_widths = Counter()
+        self.buttons = []
+        self.images = []
+        self.skeleton = []
+        self._stack = []          # (tag, declarations) of open elements
+        self._text_target = None  # skeleton entry or button collecting text
+
+    def _add_colors(self, counter: Counter, value: str) -> None:
+        for color in _COLOR_RE.findall(value):
+            counter[color.lower().replace(" ", "")] += 1
+
+    def _outline(self, entry: str) -> None:
+        # Collapse runs like "p", "p", "p" into "p x3"
+        if self.skeleton and self.skeleton[-1].split(" x")[0] == entry and entry == "p":
+            last = self.skeleton[-1]
+            count = int(last.split(" x")[1]) + 1 if " x" in last else 2
+            self.skeleton[-1] = f"p x{count}"
+        elif len(self.skeleton) < MAX_SKELETON:
+            self.skeleton.append(entry)
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        style = parse_style(attrs.get("style"))
+        if tag not in ("br", "img", "hr", "meta", "link", "input"):
+            self._stack.append((tag, style))
+
+        for name, value in style.items():
+            if name in ("background", "background-color"):
+                self._add_colors(self.background_colors, value)
+            elif name == "color":
+                self._add_colors(self.text_colors, value)
+            elif name.startswith("border") and "radius" not in name:
+                self._add_colors(self.border_colors, value)
+            elif name == "font-family":
+                self.fonts[value] += 1
+            elif name == "font-size":
+                self.font_sizes[value] += 1
+            elif name == "border-radius":
+                self.border_radius[value] += 1
+            elif name == "max-width":
+                self.max_widths[value] += 1
+        if attrs.get("bgcolor"):
+            self._add_colors(self.background_colors, attrs["bgcolor"])
+
+        if tag == "img":
+            self.images.append({
+                "src": attrs.get("src", ""),
+                "alt": attrs.get("alt", ""),
+                "width": attrs.get("width"),
+                "height": attrs.get("height"),
+            })
+            name = Path(attrs.get("src", "")).name or "?"
+            self._outline(f"img {name}" + (f" {attrs['width']}w" if attrs.get("width") else ""))
+        elif tag == "a":
+            # A link that is filled itself, or is the direct child of a filled cell, is a button
+            parent_tag, parent = self._stack[-2] if len(self._stack) > 1 else (None, {})
+            if parent_tag not in ("td", "div"):
+                parent = {}
+            fill = style.get("background") or style.get("background-color") \
+                or parent.get("background") or parent.get("background-color")
+            if fill:
+                button = {
+                    "text": "",
+                    "background": fill,
+                    "color": style.get("color"),
+                    "border_radius": style.get("border-radius") or parent.get("border-radius"),
+                    "padding": style.get("padding") or parent.get("padding"),
+                    "font_weight": style.get("font-weight"),
+                }
+                self.buttons.append({k: v for k, v in button.items() if v is not None})
+                self._text_target = ("button", self.buttons[-1])
+                self._outline("button")
+        elif tag == "tr":
+            self._stack[-1] = (tag, dict(style, _cells=0, _start=len(self.skeleton)))
+        elif tag == "td" and len(self._stack) > 1:
+            row = next((s for t, s in reversed(self._stack[:-1]) if t == "tr"), None)
+            if row is not None:
+                row["_cells"] += 1
+        elif tag in _BLOCK_TAGS:
+            self._outline(tag)
+            if tag in ("h1", "h2", "h3", "h4") and self.skeleton[-1] == tag:
+                self._text_target = ("heading", len(self.skeleton) - 1)
+
+    def handle_endtag(self, tag):
+        for i in range(len(self._stack) - 1, -1, -1):
+            if self._stack[i][0] == tag:
+                closed = self._stack[i:]
+                del self._stack[i:]
+                break
+        else:
+            return
+        for t, style in closed:
+            if t == "tr" and style.get("_cells", 0) > 1 and len(self.skeleton) < MAX_SKELETON:
+                # Multi-cell rows are marked where the row starts
+                self.skeleton.insert(style["_start"], f"row: {style['_cells']} cells")
+        if tag == "a" or tag in ("h1", "h2", "h3", "h4"):
+            self._text_target = None
+
+    def handle_data(self, data):
+        if self._text_target is None or not data.strip():
+            return
+        kind, target = self._text_target
+        if kind == "button":
+            target["text"] = _short(target["text"] + " " + data)
+        elif target < len(self.skeleton):
+            entry = self.skeleton[target]
+            tag, _, text = entry.partition(" ")
+            self.skeleton[target] = f"{tag} {_short((text.strip(chr(39)) + ' ' + data).strip())!r}"
+
+    def handle_comment(self, data):
+        # Templates label their sections with comments, e.g. <!-- Header -->
+        label = " ".join(data.split())
+        if label and len(label) <= MAX_TEXT:
+            self._outline(f"# {label}")
+
+
+def _top(counter: Counter, n: int = MAX_COLORS) -> list:
+    return [value for value, _count in counter.most_common(n)]
+
+
+def digest_html(html: str) -> dict:
+    """Compact style summary of one HTML template."""
+    parser = _StyleDigestParser()
+    parser.feed(html)
+    parser.close()
+    return {
+        "palette": {
+            "background": _top(parser.background_colors),
+            "text": _top(parser.text_colors),
+            "border": _top(parser.border_colors, 4),
+        },
+        "fonts": _top(parser.fonts, 4),
+        "font_sizes": _top(parser.font_sizes),
+        "border_radius": _top(parser.border_radius, 4),
+        "max_width": _top(parser.max_widths, 1)[0] if parser.max_widths else None,
+        "buttons": parser.buttons[:3],
+        "images": parser.images,
+        "layout": parser.skeleton,
+    }
+
+
+def _local_image(template: Path, src: str):
+    """Path of an image referenced relative to the template, or None for remote/data URLs."""
+    if not src or re.match(r"^[a-z][a-z0-9+.-]*:", src, re.I):
+        return None
+    return template.parent / src
+
+
+def _image_signature(template: Path, images: list) -> list:
+    """(src, size, mtime) of the template's local images, so added/removed images are noticed."""
+    signature = []
+    for image in images:
+        path = _local_image(template, image["src"])
+        if path is None:
+            continue
+        try:
+            st = path.stat()
+            signature.append([image["src"], st.st_size, st.st_mtime_ns])
+        except OSError:
+            signature.append([image["src"], None, None])
+    return signature
+
+
+class StyleDigestIndex:
+    """Style digests of every HTML template in a directory, persisted as JSON.
+
+    refresh() only re-parses templates whose size/mtime changed and whose
+    content hash then differs, plus templates whose referenced images changed.
+    Removed templates are dropped.
+    """
+
+    def __init__(self, index_path=DEFAULT_DIGEST_PATH):
+        self.index_path = Path(index_path)
+        self._lock = threading.Lock()
+        self.templates = {}   # template path -> {"size", "mtime_ns", "sha256", "images", "digest"}
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            data = json.loads(self.index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if data.get("version") == DIGEST_VERSION:
+            self.templates = data["templates"]
+
+    def save(self) -> None:
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({
+            "version": DIGEST_VERSION,
+            "templates": self.templates,
+        }), encoding="utf-8")
+        os.replace(tmp_path, self.index_path)
+
+    def _refresh_template(self, path: Path) -> str:
+        source = str(path)
+        st = path.stat()
+        entry = self.templates.get(source)
+        if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns \
+                and entry["images"] == _image_signature(path, entry["digest"]["images"]):
+            return "unchanged"
+
+        data = path.read_bytes()
+        sha = hashlib.sha256(data).hexdigest()
+        if entry and entry["sha256"] == sha:
+            images = _image_signature(path, entry["digest"]["images"])
+            if entry["images"] == images:
+                entry.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+                return "touched"
+
+        digest = digest_html(data.decode("utf-8", errors="replace"))
+        for image in digest["images"]:
+            local = _local_image(path, image["src"])
+            if local is not None:
+                image["available"] = local.is_file()
+        self.templates[source] = {
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "sha256": sha,
+            "images": _image_signature(path, digest["images"]),
+            "digest": digest,
+        }
+        return "updated" if entry else "added"
+
+    def refresh(self, directory) -> dict:
+        """Bring the digests in line with the templates currently in directory.
+
+        Returns:
+            dict: Counts of added, updated, removed and unchanged templates
+        """
+        dir_path = Path(directory).absolute()
+        paths = sorted(set(dir_path.rglob("*.html")) | set(dir_path.rglob("*.htm")))
+        with self._lock:
+            counts = Counter(self._refresh_template(p) for p in paths)
+            current = {str(p) for p in paths}
+            removed = [s for s in self.templates if Path(s).is_relative_to(dir_path) and s not in current]
+            for source in removed:
+                del self.templates[source]
+            if removed or counts["added"] or counts["updated"] or counts["touched"]:
+                self.save()
+            return {
+                "added": counts["added"],
+                "updated": counts["updated"],
+                "removed": len(removed),
+                "unchanged": counts["unchanged"] + counts["touched"],
+            }
+
+    def digests(self, directory) -> list:
+        dir_path = Path(directory).absolute()
+        return [
+            {"file": source, **entry["digest"]}
+            for source, entry in sorted(self.templates.items())
+            if Path(source).is_relative_to(dir_path)
+        ]
+
+
+# Process-wide index used by the tool below
+style_digest_index = StyleDigestIndex()
+
+
+def get_style_digests(directory: str = "./style_samples") -> dict:
+    """Get a compact style digest of every HTML template in the style samples directory.
+
+    Use this instead of reading full template HTML. Each digest has the color
+    palette (background/text/border), fonts and font sizes, button styles,
+    border radius, max width, image inventory and a layout outline.
+
+    Args:
+        directory: Directory with the HTML style samples (default: ./style_samples)
+
+    Returns:
+        dict: {"success": bool, "templates": list, "directory": str, "error": str}
+    """
+    try:
+        dir_path = Path(directory)
+        if not dir_path.is_absolute():
+            dir_path = Path.cwd() / dir_path
+        if not (dir_path.exists() and dir_path.is_dir()):
+            return {
+                "success": False,
+                "templates": [],
+                "directory": str(dir_path.absolute()),
+                "error": "Directory does not exist"
+            }
+        # Logged, not returned: per-run counts would make identical model requests differ (LLM cache)
+        changes = style_digest_index.refresh(dir_path)
+        logger.debug("Style digests of %s: %s", dir_path, changes)
+        templates = style_digest_index.digests(dir_path)
+        for template in templates:
+            # Same path form as list_html_files so read_html_file accepts it
+            path = Path(template["file"])
+            if path.is_relative_to(Path.cwd()):
+                template["file"] = str(path.relative_to(Path.cwd()))
+        return {
+            "success": True,
+            "templates": templates,
+            "directory": str(dir_path.absolute())
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "templates": [],
+            "directory": directory,
+            "error": str(e)
+        }
+
+
+# Create FunctionTool instances
+get_style_digests_tool = FunctionTool(
+    func=get_style_digests
+)
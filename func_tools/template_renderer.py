@@ -0,0 +1,497 @@
+# template_renderer.py
+# Structured newsletter content and a deterministic renderer that fills a style_samples template
+
+import html
+import json
+import re
+from html.parser import HTMLParser
+from pathlib import Path
+
+from google.adk.tools.function_tool import FunctionTool
+from google.adk.tools.tool_context import ToolContext
+
+from func_tools.html_reader_tools import html_file_index
+from func_tools.image_optimizer import display_width, image_optimizer
+from func_tools.output_store import get_output_store, output_store_for
+from func_tools.style_digest import parse_style
+
+RENDERER_VERSION = "template-1"
+
+CONTENT_JSON_NAME = "newsletter_content.json"
+CONTENT_TEXT_NAME = "newsletter_content.txt"
+
+DEFAULT_HEADING = "Why it matters"
+
+_VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+_REMOTE_RE = re.compile(r"^[a-z][a-z0-9+.-]*:|^//", re.I)
+
+
+# Structured content
+
+def _clean(value) -> str:
+    return " ".join(str(value or "").split())
+
+
+def normalize_content(data: dict) -> dict:
+    """Validate and normalise structured newsletter content.
+
+    Schema:
+        {"title": str, "subtitle": str, "heading": str, "intro": str,
+         "bullets": [str, ...], "highlights": [{"title": str, "text": str}, ...],
+         "cta": {"text": str, "url": str}}
+
+    Only title is required; heading defaults to "Why it matters".
+    """
+    cta = data.get("cta") or {}
+    if isinstance(cta, str):
+        cta = {"text": cta}
+    content = {
+        "title": _clean(data.get("title")),
+        "subtitle": _clean(data.get("subtitle")),
+        "heading": _clean(data.get("heading")) or DEFAULT_HEADING,
+        "intro": _clean(data.get("intro")),
+        "bullets": [_clean(b) for b in data.get("bullets") or [] if _clean(b)],
+        "highlights": [
+            {"title": _clean(h.get("title")), "text": _clean(h.get("text"))}
+            for h in data.get("highlights") or []
+            if isinstance(h, dict) and _clean(h.get("title"))
+        ],
+        "cta": {"text": _clean(cta.get("text")) or "Learn more", "url": _clean(cta.get("url"))},
+    }
+    if not content["title"]:
+        raise ValueError("Newsletter content has no title")
+    return content
+
+
+_LABELS = {
+    "title": "title",
+    "subtitle": "subtitle",
+    "heading": "heading",
+    "intro": "intro",
+    "call-to-action": "cta",
+    "call to action": "cta",
+    "cta": "cta",
+}
+
+
+def _parse_labeled_text(text: str) -> dict:
+    """Fallback for "Title: ..." / "- bullet" style text content."""
+    data = {"bullets": []}
+    for line in text.splitlines():
+        line = line.strip().strip("*").strip()
+        if not line:
+            continue
+        bullet = re.match(r"^(?:[-*•]|\d+[.)])\s+(.*)", line)
+        label, sep, value = line.partition(":")
+        key = _LABELS.get(label.strip().strip("*#").strip().lower()) if sep else None
+        if key and value.strip():
+            data[key] = value.strip().strip("*").strip()
+        elif bullet:
+            data["bullets"].append(bullet.group(1).strip())
+    return data
+
+
+def parse_content(text: str) -> dict:
+    """Structured content from an agent reply: a JSON object (possibly fenced) or labeled text."""
+    match = re.search(r"\{.*\}", text or "", re.S)
+    if match:
+        try:
+            return normalize_content(json.loads(match.group(0)))
+        except ValueError:
+            pass
+    return normalize_content(_parse_labeled_text(text or ""))
+
+
+def content_to_text(content: dict) -> str:
+    """Plain-text form of the content (newsletter_content.txt)."""
+    lines = [f"Title: {content['title']}"]
+    if content["subtitle"]:
+        lines.append(f"Subtitle: {content['subtitle']}")
+    if content["intro"]:
+        lines += ["", content["intro"]]
+    if content["highlights"]:
+        lines += ["", "Highlights:"] + [f"- {h['title']}: {h['text']}" for h in content["highlights"]]
+    if content["bullets"]:
+        lines += ["", f"{content['heading']}:"] + [f"- {b}" for b in content["bullets"]]
+    cta = content["cta"]
+    lines += ["", f"Call-to-action: {cta['text']}" + (f" ({cta['url']})" if cta["url"] else "")]
+    return "\n".join(lines) + "\n"
+
+
+def write_content(content: dict, output_dir=None, store=None) -> dict:
+    """Write structured content as newsletter_content.json plus its text form (atomically)."""
+    content = normalize_content(content)
+    store = store or get_output_store(output_dir)
+    json_path = store.write_text(CONTENT_JSON_NAME, json.dumps(content, indent=2))
+    text_path = store.write_text(CONTENT_TEXT_NAME, content_to_text(content))
+    return {
+        "success": True,
+        "json_path": str(json_path),
+        "text_path": str(text_path),
+    }
+
+
+def save_newsletter_content(title: str, subtitle: str, bullets: list[str], cta_text: str,
+                            cta_url: str = "", heading: str = "", intro: str = "",
+                            highlights: list[dict] = None, output_dir: str = "",
+                            tool_context: ToolContext = None) -> dict:
+    """Save the newsletter content in structured form.
+
+    Args:
+        title: Short, compelling title
+        subtitle: Concise subtitle that clarifies the value
+        bullets: Reasoning section, 2-4 bullet points
+        cta_text: Call-to-action button text, e.g. "Try the platform"
+        cta_url: Call-to-action link (empty if unknown)
+        heading: Heading for the reasoning section (default: "Why it matters")
+        intro: One or two sentences introducing the topic
+        highlights: Key features, each {"title": str, "text": str}
+        output_dir: Output directory (default: the output directory of the current run)
+
+    Returns:
+        dict: {"success": bool, "json_path": str, "text_path": str, "error": str}
+    """
+    try:
+        return write_content({
+            "title": title,
+            "subtitle": subtitle,
+            "heading": heading,
+            "intro": intro,
+            "bullets": bullets,
+            "highlights": highlights or [],
+            "cta": {"text": cta_text, "url": cta_url},
+        }, store=get_output_store(output_dir) if output_dir else output_store_for(tool_context))
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+
+# Template slots
+
+def is_remote(src: str) -> bool:
+    """True for URLs (http:, data:, cid:, //host/...), False for local file paths."""
+    return bool(_REMOTE_RE.match(src or ""))
+
+
+class _Element:
+    __slots__ = ("tag", "attrs", "start", "content_start", "content_end", "end", "parent")
+
+    def __init__(self, tag, attrs, start, content_start, parent):
+        self.tag = tag
+        self.attrs = attrs
+        self.start = start
+        self.content_start = content_start
+        self.content_end = content_start
+        self.end = content_start
+        self.parent = parent
+
+    def ancestors(self):
+        node = self.parent
+        while node is not None:
+            yield node
+            node = node.parent
+
+
+class _ElementParser(HTMLParser):
+    """Records the source offsets of every element so slots can be replaced in place."""
+
+    def __init__(self, source: str):
+        super().__init__(convert_charrefs=True)
+        self.source = source
+        self._line_offsets = [0]
+        # HTMLParser counts lines by "\n" only
+        for line in source.split("\n"):
+            self._line_offsets.append(self._line_offsets[-1] + len(line) + 1)
+        self.elements = []
+        self._stack = []
+        # Nesting problems (see parse_document): elements without their own end tag, end tags without a start
+        self.unclosed = []
+        self.stray_end_tags = []
+
+    def _offset(self) -> int:
+        line, column = self.getpos()
+        return self._line_offsets[line - 1] + column
+
+    def handle_starttag(self, tag, attrs):
+        start = self._offset()
+        raw = self.get_starttag_text() or ""
+        parent = self._stack[-1] if self._stack else None
+        element = _Element(tag, dict(attrs), start, start + len(raw), parent)
+        self.elements.append(element)
+        if tag not in _VOID_TAGS:
+            self._stack.append(element)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in _VOID_TAGS:
+            self._stack.pop()
+
+    def handle_endtag(self, tag):
+        start = self._offset()
+        end = self.source.find(">", start) + 1
+        for i in range(len(self._stack) - 1, -1, -1):
+            if self._stack[i].tag == tag:
+                # Elements above the match are closed implicitly by their ancestor's end tag
+                self.unclosed.extend(self._stack[i + 1:])
+                for element in self._stack[i:]:
+                    element.content_end = start
+                    element.end = end
+                del self._stack[i:]
+                return
+        if tag not in _VOID_TAGS:
+            self.stray_end_tags.append((tag, start))
+
+    def close(self):
+        super().close()
+        self.unclosed.extend(self._stack)
+
+
+def parse_document(source: str) -> _ElementParser:
+    """Parse an HTML document: .elements (see parse_elements), .unclosed and .stray_end_tags ((tag, offset))."""
+    parser = _ElementParser(source)
+    parser.feed(source)
+    parser.close()
+    return parser
+
+
+def parse_elements(source: str) -> list:
+    """All elements of an HTML document, in document order, with their source offsets."""
+    return parse_document(source).elements
+
+
+def is_button(element) -> bool:
+    """True for a link styled as a button (filled itself or by its td/div cell)."""
+    if element.tag != "a":
+        return False
+    style = parse_style(element.attrs.get("style"))
+    if style.get("background") or style.get("background-color"):
+        return True
+    parent = element.parent
+    if parent is None or parent.tag not in ("td", "div"):
+        return False
+    parent_style = parse_style(parent.attrs.get("style"))
+    return bool(parent_style.get("background") or parent_style.get("background-color") or parent.attrs.get("bgcolor"))
+
+
+def _first(elements, predicate, after=None, parent=None):
+    for element in elements:
+        if after is not None and element.start < after.end:
+            continue
+        if parent is not None and element.parent is not parent:
+            continue
+        if predicate(element):
+            return element
+    return None
+
+
+def find_slots(template_html: str) -> dict:
+    """Locate content slots in a template.
+
+    Elements marked with data-slot="title|subtitle|heading|intro|bullets|cta|highlights"
+    win; otherwise: first h1 (or h2) is the title, the paragraph after it the
+    subtitle, the next h2 the section heading and the paragraph after that the
+    intro. The h3 + paragraph boxes that follow are highlights, the first list
+    holds the bullets and the first filled link is the CTA button.
+    """
+    all_elements = parse_elements(template_html)
+    elements = [e for e in all_elements if e.end > e.start]
+    marked = {}
+    for element in all_elements:
+        if element.attrs.get("data-slot"):
+            marked.setdefault(element.attrs["data-slot"], element)
+
+    slots = {"page_title": _first(elements, lambda e: e.tag == "title")}
+    slots["title"] = marked.get("title") or _first(elements, lambda e: e.tag == "h1") \
+        or _first(elements, lambda e: e.tag == "h2")
+    title = slots["title"]
+    slots["subtitle"] = marked.get("subtitle") or (
+        _first(elements, lambda e: e.tag == "p", after=title, parent=title.parent) if title else None)
+    slots["heading"] = marked.get("heading") or _first(
+        elements, lambda e: e.tag == "h2" and e is not title, after=slots["subtitle"] or title)
+    heading = slots["heading"]
+    slots["intro"] = marked.get("intro") or (
+        _first(elements, lambda e: e.tag == "p", after=heading, parent=heading.parent) if heading else None)
+    slots["bullets"] = marked.get("bullets") or _first(elements, lambda e: e.tag in ("ul", "ol"), after=title)
+    slots["cta"] = marked.get("cta") or _first(elements, is_button)
+
+    # Highlight boxes: h3 followed by a paragraph, grouped by their common container
+    container = marked.get("highlights")
+    scope = (lambda e: container in e.ancestors()) if container else (lambda e: True)
+    boxes = []
+    for h3 in (e for e in elements if e.tag == "h3" and scope(e)):
+        text = _first(elements, lambda e: e.tag == "p", after=h3, parent=h3.parent)
+        boxes.append((h3, text))
+    if boxes and container is None:
+        common = [a for a in boxes[0][0].ancestors() if all(a in h.ancestors() for h, _ in boxes)]
+        container = next((a for a in common if a.tag in ("table", "div", "tr")), common[0] if common else None)
+    slots["highlights"] = {"container": container, "boxes": boxes}
+    slots["images"] = [e for e in elements if e.tag == "img" and e.attrs.get("src")]
+    return slots
+
+
+def _inside(element, ranges) -> bool:
+    return any(start <= element.start and element.end <= end for start, end in ranges)
+
+
+def render_template(template_html: str, content: dict) -> tuple:
+    """Fill a template with structured content.
+
+    Returns:
+        tuple: (html, images) - the rendered document and the local images it
+        still references, as (src, display width or None) pairs
+    """
+    content = normalize_content(content)
+    slots = find_slots(template_html)
+    esc = html.escape
+    edits = []       # (start, end, replacement)
+    removed = []     # (start, end) of removed blocks
+
+    def replace_inner(element, text):
+        if element is not None:
+            edits.append((element.content_start, element.content_end, text))
+
+    def remove(element):
+        if element is not None:
+            removed.append((element.start, element.end))
+
+    replace_inner(slots["page_title"], esc(content["title"]))
+    replace_inner(slots["title"], esc(content["title"]))
+    if content["subtitle"]:
+        replace_inner(slots["subtitle"], esc(content["subtitle"]))
+    else:
+        remove(slots["subtitle"])
+    replace_inner(slots["heading"], esc(content["heading"]))
+    if content["intro"]:
+        replace_inner(slots["intro"], esc(content["intro"]))
+    else:
+        remove(slots["intro"])
+
+    bullets = slots["bullets"]
+    if bullets is not None and content["bullets"]:
+        item = re.search(r"<li\b[^>]*>", template_html[bullets.content_start:bullets.content_end], re.I)
+        open_tag = item.group(0) if item else "<li>"
+        indent = re.search(r"\n([ \t]*)<li", template_html[bullets.content_start:bullets.content_end])
+        pad = indent.group(1) if indent else ""
+        items = "".join(f"\n{pad}{open_tag}{esc(b)}</li>" for b in content["bullets"])
+        closing = re.search(r"\n([ \t]*)$", template_html[bullets.content_start:bullets.content_end])
+        replace_inner(bullets, items + ("\n" + closing.group(1) if closing else ""))
+    else:
+        remove(bullets)
+
+    cta = slots["cta"]
+    if cta is not None:
+        replace_inner(cta, esc(content["cta"]["text"]))
+        if content["cta"]["url"]:
+            tag = template_html[cta.start:cta.content_start]
+            href = re.search(r'href\s*=\s*("[^"]*"|\'[^\']*\')', tag, re.I)
+            new_href = f'href="{esc(content["cta"]["url"], quote=True)}"'
+            new_tag = tag.replace(href.group(0), new_href) if href else tag[:-1] + f" {new_href}>"
+            edits.append((cta.start, cta.content_start, new_tag))
+
+    highlights = slots["highlights"]
+    boxes = highlights["boxes"]
+    if boxes and len(content["highlights"]) >= len(boxes):
+        for (h3, text), item in zip(boxes, content["highlights"]):
+            replace_inner(h3, esc(item["title"]))
+            replace_inner(text, esc(item["text"]))
+    elif boxes:
+        # A half-filled grid looks broken; drop the whole block instead
+        remove(highlights["container"])
+
+    edits = [e for e in edits if not any(s <= e[0] and e[1] <= t for s, t in removed)]
+    edits += [(start, end, "") for start, end in removed]
+    rendered = template_html
+    for start, end, text in sorted(edits, key=lambda e: e[0], reverse=True):
+        rendered = rendered[:start] + text + rendered[end:]
+
+    images = [
+        (e.attrs["src"], display_width(e.attrs)) for e in slots["images"]
+        if not _inside(e, removed) and not is_remote(e.attrs["src"])
+    ]
+    return rendered, images
+
+
+# Template selection and file output
+
+def select_template(directory: str = "./style_samples", name: str = "") -> Path:
+    """Pick a template: the first (sorted) HTML file whose path contains name, or the first one."""
+    dir_path = Path(directory)
+    if not dir_path.is_absolute():
+        dir_path = Path.cwd() / dir_path
+    files = [Path(f) for f in html_file_index.list_files(dir_path)]
+    if name:
+        files = [f for f in files if name.lower() in str(f.relative_to(dir_path)).lower()]
+    if not files:
+        raise FileNotFoundError(f"No HTML template{' matching ' + repr(name) if name else ''} in {dir_path}")
+    return files[0]
+
+
+def render_newsletter(content: dict, template_path, output_path) -> dict:
+    """Render content into template_path and write output_path, copying the images it uses.
+
+    Local images are written, optimized for their display width, to
+    <output dir>/images/ (see ImageOptimizer) and their src rewritten to
+    images/<name>-<hash>.<ext>, so the output directory is self-contained.
+    """
+    template_path = Path(template_path)
+    output_path = Path(output_path).absolute()
+    store = get_output_store(output_path.parent)
+    rendered, images = render_template(html_file_index.read(template_path), content)
+    copied = {}
+    for src, width in images:
+        source = template_path.parent / src
+        if src in copied or not source.is_file():
+            continue
+        copied[src] = image_optimizer.optimize(source, store, display_width=width)["file"]
+        rendered = re.sub(rf'(src\s*=\s*["\']){re.escape(src)}(["\'])', rf"\g<1>{copied[src]}\g<2>", rendered)
+    return {
+        "success": True,
+        "file_path": str(store.write_text(output_path, rendered)),
+        "images": list(copied.values()),
+    }
+
+
+def render_newsletter_html(content_path: str = "./output/newsletter_content.json",
+                           template: str = "", style_samples_dir: str = "./style_samples",
+                           output_path: str = "./output/newsletter.html",
+                           tool_context: ToolContext = None) -> dict:
+    """Render the newsletter HTML locally from structured content and a style sample template.
+
+    Fills the template's title, subtitle, heading, intro, highlights, bullets
+    and CTA button in milliseconds, without generating HTML token by token.
+
+    Args:
+        content_path: Structured content JSON written by the content stage
+        template: Part of the template path to use, e.g. "Sample_Style_Template" (default: first template)
+        style_samples_dir: Directory with the HTML style samples (default: ./style_samples)
+        output_path: Where to write the HTML (default: ./output/newsletter.html)
+
+    Returns:
+        dict: {"success": bool, "file_path": str, "template": str, "images": list, "error": str}
+    """
+    try:
+        # ./output/... paths are resolved in the output directory of the current run
+        store = output_store_for(tool_context)
+        content = json.loads(store.read_text(content_path))
+        template_path = select_template(style_samples_dir, template)
+        result = render_newsletter(content, template_path, store.path(output_path))
+        result["template"] = str(template_path)
+        return result
+    except Exception as e:
+        return {
+            "success": False,
+            "file_path": output_path,
+            "error": str(e)
+        }
+
+
+# Create FunctionTool instances
+save_newsletter_content_tool = FunctionTool(
+    func=save_newsletter_content
+)
+
+render_newsletter_tool = FunctionTool(
+    func=render_newsletter_html
+)
@@ -0,0 +1,149 @@
+# batch.py
+# Batch newsletter generation: many campaigns, bounded concurrency, shared agents/tools
+
+import asyncio
+import json
+import logging
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 3
+
+JOB_DEFAULTS = {
+    "product_data_dir": "./product_data",
+    "style_samples_dir": "./style_samples",
+    "audience": "",
+    "template": "",
+}
+
+
+def load_manifest(manifest_path) -> dict:
+    """Load a batch manifest.
+
+    Format (JSON):
+        {
+          "concurrency": 3,
+          "campaigns": [
+            {"name": "hda-launch", "product_data_dir": "./product_data",
+             "style_samples_dir": "./style_samples", "audience": "PCB designers",
+             "template": "Sample_Style_Template", "output_dir": "./output/hda-launch"}
+          ]
+        }
+
+    "output_dir" defaults to ./output/<name>; other fields default to the
+    single-run paths. Relative paths are resolved against the manifest's directory.
+
+    Returns:
+        dict: {"concurrency": int, "jobs": list of job dicts}
+    """
+    manifest_path = Path(manifest_path)
+    data = json.loads(manifest_path.read_text(encoding="utf-8"))
+    jobs = [
+        normalize_job(campaign, f"campaign-{i + 1}", manifest_path.parent)
+        for i, campaign in enumerate(data.get("campaigns", []))
+    ]
+    validate_jobs(jobs)
+    return {"concurrency": int(data.get("concurrency", DEFAULT_CONCURRENCY)), "jobs": jobs}
+
+
+def normalize_job(campaign: dict, default_name: str, base_dir=".") -> dict:
+    """Fill in job defaults and make its paths absolute (relative to base_dir)."""
+    job = {**JOB_DEFAULTS, **campaign}
+    job.setdefault("name", default_name)
+    job.setdefault("output_dir", f"./output/{job['name']}")
+    for key in ("product_data_dir", "style_samples_dir", "output_dir"):
+        path = Path(job[key])
+        job[key] = str(path if path.is_absolute() else (Path(base_dir) / path).resolve())
+    return job
+
+
+def validate_jobs(jobs) -> None:
+    """Reject manifests where two jobs could write to the same place.
+
+    Names must be unique and no output_dir may equal or contain another's.
+    """
+    names = [job["name"] for job in jobs]
+    duplicates = sorted({n for n in names if names.count(n) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate campaign names in batch manifest: {duplicates}")
+
+    output_dirs = [(job["name"], Path(job["output_dir"]).resolve()) for job in jobs]
+    for i, (name_a, dir_a) in enumerate(output_dirs):
+        for name_b, dir_b in output_dirs[i + 1:]:
+            if dir_a == dir_b or dir_a in dir_b.parents or dir_b in dir_a.parents:
+                raise ValueError(
+                    f"Campaigns {name_a!r} and {name_b!r} have overlapping output directories "
+                    f"({dir_a}, {dir_b})"
+                )
+
+
+async def run_batch(jobs, run_job, concurrency: int = DEFAULT_CONCURRENCY) -> dict:
+    """Run jobs concurrently, at most `concurrency` at a time.
+
+    Args:
+        jobs: Job dicts (see load_manifest)
+        run_job: async callable(job) -> any; raising marks the job failed
+        concurrency: Maximum number of jobs in flight
+
+    Returns:
+        dict: {"jobs": [...per-job results...], "wall_seconds", "succeeded", "failed",
+               "newsletters_per_minute"}
+    """
+    # Loaded with the jobs' agents (keeps ADK out of manifest parsing and enqueueing)
+    from orchestration.instrumentation import run_label
+
+    validate_jobs(jobs)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run_one(job):
+        async with semaphore:
+            # Spans recorded while this job runs are attributed to it
+            run_label.set(job["name"])
+            started = time.perf_counter()
+            logger.info("Batch job %s started", job["name"])
+            try:
+                await run_job(job)
+                status, error = "ok", None
+            except Exception as e:
+                status, error = "failed", f"{type(e).__name__}: {e}"
+                logger.warning("Batch job %s failed: %s", job["name"], error)
+            result = {
+                "name": job["name"],
+                "output_dir": job["output_dir"],
+                "status": status,
+                "seconds": round(time.perf_counter() - started, 3),
+            }
+            if error:
+                result["error"] = error
+            return result
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(run_one(job) for job in jobs))
+    wall_seconds = time.perf_counter() - started
+
+    succeeded = sum(1 for r in results if r["status"] == "ok")
+    return {
+        "jobs": list(results),
+        "concurrency": concurrency,
+        "wall_seconds": round(wall_seconds, 3),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "newsletters_per_minute": round(succeeded / (wall_seconds / 60), 2) if wall_seconds else 0.0,
+    }
+
+
+def format_batch_report(report: dict) -> str:
+    lines = []
+    for job in report["jobs"]:
+        line = f"  - {job['name']}: {job['status']} in {job['seconds']:.2f}s -> {job['output_dir']}"
+        if job.get("error"):
+            line += f" ({job['error']})"
+        lines.append(line)
+    lines.append(
+        f"  {report['succeeded']} succeeded, {report['failed']} failed in "
+        f"{report['wall_seconds']:.1f}s (concurrency {report['concurrency']}, "
+        f"{report['newsletters_per_minute']:.2f} newsletters/min)"
+    )
+    return "\n".join(lines)
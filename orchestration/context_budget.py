@@ -0,0 +1,254 @@
+# context_budget.py
+# Per-agent context budgets: every model call is measured, and history or upstream state over budget is compacted
+
+import json
+import logging
+import os
+import re
+import threading
+
+from google.adk.plugins.base_plugin import BasePlugin
+
+from orchestration.models import estimate_request_tokens
+
+logger = logging.getLogger(__name__)
+
+# Prompt tokens (estimated, ~4 characters per token) allowed per model call; 0 only measures
+CONTEXT_BUDGET_TOKENS = int(os.environ.get("CONTEXT_BUDGET_TOKENS", 24000))
+# Tighter budgets for agents whose context is mostly upstream state or accumulated tool results
+DEFAULT_AGENT_BUDGETS = {
+    "ContentWritingAgent": 8000,
+    "marketing_coordinator": 8000,
+    "SectionRepairAgent": 4000,
+}
+# Parts smaller than this (characters) are never compacted
+MIN_PART_CHARS = 800
+
+_METRIC_RE = re.compile(
+    r"\d+(?:[.,]\d+)?\s*(?:%|x\b|×|ms\b|s\b|sec|min|hours?|days?|weeks?|months?|years?|k\b|m\b|mb|gb)"
+    r"|[$€£]\s?\d|\b\d{2,}\b",
+    re.I,
+)
+_SELLING_POINT_RE = re.compile(
+    r"\b(?:faster|reduc|sav(?:e|es|ing)|improv|increas|boost|cut|fewer|less|benefit|feature|customer|"
+    r"new|launch|release|support|integrat|automat|cost|time|quality|error|respin|accura|performance|"
+    r"trend|adoption|growth|market)",
+    re.I,
+)
+_BULLET_RE = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+")
+_HEADING_RE = re.compile(r"^\s*(?:#{1,6}\s|\*\*[^*]+\*\*:?\s*$|[A-Z][^.!?]{0,60}:\s*$)")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def parse_budgets(spec: str) -> dict:
+    """"ContentWritingAgent=6000,marketing_coordinator=4000" -> {agent: tokens}."""
+    budgets = {}
+    for item in spec.split(","):
+        if "=" in item:
+            name, tokens = item.split("=", 1)
+            budgets[name.strip()] = int(tokens)
+    return budgets
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4
+
+
+def _score(unit: str) -> int:
+    score = 0
+    if _HEADING_RE.match(unit):
+        score += 3   # keeps the structure (sections, product names)
+    if _METRIC_RE.search(unit):
+        score += 3
+    if _SELLING_POINT_RE.search(unit):
+        score += 2
+    if _BULLET_RE.match(unit):
+        score += 1
+    return score
+
+
+def compact_text(text: str, max_tokens: int) -> str:
+    """Fit text into max_tokens by structured extraction.
+
+    The text is split into lines (long lines into sentences). Headings,
+    lines with metrics (numbers, %, durations, prices) and selling points
+    (benefits, features, customers, launches, trends) are kept first, then
+    other bullets, and repeated lines only once; the kept lines stay in
+    their original order and a note says how many were omitted. A budget too
+    small for the note keeps only the start of the first line.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    units = []
+    for line in text.splitlines():
+        line = line.rstrip()
+        if not line.strip():
+            continue
+        units.extend(_SENTENCE_RE.split(line) if len(line) > 300 else [line])
+    max_chars = max_tokens * 4 - 60   # room for the omission note
+    if max_chars <= 0:
+        # Not even room for the note: the start of the first line (nothing at 0 tokens)
+        return units[0][:max(0, max_tokens * 4)] if units else ""
+    ranked = sorted(range(len(units)), key=lambda i: (-_score(units[i]), i))
+    kept, seen, used = set(), set(), 0
+    for i in ranked:
+        size = len(units[i]) + 1
+        key = " ".join(units[i].lower().split())
+        if key in seen or used + size > max_chars:
+            continue   # repeated lines are dropped too
+        kept.add(i)
+        seen.add(key)
+        used += size
+    if not kept and units:
+        kept, units[0] = {0}, units[0][:max_chars]
+    omitted = len(units) - len(kept)
+    lines = [units[i] for i in sorted(kept)]
+    if omitted:
+        lines.append(f"[... {omitted} of {len(units)} lines omitted to fit the context budget]")
+    return "\n".join(lines)
+
+
+def compact_value(value, max_chars: int):
+    """Shrink a tool response or call argument (str/list/dict) to about max_chars."""
+    if isinstance(value, str):
+        return compact_text(value, max_chars // 4) if len(value) > max_chars else value
+    size = len(json.dumps(value, default=str))
+    if size <= max_chars:
+        return value
+    if isinstance(value, list):
+        items, used = [], 0
+        for item in value:
+            item_size = len(json.dumps(item, default=str))
+            if items and used + item_size > max_chars:
+                items.append(f"[... {len(value) - len(items)} more items omitted to fit the context budget]")
+                break
+            items.append(compact_value(item, max_chars - used))
+            used += min(item_size, max_chars - used)
+        return items
+    if isinstance(value, dict):
+        # Every field keeps its share of the budget
+        return {
+            key: compact_value(item, max(MIN_PART_CHARS // 4, max_chars * len(json.dumps(item, default=str)) // size))
+            for key, item in value.items()
+        }
+    return value
+
+
+def _part_chars(part) -> int:
+    if part.text:
+        return len(part.text)
+    if part.function_response is not None:
+        return len(str(part.function_response.response))
+    if part.function_call is not None:
+        return len(str(part.function_call.args))
+    return 0
+
+
+def _compact_part(part, max_chars: int):
+    # New Part objects: the originals belong to the session's events
+    if part.text:
+        return part.model_copy(update={"text": compact_text(part.text, max_chars // 4)})
+    if part.function_response is not None:
+        response = part.function_response
+        return part.model_copy(update={"function_response": response.model_copy(
+            update={"response": compact_value(response.response or {}, max_chars)})})
+    call = part.function_call
+    return part.model_copy(update={"function_call": call.model_copy(
+        update={"args": compact_value(call.args or {}, max_chars)})})
+
+
+def compact_contents(contents: list, excess_tokens: int) -> list:
+    """Copy of a request's contents with about excess_tokens removed.
+
+    Older turns go first: tool results and tool call arguments (search
+    results, template HTML, sub-agent outputs in the coordinator), then older
+    text; the latest turn is only compacted when that is not enough.
+    Within a group, the largest parts are compacted first.
+    """
+    contents = list(contents)
+    last = len(contents) - 1
+    candidates = [
+        (i == last, part.text is not None, -_part_chars(part), i, j)
+        for i, content in enumerate(contents)
+        for j, part in enumerate(content.parts or [])
+        if _part_chars(part) > MIN_PART_CHARS
+    ]
+    excess = excess_tokens * 4
+    for _latest, _is_text, negative_size, i, j in sorted(candidates):
+        if excess <= 0:
+            break
+        size = -negative_size
+        part = _compact_part(contents[i].parts[j], max(MIN_PART_CHARS, size - excess))
+        excess -= size - _part_chars(part)
+        parts = list(contents[i].parts)
+        parts[j] = part
+        contents[i] = contents[i].model_copy(update={"parts": parts})
+    return contents
+
+
+class ContextBudgetPlugin(BasePlugin):
+    """Keeps each agent's model calls within its context budget.
+
+    Registered next to the instrumentation plugin, so it sees every model
+    call, including agents run through AgentTool. Each request is measured;
+    when it is over the agent's budget, its history is compacted
+    (compact_contents) before it is sent, so the LLM response cache sees the
+    compacted request too. Before/after token counts are logged and kept per
+    agent (format_stats).
+    """
+
+    def __init__(self, default_budget: int = CONTEXT_BUDGET_TOKENS, budgets: dict = None):
+        super().__init__(name="newsletter_context_budget")
+        self.default_budget = default_budget
+        self.budgets = {**DEFAULT_AGENT_BUDGETS, **parse_budgets(os.environ.get("CONTEXT_BUDGETS", "")),
+                        **(budgets or {})}
+        self._lock = threading.Lock()
+        self.stats = {}
+
+    def budget_for(self, agent_name: str) -> int:
+        """Prompt token budget of an agent's model calls (0: unlimited)."""
+        return self.budgets.get(agent_name, self.default_budget)
+
+    async def before_model_callback(self, *, callback_context, llm_request):
+        agent_name = callback_context.agent_name
+        budget = self.budget_for(agent_name)
+        before = after = estimate_request_tokens(llm_request)
+        if budget and before > budget:
+            llm_request.contents = compact_contents(llm_request.contents or [], before - budget)
+            after = estimate_request_tokens(llm_request)
+            if after < before:
+                logger.info("Context of %s compacted: %d -> %d tokens (budget %d)", agent_name, before, after, budget)
+            if after > budget:
+                # What is left is the instruction and small parts, which are never compacted
+                logger.warning("Context of %s is %d tokens over its budget of %d", agent_name, after - budget, budget)
+        else:
+            logger.debug("Context of %s: %d tokens (budget %d)", agent_name, before, budget)
+        with self._lock:
+            row = self.stats.setdefault(agent_name, {"calls": 0, "compacted": 0, "tokens_before": 0,
+                                                     "tokens_after": 0, "max_tokens": 0})
+            row["calls"] += 1
+            row["compacted"] += 1 if after < before else 0
+            row["tokens_before"] += before
+            row["tokens_after"] += after
+            row["max_tokens"] = max(row["max_tokens"], after)
+        return None
+
+    def format_stats(self) -> str:
+        lines = [f"{'context budget':<28}{'calls':>7}{'compacted':>11}{'tokens in':>11}{'sent':>9}{'max':>8}{'budget':>8}"]
+        for name, row in sorted(self.stats.items()):
+            lines.append(
+                f"{name:<28}{row['calls']:>7}{row['compacted']:>11}{row['tokens_before']:>11}"
+                f"{row['tokens_after']:>9}{row['max_tokens']:>8}{self.budget_for(name) or '-':>8}"
+            )
+        return "\n".join(lines)
+
+
+_context_budget = None
+
+
+def get_context_budget() -> ContextBudgetPlugin:
+    """Return the process-wide context budget plugin."""
+    global _context_budget
+    if _context_budget is None:
+        _context_budget = ContextBudgetPlugin()
+    return _context_budget
@@ -0,0 +1,150 @@
+# html_repair.py
+# Validates a written newsletter and has the model regenerate only the sections that fail
+
+import asyncio
+import logging
+import os
+import re
+import time
+from pathlib import Path
+
+from func_tools.html_validator import VALIDATOR_VERSION, autofix_html, format_issues, validate_html
+from func_tools.output_store import get_output_store
+
+logger = logging.getLogger(__name__)
+
+# Regeneration rounds before giving up (0: validate and auto-fix only)
+HTML_REPAIR_ROUNDS = int(os.environ.get("HTML_REPAIR_ROUNDS", 2))
+
+_FENCE_RE = re.compile(r"```(?:html)?[ \t]*\n?(.*?)```", re.S | re.I)
+_DOCUMENT_RE = re.compile(r"<!DOCTYPE|<html\b|<body\b", re.I)
+
+
+def extract_fragment(text: str) -> str:
+    """The HTML of a section from a model reply (inside a code fence or bare)."""
+    match = _FENCE_RE.search(text or "")
+    return (match.group(1) if match else text or "").strip()
+
+
+def section_request(source: str, report: dict, index: int, issues: list) -> str:
+    """Message asking for one section to be regenerated.
+
+    Carries the problems, a one-line outline of the other sections (for
+    context) and that section's HTML only, never the whole document.
+    """
+    section = report["sections"][index]
+    outline = "\n".join(
+        f"{'>' if s['index'] == index else ' '} {s['index']}. <{s['tag']}> {s['label'] or '(no text)'}"
+        for s in report["sections"]
+    )
+    return (
+        f"Section {index} of the newsletter failed validation:\n{format_issues(issues)}\n\n"
+        f"Document outline (> marks this section):\n{outline}\n\n"
+        f"Section {index} HTML:\n```html\n{source[section['start']:section['end']]}\n```\n\n"
+        "Reply with the corrected HTML of this section only."
+    )
+
+
+async def repair_html(source: str, regenerate=None, rounds: int = HTML_REPAIR_ROUNDS) -> tuple:
+    """Validate a newsletter and repair it section by section.
+
+    Forbidden scripts, fonts and stylesheets are removed locally
+    (autofix_html). For the remaining errors, each failing section is sent
+    to regenerate (concurrently) and the replies are spliced back in place;
+    this repeats up to rounds times until the document validates.
+
+    Args:
+        source: The newsletter HTML
+        regenerate: async (message) -> reply text, e.g. a run of Section_Repair_Agent;
+            None only validates and auto-fixes
+        rounds: Maximum regeneration rounds
+
+    Returns:
+        tuple: (html, report) - report has the final validation result
+        ("valid", "errors", "warnings", "issues"), the errors found at first,
+        what was auto-fixed and each round's regenerated sections
+    """
+    started = time.perf_counter()
+    report = validate_html(source)
+    initial_errors = report["errors"]
+    fixed = []
+    if not report["valid"]:
+        source, fixed = autofix_html(source)
+        if fixed:
+            report = validate_html(source)
+
+    history = []
+    for _ in range(rounds if regenerate is not None else 0):
+        if report["valid"]:
+            break
+        targets = {}
+        for issue in report["issues"]:
+            if issue["severity"] == "error" and issue["section"] is not None:
+                targets.setdefault(issue["section"], []).append(issue)
+        if not targets:
+            break   # only document-level errors left; regenerating sections won't fix them
+        round_started = time.perf_counter()
+        replies = await asyncio.gather(
+            *(regenerate(section_request(source, report, index, issues)) for index, issues in targets.items()),
+            return_exceptions=True,
+        )
+        replaced = []
+        # Back to front, so the offsets of earlier sections stay valid
+        for index, reply in sorted(zip(targets, replies), key=lambda pair: pair[0], reverse=True):
+            if isinstance(reply, BaseException):
+                logger.warning("Regenerating section %d failed: %s", index, reply)
+                continue
+            fragment = extract_fragment(reply)
+            if not fragment or _DOCUMENT_RE.search(fragment):
+                logger.warning("Section %d: the reply is not a section, keeping it as it was", index)
+                continue
+            section = report["sections"][index]
+            source = source[:section["start"]] + fragment + source[section["end"]:]
+            replaced.append(index)
+        report = validate_html(source)
+        history.append({
+            "sections": sorted(targets),
+            "replaced": sorted(replaced),
+            "errors_after": report["errors"],
+            "seconds": round(time.perf_counter() - round_started, 3),
+        })
+        if not replaced:
+            break
+
+    return source, {
+        "version": VALIDATOR_VERSION,
+        "valid": report["valid"],
+        "errors": report["errors"],
+        "warnings": report["warnings"],
+        "issues": report["issues"],
+        "initial_errors": initial_errors,
+        "autofixed": fixed,
+        "rounds": history,
+        "ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+async def repair_newsletter(html_path, regenerate=None, rounds: int = HTML_REPAIR_ROUNDS) -> dict:
+    """Validate and repair a written newsletter in place (see repair_html)."""
+    html_path = Path(html_path).absolute()
+    store = get_output_store(html_path.parent)
+    source = store.read_text(html_path)
+    repaired, report = await repair_html(source, regenerate, rounds)
+    if repaired != source:
+        store.write_text(html_path, repaired)
+    return report
+
+
+def format_report(report: dict) -> str:
+    line = (
+        f"Validation: {'passed' if report['valid'] else 'FAILED'} ({report['errors']} errors, "
+        f"{report['warnings']} warnings; {report['initial_errors']} errors before repair)"
+    )
+    if report["autofixed"]:
+        line += f", auto-fixed: {', '.join(report['autofixed'])}"
+    if report["rounds"]:
+        regenerated = sum(len(r["replaced"]) for r in report["rounds"])
+        line += f", {regenerated} sections regenerated in {len(report['rounds'])} rounds"
+    if not report["valid"]:
+        line += "\n" + format_issues([i for i in report["issues"] if i["severity"] == "error"])
+    return line
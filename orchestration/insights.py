@@ -0,0 +1,339 @@
+# insights.py
+# Incremental internal insights: one summary per product document, kept in a manifest keyed by content hash,
+# so research only summarizes new or changed PDFs and merges the rest from disk
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import AsyncGenerator
+
+from google.adk.agents import BaseAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event, EventActions
+from google.genai import types
+
+from func_tools.output_store import atomic_write_text, file_lock
+from func_tools.pdf_cache import pdf_text_cache
+
+logger = logging.getLogger(__name__)
+
+INSIGHTS_MANIFEST_PATH = os.environ.get("INSIGHTS_MANIFEST_PATH", "./.cache/product_insights.json")
+MANIFEST_VERSION = 1
+# Tokens of document text sent to summarize one document (longer documents are compacted first)
+DOCUMENT_BUDGET_TOKENS = int(os.environ.get("INSIGHTS_DOCUMENT_TOKENS", 6000))
+# Tokens of the merged internal_insights; each document gets an equal share (0: no limit)
+INSIGHTS_BUDGET_TOKENS = int(os.environ.get("INSIGHTS_BUDGET_TOKENS", 4000))
+# Smallest share a document is compacted to; below it, documents keep their first line or are left out
+MIN_DOCUMENT_TOKENS = 40
+# Documents summarized at the same time (the rate limiter still bounds the model requests)
+INSIGHTS_CONCURRENCY = int(os.environ.get("INSIGHTS_CONCURRENCY", 8))
+
+# State key with the product_data directory of a run (default: ./product_data)
+PRODUCT_DATA_KEY = "product_data_dir"
+# State key suffix of the record of what a run summarized and reused
+INSIGHTS_INFO_SUFFIX = "_source"
+
+
+def insights_info_key(output_key: str) -> str:
+    return f"{output_key}{INSIGHTS_INFO_SUFFIX}"
+
+
+def document_text(pages: list, max_tokens: int = DOCUMENT_BUDGET_TOKENS) -> str:
+    """A document's text with page markers, compacted to max_tokens."""
+    from orchestration.context_budget import compact_text
+
+    text = "\n".join(f"[page {i + 1}]\n{page.strip()}" for i, page in enumerate(pages) if page.strip())
+    return compact_text(text, max_tokens) if max_tokens else text
+
+
+def merge_insights(summaries: dict, max_tokens: int = INSIGHTS_BUDGET_TOKENS) -> str:
+    """Combine per-document summaries ({name: summary}) into one internal_insights text.
+
+    No model call: one section per document, in name order, so the result
+    only changes where a document did. Over max_tokens, every summary is
+    compacted to an equal share of what the headings leave, so no document
+    crowds out the others. When the share drops below MIN_DOCUMENT_TOKENS (many documents), each
+    keeps only its first line, and the documents that still don't fit are
+    left out with a note.
+    """
+    from orchestration.context_budget import compact_text
+
+    sections = sorted((name, summary.strip()) for name, summary in summaries.items())
+    if not max_tokens or not sections:
+        return "\n\n".join(f"## {name}\n{summary}" for name, summary in sections)
+    headings = sum(len(name) + 6 for name, _ in sections) // 4
+    share = (max_tokens - headings) // len(sections)
+    if share >= MIN_DOCUMENT_TOKENS:
+        return "\n\n".join(f"## {name}\n{compact_text(summary, share)}" for name, summary in sections)
+
+    max_chars = max_tokens * 4 - 80   # room for the note
+    merged, used = [], 0
+    for name, summary in sections:
+        first_line = summary.splitlines()[0] if summary else ""
+        section = f"## {name}\n{first_line[:MIN_DOCUMENT_TOKENS * 4]}"
+        if used + len(section) + 2 > max_chars:
+            break
+        merged.append(section)
+        used += len(section) + 2
+    omitted = len(sections) - len(merged)
+    merged.append(f"[... {len(sections)} documents: only first lines kept"
+                  + (f", {omitted} documents omitted" if omitted else "") + " to fit the context budget]")
+    return "\n\n".join(merged)
+
+
+class InsightsManifest:
+    """Per-document summaries on disk, keyed by PDF content hash and summarizer fingerprint.
+
+    A renamed document keeps its summary, an edited one gets a new entry,
+    and a changed prompt or model (the fingerprint) invalidates them all.
+    Entries are saved as each document is summarized, so an interrupted run
+    only redoes the documents it had not finished. Saves merge with the file
+    under a file lock, so processes sharing the manifest keep each other's
+    entries, and a directory's scan prunes the entries of its documents that
+    are gone (prune). Within a process,
+    concurrent runs that miss the same document wait for the one summary in
+    flight (lock) instead of each summarizing it.
+    """
+
+    def __init__(self, path=INSIGHTS_MANIFEST_PATH):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._entries = None
+        self._locks = {}
+        self._loop = None
+        self.stats = {"reused": 0, "summarized": 0, "failed": 0, "pruned": 0}
+
+    @staticmethod
+    def key(content_sha: str, fingerprint: str = "") -> str:
+        return f"{content_sha}:{hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()[:12]}"
+
+    def _read(self) -> dict:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            if data.get("version") == MANIFEST_VERSION:
+                return data.get("documents", {})
+        except (OSError, ValueError):
+            pass
+        return {}
+
+    def _load(self) -> dict:
+        if self._entries is None:
+            self._entries = self._read()
+        return self._entries
+
+    def _update(self, change) -> None:
+        """Apply change(entries) to the entries on disk and save them (caller holds _lock)."""
+        with file_lock(self.path):
+            self._entries = self._read()
+            change(self._entries)
+            snapshot = json.dumps({"version": MANIFEST_VERSION, "documents": self._entries}, indent=2)
+            atomic_write_text(self.path, snapshot)
+
+    def get(self, key: str):
+        """Entry {"source", "summary", "pages", "summarized_at"} for key, or None."""
+        with self._lock:
+            return self._load().get(key)
+
+    def put(self, key: str, source: str, summary: str, pages: int, directory: str = "") -> None:
+        entry = {"source": source, "summary": summary, "pages": pages, "directory": directory,
+                 "summarized_at": time.time()}
+        with self._lock:
+            self._update(lambda entries: entries.update({key: entry}))
+
+    def prune(self, directory: str, content_hashes) -> int:
+        """Drop the entries of directory whose document content is no longer in it; returns how many.
+
+        Entries saved from other directories are kept (a document's summary
+        is shared by content hash, so the other directory re-summarizes it at
+        worst), as are those of documents still present.
+        """
+        content_hashes = set(content_hashes)
+
+        def gone(key, entry):
+            return entry.get("directory", "") in ("", directory) and key.split(":")[0] not in content_hashes
+
+        with self._lock:
+            if not any(gone(key, entry) for key, entry in self._load().items()):
+                return 0
+            pruned = []
+
+            def change(entries):
+                pruned.extend(key for key, entry in entries.items() if gone(key, entry))
+                for key in pruned:
+                    del entries[key]
+
+            self._update(change)
+            self.stats["pruned"] += len(pruned)
+        return len(pruned)
+
+    def lock(self, key: str) -> asyncio.Lock:
+        """Per-key lock so concurrent misses share one summary (locks belong to the running loop)."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._locks = loop, {}
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        return lock
+
+    def record(self, stat: str, count: int = 1) -> None:
+        with self._lock:
+            self.stats[stat] += count
+
+    def format_stats(self) -> str:
+        with self._lock:
+            entries = len(self._load())
+        return (
+            f"Product insights: {self.stats['summarized']} documents summarized, {self.stats['reused']} reused, "
+            f"{self.stats['failed']} failed, {self.stats['pruned']} pruned ({entries} in the manifest)"
+        )
+
+
+_insights_manifest = None
+
+
+def get_insights_manifest() -> InsightsManifest:
+    """Process-wide product insights manifest."""
+    global _insights_manifest
+    if _insights_manifest is None:
+        _insights_manifest = InsightsManifest()
+    return _insights_manifest
+
+
+class IncrementalInsightsAgent(BaseAgent):
+    """Fills output_key with the merged insights of every PDF in the product_data directory.
+
+    Documents are identified by content hash. Those with a summary in the
+    InsightsManifest are reused; only new or changed ones are extracted (PDF
+    text cache) and summarized, concurrently, each by its own run of the
+    summarizer sub-agent. The summaries are then merged locally
+    (merge_insights), and an <output_key>_source record counts what was
+    reused and summarized. A document that fails is left out and
+    the agent raises afterwards, so the research stage is retried next run.
+    """
+
+    output_key: str
+    fingerprint: str = ""
+    default_directory: str = "./product_data"
+
+    async def _summarize(self, manifest: InsightsManifest, key: str, name: str, pages: list,
+                         semaphore: asyncio.Semaphore, directory: str) -> tuple:
+        """(summary, summarized) for one document; summarized is False when another run just did it."""
+        from orchestration.pipeline import run_agent
+
+        summarizer = self.sub_agents[0]
+        async with manifest.lock(key):
+            entry = manifest.get(key)
+            if entry is not None:
+                return entry["summary"], False
+            async with semaphore:
+                state = await run_agent(
+                    summarizer,
+                    f"Document: {name} ({len(pages)} pages)\n\n{document_text(pages)}",
+                )
+            summary = (state.get(summarizer.output_key) or "").strip()
+            if not summary:
+                raise RuntimeError(f"{summarizer.name} returned no summary for {name}")
+            manifest.put(key, name, summary, len(pages), directory=directory)
+            return summary, True
+
+    async def _run_async_impl(
+        self, ctx: InvocationContext
+    ) -> AsyncGenerator[Event, None]:
+        manifest = get_insights_manifest()
+        directory = Path(ctx.session.state.get(PRODUCT_DATA_KEY) or self.default_directory).absolute()
+
+        def scan():
+            return {str(p): pdf_text_cache.content_hash(p) for p in sorted(directory.rglob("*.pdf"))}
+
+        hashes = await asyncio.to_thread(scan)
+        documents = {path: manifest.key(sha, self.fingerprint) for path, sha in hashes.items()}
+        if hashes:
+            # Summaries of documents removed or replaced since the last scan (an empty directory prunes nothing)
+            manifest.prune(str(directory), hashes.values())
+        names = {path: str(Path(path).relative_to(directory)) for path in documents}
+        summaries, stale = {}, []
+        for path, key in documents.items():
+            entry = manifest.get(key)
+            if entry is None:
+                stale.append(path)
+            else:
+                summaries[names[path]] = entry["summary"]
+
+        failed, summarized = {}, 0
+        if stale:
+            extracted = await asyncio.to_thread(pdf_text_cache.get_or_extract_many, stale)
+            semaphore = asyncio.Semaphore(max(1, INSIGHTS_CONCURRENCY))
+            pending = {}
+            for path in stale:
+                result = extracted[path]
+                if isinstance(result, Exception):
+                    failed[names[path]] = f"extraction failed: {result}"
+                else:
+                    pending[path] = result[0]
+            results = await asyncio.gather(
+                *(self._summarize(manifest, documents[path], names[path], pages, semaphore, str(directory))
+                  for path, pages in pending.items()),
+                return_exceptions=True,
+            )
+            for path, result in zip(pending, results):
+                if isinstance(result, BaseException):
+                    failed[names[path]] = str(result)
+                    continue
+                summaries[names[path]], fresh = result
+                summarized += 1 if fresh else 0
+
+        reused = len(documents) - summarized - len(failed)
+        manifest.record("reused", reused)
+        manifest.record("summarized", summarized)
+        manifest.record("failed", len(failed))
+        info = {
+            "source": "manifest",
+            "documents": len(documents),
+            "reused": reused,
+            "summarized": summarized,
+            "names": sorted(names.values()),
+            "failed": failed,
+        }
+        logger.info("Product insights: %d documents, %d summarized, %d reused, %d failed",
+                    len(documents), summarized, reused, len(failed))
+        text = merge_insights(summaries) if summaries else ""
+        yield Event(
+            invocation_id=ctx.invocation_id,
+            author=self.name,
+            branch=ctx.branch,
+            content=types.Content(role="model", parts=[types.Part(text=text)]) if text else None,
+            actions=EventActions(state_delta={self.output_key: text, insights_info_key(self.output_key): info}),
+        )
+        if not documents:
+            raise FileNotFoundError(f"No PDF documents in {directory}")
+        if failed:
+            raise RuntimeError(f"{len(failed)} of {len(documents)} product documents could not be summarized: "
+                               + "; ".join(f"{name}: {error}" for name, error in sorted(failed.items())))
+
+
+def build_insights_source(summarizer, output_key: str = "internal_insights", fingerprint: str = "",
+                          default_directory: str = "./product_data",
+                          name: str = "IncrementalInsightsAgent") -> IncrementalInsightsAgent:
+    """Internal insights source for the research stage.
+
+    Args:
+        summarizer: Agent that summarizes one document's text (its output_key holds the summary)
+        output_key: State key the merged insights are written to
+        fingerprint: Anything that changes a summary, e.g. prompt and model
+        default_directory: product_data directory when the state has no PRODUCT_DATA_KEY
+    """
+    return IncrementalInsightsAgent(
+        name=name,
+        output_key=output_key,
+        fingerprint=fingerprint,
+        default_directory=default_directory,
+        description="Summarizes the product documents that are new or changed and merges them with the "
+                    "stored summaries of the others into the internal product insights",
+        sub_agents=[summarizer],
+    )
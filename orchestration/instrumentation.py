@@ -0,0 +1,261 @@
+# instrumentation.py
+# Per-agent / per-tool instrumentation exported as JSONL traces plus an end-of-run summary
+
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+from google.adk.plugins.base_plugin import BasePlugin
+
+TRACE_DIR = os.environ.get("NEWSLETTER_TRACE_DIR", "./output/traces")
+
+# USD per million tokens, for cost estimates (defaults: gemini-2.5-flash-lite list price)
+PRICE_INPUT_PER_M = float(os.environ.get("GEMINI_PRICE_INPUT_PER_M", 0.10))
+PRICE_OUTPUT_PER_M = float(os.environ.get("GEMINI_PRICE_OUTPUT_PER_M", 0.40))
+
+# Recent spans kept in memory; every span is in the trace file, and totals are kept as they are recorded
+SPAN_HISTORY = int(os.environ.get("NEWSLETTER_TRACE_SPANS", 2000))
+
+# Label attached to every span recorded in the current asyncio task (e.g. a
+# batch job or variant name), so concurrent runs can be accounted separately
+run_label = contextvars.ContextVar("run_label", default=None)
+
+
+def estimate_cost_usd(prompt_tokens: int, completion_tokens: int) -> float:
+    return round((prompt_tokens * PRICE_INPUT_PER_M + completion_tokens * PRICE_OUTPUT_PER_M) / 1e6, 6)
+
+
+def usage_delta(after: dict, before: dict) -> dict:
+    """Difference of two usage() snapshots."""
+    delta = {k: after[k] - before[k] for k in ("model_calls", "prompt_tokens", "completion_tokens")}
+    delta["cost_usd"] = estimate_cost_usd(delta["prompt_tokens"], delta["completion_tokens"])
+    return delta
+
+
+def _empty_usage() -> dict:
+    return {"model_calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "tool_calls": 0, "tool_errors": 0}
+
+
+class InstrumentationPlugin(BasePlugin):
+    """Records agent, model and tool spans for every run it is attached to.
+
+    Registered on the Runner/App as a plugin, so it also sees agents run
+    through AgentTool (plugins are inherited by the nested runner). Each
+    finished span is appended to a JSONL trace file:
+
+        {"kind": "agent", "agent": ..., "wall_s": ..., ...}
+        {"kind": "model", "agent": ..., "model_s": ..., "prompt_tokens": ...,
+         "completion_tokens": ..., "retries": ..., "cache": ..., "model": ..., "hedged": ...}
+        {"kind": "tool", "agent": ..., "tool": ..., "wall_s": ..., "error": ...}
+
+    Only the last SPAN_HISTORY spans stay in memory (spans); usage() and
+    summary() read totals updated as spans are recorded, so a long-lived
+    service does not grow or rescan its history. forget_run() drops the
+    usage of a run label once its job is done.
+    """
+
+    def __init__(self, trace_path=None):
+        super().__init__(name="newsletter_instrumentation")
+        if trace_path is None:
+            trace_path = Path(TRACE_DIR) / f"run-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.jsonl"
+        self.trace_path = Path(trace_path)
+        self.spans = deque(maxlen=SPAN_HISTORY)
+        self._open = {}
+        self._lock = threading.Lock()
+        self._usage = _empty_usage()
+        self._run_usage = {}
+        self._agents = {}
+        self._tools = {}
+
+    def _aggregate(self, span: dict) -> None:
+        for usage in (self._usage, self._run_usage.setdefault(span["run"], _empty_usage())):
+            if span["kind"] == "model":
+                usage["model_calls"] += 1
+                usage["prompt_tokens"] += span["prompt_tokens"]
+                usage["completion_tokens"] += span["completion_tokens"]
+            elif span["kind"] == "tool":
+                usage["tool_calls"] += 1
+                usage["tool_errors"] += 1 if span["error"] else 0
+        if span["kind"] == "tool":
+            row = self._tools.setdefault(span["tool"], {"calls": 0, "wall_s": 0.0, "errors": 0})
+            row["calls"] += 1
+            row["wall_s"] += span["wall_s"]
+            row["errors"] += 1 if span["error"] else 0
+        row = self._agents.setdefault(span["agent"], {
+            "runs": 0, "wall_s": 0.0, "model_calls": 0, "model_s": 0.0,
+            "prompt_tokens": 0, "completion_tokens": 0, "retries": 0,
+            "cache_hits": 0, "tool_calls": 0,
+        })
+        if span["kind"] == "agent":
+            row["runs"] += 1
+            row["wall_s"] += span["wall_s"]
+        elif span["kind"] == "model":
+            row["model_calls"] += 1
+            row["model_s"] += span["model_s"]
+            row["prompt_tokens"] += span["prompt_tokens"]
+            row["completion_tokens"] += span["completion_tokens"]
+            row["retries"] += span["retries"]
+            row["cache_hits"] += 1 if span["cache"] == "hit" else 0
+        else:
+            row["tool_calls"] += 1
+
+    def _record(self, span: dict) -> None:
+        span["run"] = run_label.get()
+        with self._lock:
+            self.spans.append(span)
+            self._aggregate(span)
+            self.trace_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.trace_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(span) + "\n")
+
+    # Agents
+
+    async def before_agent_callback(self, *, agent, callback_context):
+        self._open[("agent", callback_context.invocation_id, agent.name)] = time.perf_counter()
+        return None
+
+    async def after_agent_callback(self, *, agent, callback_context):
+        started = self._open.pop(("agent", callback_context.invocation_id, agent.name), None)
+        if started is not None:
+            self._record({
+                "kind": "agent",
+                "ts": time.time(),
+                "invocation_id": callback_context.invocation_id,
+                "agent": agent.name,
+                "wall_s": round(time.perf_counter() - started, 4),
+            })
+        return None
+
+    # Model calls
+
+    async def before_model_callback(self, *, callback_context, llm_request):
+        self._open[("model", callback_context.invocation_id, callback_context.agent_name)] = time.perf_counter()
+        return None
+
+    async def after_model_callback(self, *, callback_context, llm_response):
+        key = ("model", callback_context.invocation_id, callback_context.agent_name)
+        started = self._open.pop(key, None)
+        if started is None or llm_response.partial:
+            if started is not None:
+                self._open[key] = started
+            return None
+        usage = llm_response.usage_metadata
+        metadata = llm_response.custom_metadata or {}
+        self._record({
+            "kind": "model",
+            "ts": time.time(),
+            "invocation_id": callback_context.invocation_id,
+            "agent": callback_context.agent_name,
+            "model_s": round(time.perf_counter() - started, 4),
+            "prompt_tokens": (usage.prompt_token_count or 0) if usage else 0,
+            "completion_tokens": (usage.candidates_token_count or 0) if usage else 0,
+            "retries": metadata.get("gemini_retries", 0),
+            "cache": metadata.get("llm_cache"),
+            # Model that answered (a fallback, see model_routing.py) and whether the request was hedged
+            "model": metadata.get("gemini_model"),
+            "hedged": metadata.get("gemini_hedged", False),
+            "error": llm_response.error_code,
+        })
+        return None
+
+    async def on_model_error_callback(self, *, callback_context, llm_request, error):
+        started = self._open.pop(("model", callback_context.invocation_id, callback_context.agent_name), None)
+        self._record({
+            "kind": "model",
+            "ts": time.time(),
+            "invocation_id": callback_context.invocation_id,
+            "agent": callback_context.agent_name,
+            "model_s": round(time.perf_counter() - started, 4) if started else 0.0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "retries": 0,
+            "cache": None,
+            "model": None,
+            "hedged": False,
+            "error": f"{type(error).__name__}: {error}",
+        })
+        return None
+
+    # Tool calls
+
+    async def before_tool_callback(self, *, tool, tool_args, tool_context):
+        self._open[("tool", tool_context.function_call_id)] = time.perf_counter()
+        return None
+
+    def _record_tool(self, tool, tool_context, error=None):
+        started = self._open.pop(("tool", tool_context.function_call_id), None)
+        self._record({
+            "kind": "tool",
+            "ts": time.time(),
+            "invocation_id": tool_context.invocation_id,
+            "agent": tool_context.agent_name,
+            "tool": tool.name,
+            "wall_s": round(time.perf_counter() - started, 4) if started else 0.0,
+            "error": error,
+        })
+
+    async def after_tool_callback(self, *, tool, tool_args, tool_context, result):
+        error = result.get("error") if isinstance(result, dict) and result.get("success") is False else None
+        self._record_tool(tool, tool_context, error)
+        return None
+
+    async def on_tool_error_callback(self, *, tool, tool_args, tool_context, error):
+        self._record_tool(tool, tool_context, f"{type(error).__name__}: {error}")
+        return None
+
+    # Reporting
+
+    def usage(self, run=None) -> dict:
+        """Model calls, tokens, tool calls and estimated cost, for one run label or overall."""
+        with self._lock:
+            usage = dict(self._usage if run is None else self._run_usage.get(run) or _empty_usage())
+        usage["cost_usd"] = estimate_cost_usd(usage["prompt_tokens"], usage["completion_tokens"])
+        return usage
+
+    def forget_run(self, run) -> None:
+        """Drop the per-run usage of a finished run (it stays in the overall totals and the trace)."""
+        with self._lock:
+            self._run_usage.pop(run, None)
+
+    def summary(self) -> dict:
+        """Aggregate spans per agent and per tool."""
+        with self._lock:
+            return {
+                "agents": {name: dict(row) for name, row in self._agents.items()},
+                "tools": {name: dict(row) for name, row in self._tools.items()},
+            }
+
+    def format_summary(self) -> str:
+        summary = self.summary()
+        lines = [
+            f"{'agent':<28}{'runs':>5}{'wall s':>9}{'model s':>9}{'calls':>7}"
+            f"{'prompt tok':>12}{'compl tok':>11}{'retries':>9}{'tools':>7}"
+        ]
+        for name, row in sorted(summary["agents"].items(), key=lambda item: -item[1]["wall_s"]):
+            lines.append(
+                f"{name:<28}{row['runs']:>5}{row['wall_s']:>9.2f}{row['model_s']:>9.2f}"
+                f"{row['model_calls']:>7}{row['prompt_tokens']:>12}{row['completion_tokens']:>11}"
+                f"{row['retries']:>9}{row['tool_calls']:>7}"
+            )
+        if summary["tools"]:
+            lines.append("")
+            lines.append(f"{'tool':<28}{'calls':>7}{'wall s':>9}{'errors':>8}")
+            for name, row in sorted(summary["tools"].items(), key=lambda item: -item[1]["wall_s"]):
+                lines.append(f"{name:<28}{row['calls']:>7}{row['wall_s']:>9.2f}{row['errors']:>8}")
+        lines.append(f"\nTrace: {self.trace_path}")
+        return "\n".join(lines)
+
+
+_instrumentation = None
+
+
+def get_instrumentation() -> InstrumentationPlugin:
+    """Return the process-wide instrumentation plugin."""
+    global _instrumentation
+    if _instrumentation is None:
+        _instrumentation = InstrumentationPlugin()
+    return _instrumentation
@@ -0,0 +1,129 @@
+# llm_cache.py
+# On-disk LLM response cache with read-through, record and strict replay modes
+
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    # Imported lazily at runtime, so the CLI can read MODES without loading ADK
+    from google.adk.models.llm_request import LlmRequest
+
+logger = logging.getLogger(__name__)
+
+MODES = ("off", "read_through", "record", "replay")
+
+DEFAULT_CACHE_DIR = os.environ.get("LLM_CACHE_DIR", "./.cache/llm_responses")
+
+# Fields that differ between otherwise identical requests (generated call ids,
+# opaque thought signatures) and must not affect the key
+_VOLATILE_KEYS = {"id", "thought_signature"}
+
+
+class LlmCacheMiss(RuntimeError):
+    """Raised in replay mode when a request has no recorded response."""
+
+
+def _strip_volatile(value):
+    if isinstance(value, dict):
+        return {k: _strip_volatile(v) for k, v in value.items() if k not in _VOLATILE_KEYS}
+    if isinstance(value, list):
+        return [_strip_volatile(v) for v in value]
+    return value
+
+
+def request_key(model: str, llm_request: "LlmRequest") -> str:
+    """Cache key over model name, instruction, tool declarations and contents."""
+    config = llm_request.config
+    payload = {
+        "model": model,
+        "system_instruction": str(config.system_instruction) if config and config.system_instruction else None,
+        "tools": [t.model_dump(mode="json", exclude_none=True) for t in (config.tools or [])] if config else [],
+        "response_schema": config.response_schema is not None if config else False,
+        "contents": [c.model_dump(mode="json", exclude_none=True) for c in llm_request.contents or []],
+    }
+    canonical = json.dumps(_strip_volatile(payload), sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class LlmResponseCache:
+    """Stores model responses on disk, one JSON file per request key.
+
+    Modes:
+        off          - no caching
+        read_through - serve hits, call the model on a miss and store the result
+        record       - always call the model and (over)write the stored result
+        replay       - serve hits only; a miss raises LlmCacheMiss (no network)
+    """
+
+    def __init__(self, mode: str = "off", cache_dir=DEFAULT_CACHE_DIR):
+        if mode not in MODES:
+            raise ValueError(f"Unknown LLM cache mode {mode!r}, expected one of {MODES}")
+        self.mode = mode
+        self.cache_dir = Path(cache_dir)
+        self.stats = {"hits": 0, "misses": 0, "stores": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def lookup(self, key: str):
+        """Return recorded responses for key, or None if the model must be called."""
+        if self.mode in ("off", "record"):
+            return None
+        try:
+            entry = json.loads(self._path(key).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self.stats["misses"] += 1
+            if self.mode == "replay":
+                raise LlmCacheMiss(
+                    f"No recorded LLM response for request {key[:12]} in {self.cache_dir} "
+                    "(record it first with LLM_CACHE_MODE=record or read_through)"
+                )
+            return None
+        self.stats["hits"] += 1
+        from google.adk.models.llm_response import LlmResponse
+        return [LlmResponse.model_validate(r) for r in entry["responses"]]
+
+    def store(self, key: str, model: str, responses: list) -> None:
+        if self.mode not in ("read_through", "record"):
+            return
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({
+            "model": model,
+            "created": time.time(),
+            "responses": [r.model_dump(mode="json", exclude_none=True) for r in responses],
+        }), encoding="utf-8")
+        os.replace(tmp_path, path)
+        self.stats["stores"] += 1
+
+    def format_stats(self) -> str:
+        s = self.stats
+        return f"LLM cache ({self.mode}): {s['hits']} hits, {s['misses']} misses, {s['stores']} stored"
+
+
+_llm_cache = None
+
+
+def get_llm_cache() -> LlmResponseCache:
+    """Return the process-wide cache, configured from LLM_CACHE_MODE (default off)."""
+    global _llm_cache
+    if _llm_cache is None:
+        _llm_cache = LlmResponseCache(mode=os.environ.get("LLM_CACHE_MODE", "off"))
+    return _llm_cache
+
+
+def set_llm_cache_mode(mode: str) -> LlmResponseCache:
+    """Switch the process-wide cache to mode (e.g. from a CLI flag)."""
+    global _llm_cache
+    _llm_cache = LlmResponseCache(mode=mode)
+    return _llm_cache
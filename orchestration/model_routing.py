@@ -0,0 +1,208 @@
+# model_routing.py
+# Per-agent model chains and deadlines, plus the observed latency histograms that drive request hedging
+
+import asyncio
+import atexit
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+from func_tools.output_store import atomic_write_text, file_lock
+
+logger = logging.getLogger(__name__)
+
+# Fallback models tried (in order) after an agent's own model, unless AGENT_MODELS gives its chain
+MODEL_FALLBACKS = [m.strip() for m in os.environ.get("MODEL_FALLBACKS", "").split(",") if m.strip()]
+# Seconds one model request may take before it counts as failed (0: no deadline)
+GEMINI_DEADLINE_S = float(os.environ.get("GEMINI_DEADLINE_S", 0))
+# Failed attempts on a model before moving on to the next model of the chain (a missed deadline moves on at once)
+FALLBACK_AFTER_ATTEMPTS = int(os.environ.get("GEMINI_FALLBACK_AFTER", 2))
+
+# Hedging: when a request is slower than this percentile of its agent + model, a second one is sent
+GEMINI_HEDGE = os.environ.get("GEMINI_HEDGE", "0").lower() in ("1", "true", "yes", "on")
+HEDGE_PERCENTILE = float(os.environ.get("GEMINI_HEDGE_PERCENTILE", 95))
+HEDGE_MIN_SAMPLES = int(os.environ.get("GEMINI_HEDGE_MIN_SAMPLES", 20))
+
+LATENCY_HISTORY_PATH = os.environ.get("MODEL_LATENCY_PATH", "./.cache/model_latency.json")
+# Most recent latencies kept per agent + model
+LATENCY_WINDOW = 200
+# New latencies are written out after this many requests or seconds (and at exit)
+LATENCY_SAVE_EVERY = 50
+LATENCY_SAVE_INTERVAL_S = 30.0
+
+
+def parse_agent_settings(spec: str) -> dict:
+    """"visual_design=gemini-2.5-flash,gemini-2.5-flash-lite;section_repair=..." -> {agent: [values]}."""
+    settings = {}
+    for item in spec.split(";"):
+        if "=" in item:
+            name, values = item.split("=", 1)
+            settings[name.strip()] = [v.strip() for v in values.split(",") if v.strip()]
+    return settings
+
+
+# e.g. AGENT_MODELS="visual_design=gemini-2.5-flash,gemini-2.5-flash-lite;content_writing=gemini-2.5-flash"
+AGENT_MODELS = parse_agent_settings(os.environ.get("AGENT_MODELS", ""))
+# e.g. AGENT_DEADLINES="visual_design=120;trend_finding=60"
+AGENT_DEADLINES = {name: float(values[0])
+                   for name, values in parse_agent_settings(os.environ.get("AGENT_DEADLINES", "")).items() if values}
+
+
+def model_chain(agent: str, default_model: str) -> list:
+    """Models an agent's calls go to, in fallback order."""
+    return AGENT_MODELS.get(agent) or [default_model, *[m for m in MODEL_FALLBACKS if m != default_model]]
+
+
+def agent_deadline(agent: str) -> float:
+    return AGENT_DEADLINES.get(agent, GEMINI_DEADLINE_S)
+
+
+def percentile(samples, p: float) -> float:
+    """p-th percentile (nearest rank) of samples."""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+class LatencyTracker:
+    """Latency histograms of model requests, per agent and model.
+
+    Successful request latencies (the last LATENCY_WINDOW per key) are kept
+    on disk, so short CLI runs start from what earlier runs observed. The
+    hedge delay of a key is its HEDGE_PERCENTILE latency once it has
+    HEDGE_MIN_SAMPLES samples; with fewer, requests are not hedged.
+
+    Samples are recorded in memory. New ones are merged into the file every
+    LATENCY_SAVE_EVERY requests or LATENCY_SAVE_INTERVAL_S seconds (in a
+    worker thread when called from the event loop) and at exit. Saves merge
+    with what is on disk, under a file lock, so processes sharing the file
+    keep each other's samples.
+    """
+
+    def __init__(self, path=LATENCY_HISTORY_PATH, hedge: bool = GEMINI_HEDGE,
+                 hedge_percentile: float = HEDGE_PERCENTILE, min_samples: int = HEDGE_MIN_SAMPLES):
+        self.path = Path(path) if path else None
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._samples = None
+        self._unsaved = {}
+        self._unsaved_count = 0
+        self._saved_at = time.monotonic()
+        self._saving = False
+        self.stats = {"requests": 0, "hedges": 0, "hedge_wins": 0, "deadline_misses": 0, "fallbacks": 0}
+        if self.path is not None:
+            atexit.register(self.flush)
+
+    @staticmethod
+    def key(agent: str, model: str) -> str:
+        return f"{agent or '-'}:{model}"
+
+    def _read(self) -> dict:
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def _load(self) -> dict:
+        if self._samples is None:
+            samples = self._read() if self.path is not None else {}
+            self._samples = {key: deque(values, maxlen=LATENCY_WINDOW) for key, values in samples.items()}
+        return self._samples
+
+    def record(self, agent: str, model: str, seconds: float) -> None:
+        key, seconds = self.key(agent, model), round(seconds, 3)
+        with self._lock:
+            self._load().setdefault(key, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+            self.stats["requests"] += 1
+            if self.path is None:
+                return
+            self._unsaved.setdefault(key, []).append(seconds)
+            self._unsaved_count += 1
+            due = not self._saving and (self._unsaved_count >= LATENCY_SAVE_EVERY
+                                        or time.monotonic() - self._saved_at >= LATENCY_SAVE_INTERVAL_S)
+            if due:
+                self._saving = True
+        if due:
+            self._save_soon()
+
+    def _save_soon(self) -> None:
+        def done(_task=None):
+            self._saving = False
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            try:
+                self.flush()
+            finally:
+                done()
+            return
+        # Keep file I/O off the event loop; anything a cancelled save did not write is flushed at exit
+        task = loop.create_task(asyncio.to_thread(self.flush))
+        task.add_done_callback(done)
+
+    def flush(self) -> None:
+        """Merge the samples recorded since the last save into the file."""
+        if self.path is None:
+            return
+        with self._save_lock:
+            with self._lock:
+                unsaved, self._unsaved, self._unsaved_count = self._unsaved, {}, 0
+                self._saved_at = time.monotonic()
+            if not unsaved:
+                return
+            try:
+                with file_lock(self.path):
+                    on_disk = self._read()
+                    for key, values in unsaved.items():
+                        merged = deque(on_disk.get(key, ()), maxlen=LATENCY_WINDOW)
+                        merged.extend(values)
+                        on_disk[key] = list(merged)
+                    atomic_write_text(self.path, json.dumps(on_disk))
+            except OSError as e:
+                logger.debug("Could not save model latencies: %s", e)
+
+    def count(self, stat: str) -> None:
+        with self._lock:
+            self.stats[stat] += 1
+
+    def hedge_delay(self, agent: str, model: str):
+        """Seconds to wait before hedging a request, or None to not hedge it."""
+        if not self.hedge:
+            return None
+        with self._lock:
+            samples = self._load().get(self.key(agent, model))
+            if not samples or len(samples) < self.min_samples:
+                return None
+            return percentile(samples, self.hedge_percentile)
+
+    def format_stats(self) -> str:
+        lines = [
+            f"Model requests: {self.stats['requests']}, {self.stats['hedges']} hedged "
+            f"({self.stats['hedge_wins']} won by the hedge), {self.stats['deadline_misses']} deadline misses, "
+            f"{self.stats['fallbacks']} fallbacks"
+        ]
+        with self._lock:
+            for key, samples in sorted(self._load().items()):
+                if samples:
+                    lines.append(f"  {key:<48} n={len(samples):<4} p50 {percentile(samples, 50):6.2f}s  "
+                                 f"p95 {percentile(samples, 95):6.2f}s  p99 {percentile(samples, 99):6.2f}s")
+        return "\n".join(lines)
+
+
+_latency_tracker = None
+
+
+def get_latency_tracker() -> LatencyTracker:
+    """Process-wide latency histograms (shared by every agent's model)."""
+    global _latency_tracker
+    if _latency_tracker is None:
+        _latency_tracker = LatencyTracker()
+    return _latency_tracker
@@ -0,0 +1,226 @@
+# models.py
+# Gemini model wrapper shared by all agents: response cache, rate limiting, retries, fallbacks, deadlines and hedging
+
+import asyncio
+import logging
+import os
+import time
+from typing import AsyncGenerator
+
+from google.adk.models.google_llm import Gemini
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import errors
+
+from orchestration.llm_cache import get_llm_cache, request_key
+from orchestration.model_routing import FALLBACK_AFTER_ATTEMPTS, get_latency_tracker
+from orchestration.rate_limit import RETRYABLE_STATUS_CODES, get_rate_limiter, jittered_backoff
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = int(os.environ.get("GEMINI_MAX_ATTEMPTS", 5))
+
+
+def estimate_request_tokens(llm_request: LlmRequest) -> int:
+    """Rough prompt size in tokens (~4 characters per token)."""
+    chars = 0
+    config = llm_request.config
+    if config is not None and config.system_instruction:
+        chars += len(str(config.system_instruction))
+    for content in llm_request.contents or []:
+        for part in content.parts or []:
+            if part.text:
+                chars += len(part.text)
+            elif part.function_response is not None:
+                chars += len(str(part.function_response.response))
+            elif part.function_call is not None:
+                chars += len(str(part.function_call.args))
+    return max(1, chars // 4)
+
+
+class ManagedGemini(Gemini):
+    """Gemini model whose calls go through the process-wide cache and rate limiter.
+
+    With the LLM response cache enabled (LLM_CACHE_MODE), recorded responses
+    are served without a network call; in replay mode a miss is an error.
+    Every call first reserves requests/min and tokens/min budget and a
+    concurrency slot. Retryable errors (429/500/503/504) are retried here
+    with full-jitter exponential backoff, and 429/503 also shrink the shared
+    concurrency limit, so agents back off together instead of in lockstep.
+    Configure the HTTP client with a single attempt to avoid double retries.
+
+    Non-streaming calls are also routed (see model_routing.py): a request
+    that misses deadline_s, or keeps failing, moves on to the next of
+    fallback_models; with hedging enabled, a request slower than the
+    agent's observed latency percentile gets a second, identical request
+    and whichever finishes first is used (the other is cancelled).
+    """
+
+    # Agent these calls belong to (latency histograms and routing are per agent)
+    route: str = ""
+    fallback_models: list = []
+    deadline_s: float = 0.0
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        # Cache hits never touch the network or the rate limit budget
+        cache = get_llm_cache()
+        cache_key = None
+        if cache.enabled:
+            cache_key = request_key(llm_request.model or self.model, llm_request)
+            cached = cache.lookup(cache_key)
+            if cached is not None:
+                for response in cached:
+                    response.custom_metadata = {**(response.custom_metadata or {}), "llm_cache": "hit"}
+                    yield response
+                return
+
+        if stream:
+            responses = []
+            async for response in self._stream(llm_request):
+                responses.append(response)
+                yield response
+            if cache_key is not None:
+                cache.store(cache_key, self.model, responses)
+            return
+
+        responses, route = await self._routed(llm_request)
+        if cache_key is not None:
+            cache.store(cache_key, self.model, responses)
+        # Picked up by the instrumentation plugin (after_model_callback)
+        if responses:
+            responses[-1].custom_metadata = {**(responses[-1].custom_metadata or {}), **route}
+        for response in responses:
+            yield response
+
+    async def _request(self, llm_request: LlmRequest, model: str, estimated: int) -> list:
+        """One request to model, within the rate limit; its latency goes into the histograms."""
+        if model != llm_request.model:
+            llm_request = llm_request.model_copy(update={"model": model})
+        async with get_rate_limiter().request(estimated):
+            started = time.perf_counter()
+            responses = []
+            async for response in super().generate_content_async(llm_request, False):
+                responses.append(response)
+        get_latency_tracker().record(self.route, model, time.perf_counter() - started)
+        return responses
+
+    async def _hedged(self, llm_request: LlmRequest, model: str, estimated: int) -> tuple:
+        """Responses of model within the deadline, hedged after the latency percentile (responses, hedged)."""
+        tracker = get_latency_tracker()
+        deadline = self.deadline_s or None
+        delay = tracker.hedge_delay(self.route, model)
+        primary = asyncio.ensure_future(self._request(llm_request, model, estimated))
+        tasks = [primary]
+        try:
+            if delay is None or (deadline and delay >= deadline):
+                return await asyncio.wait_for(primary, deadline), False
+            try:
+                return await asyncio.wait_for(asyncio.shield(primary), delay), False
+            except asyncio.TimeoutError:
+                pass
+            tracker.count("hedges")
+            logger.info("%s request to %s slower than p%g (%.1fs), hedging", self.route, model,
+                        tracker.hedge_percentile, delay)
+            tasks.append(asyncio.ensure_future(self._request(llm_request, model, estimated)))
+            until = asyncio.get_running_loop().time() + deadline - delay if deadline else None
+            pending = set(tasks)
+            error = None
+            while pending:
+                timeout = until - asyncio.get_running_loop().time() if until is not None else None
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise asyncio.TimeoutError()
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            tracker.count("hedge_wins")
+                        return task.result(), True
+                    error = task.exception()
+            raise error
+        finally:
+            # Cancel the loser (or everything, on a deadline miss or cancellation)
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def _routed(self, llm_request: LlmRequest) -> tuple:
+        """Responses from the first model of the chain that answers in time (responses, route info)."""
+        limiter = get_rate_limiter()
+        tracker = get_latency_tracker()
+        estimated = estimate_request_tokens(llm_request)
+        primary = llm_request.model or self.model
+        chain = [primary, *[m for m in self.fallback_models if m != primary]]
+        retries = 0
+        for index, model in enumerate(chain):
+            has_fallback = index + 1 < len(chain)
+            attempt = 0
+            while True:
+                try:
+                    responses, hedged = await self._hedged(llm_request, model, estimated)
+                except asyncio.TimeoutError:
+                    tracker.count("deadline_misses")
+                    logger.info("%s request to %s missed its %.0fs deadline", self.route, model, self.deadline_s)
+                    if has_fallback:
+                        break
+                    if attempt + 1 >= MAX_ATTEMPTS:
+                        limiter.stats["failures"] += 1
+                        raise
+                except errors.APIError as e:
+                    limiter.on_error(e.code)
+                    if e.code not in RETRYABLE_STATUS_CODES:
+                        limiter.stats["failures"] += 1
+                        raise
+                    if has_fallback and attempt + 1 >= FALLBACK_AFTER_ATTEMPTS:
+                        logger.info("Gemini %s returned %s, falling back", model, e.code)
+                        break
+                    if attempt + 1 >= MAX_ATTEMPTS:
+                        limiter.stats["failures"] += 1
+                        raise
+                else:
+                    limiter.on_success()
+                    if responses and responses[-1].usage_metadata is not None:
+                        limiter.record_usage(estimated, responses[-1].usage_metadata.total_token_count or 0)
+                    if index:
+                        tracker.count("fallbacks")
+                    return responses, {"gemini_retries": retries, "gemini_model": model, "gemini_hedged": hedged}
+                delay = jittered_backoff(attempt)
+                logger.info("Retrying %s request to %s in %.1fs", self.route, model, delay)
+                limiter.stats["retries"] += 1
+                attempt += 1
+                retries += 1
+                await asyncio.sleep(delay)
+            retries += 1
+
+    async def _stream(self, llm_request: LlmRequest) -> AsyncGenerator[LlmResponse, None]:
+        # Streamed chunks reach the caller as they arrive, so there is no hedging or fallback here
+        limiter = get_rate_limiter()
+        estimated = estimate_request_tokens(llm_request)
+        attempt = 0
+        while True:
+            responses = []
+            try:
+                async with limiter.request(estimated):
+                    async for response in super().generate_content_async(llm_request, True):
+                        responses.append(response)
+                        yield response
+            except errors.APIError as e:
+                limiter.on_error(e.code)
+                # A retry would duplicate chunks the caller already has
+                if e.code not in RETRYABLE_STATUS_CODES or responses or attempt + 1 >= MAX_ATTEMPTS:
+                    limiter.stats["failures"] += 1
+                    raise
+                delay = jittered_backoff(attempt)
+                logger.info("Gemini %s returned %s, retrying in %.1fs", self.model, e.code, delay)
+                limiter.stats["retries"] += 1
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+
+            limiter.on_success()
+            if responses and responses[-1].usage_metadata is not None:
+                limiter.record_usage(estimated, responses[-1].usage_metadata.total_token_count or 0)
+            if responses:
+                responses[-1].custom_metadata = {**(responses[-1].custom_metadata or {}), "gemini_retries": attempt}
+            return
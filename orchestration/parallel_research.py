@@ -0,0 +1,116 @@
+# parallel_research.py
+# Parallel research stage: runs independent research agents concurrently
+
+import logging
+import time
+from typing import AsyncGenerator
+
+from google.adk.agents import BaseAgent, ParallelAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event, EventActions
+
+logger = logging.getLogger(__name__)
+
+
+def branch_status_key(output_key: str) -> str:
+    """State key holding the timing/status record for a research branch."""
+    return f"{output_key}_status"
+
+
+class IsolatedBranchAgent(BaseAgent):
+    """Wraps one research agent so its failure does not cancel its siblings.
+
+    The wrapped agent runs unchanged. When it finishes (or raises), a single
+    event is emitted whose state_delta records the branch's wall time and
+    status under ``<output_key>_status``. On failure the branch's output_key
+    is filled with a short placeholder so downstream agents can tell the
+    research is missing instead of silently reading nothing.
+    """
+
+    output_key: str
+
+    async def _run_async_impl(
+        self, ctx: InvocationContext
+    ) -> AsyncGenerator[Event, None]:
+        branch_agent = self.sub_agents[0]
+        started = time.perf_counter()
+        error = None
+        try:
+            async for event in branch_agent.run_async(ctx):
+                yield event
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            logger.warning("Research branch %s failed: %s", branch_agent.name, error)
+
+        elapsed = time.perf_counter() - started
+        status = {
+            "agent": branch_agent.name,
+            "status": "failed" if error else "ok",
+            "seconds": round(elapsed, 3),
+        }
+        state_delta = {branch_status_key(self.output_key): status}
+        if error:
+            status["error"] = error
+            # Only fill the placeholder when the branch produced nothing usable
+            if not ctx.session.state.get(self.output_key):
+                state_delta[self.output_key] = (
+                    f"[{branch_agent.name} unavailable: {error}]"
+                )
+        logger.info(
+            "Research branch %s finished: %s in %.2fs",
+            branch_agent.name, status["status"], elapsed,
+        )
+
+        yield Event(
+            invocation_id=ctx.invocation_id,
+            author=self.name,
+            branch=ctx.branch,
+            actions=EventActions(state_delta=state_delta),
+        )
+
+
+def build_parallel_research_team(agents, name: str = "ParallelResearchTeam") -> ParallelAgent:
+    """Fan the given research agents out concurrently.
+
+    Each agent must have a distinct output_key so branches never write the
+    same state key. Agents are wrapped in IsolatedBranchAgent to record
+    per-branch timing and contain failures.
+
+    Args:
+        agents: LlmAgents to run in parallel (e.g. data collection and trends)
+        name: Name of the resulting ParallelAgent
+
+    Returns:
+        ParallelAgent: The research stage
+    """
+    output_keys = [agent.output_key for agent in agents]
+    if None in output_keys or len(set(output_keys)) != len(output_keys):
+        raise ValueError(
+            f"Parallel research agents need distinct output_key values, got {output_keys}"
+        )
+
+    branches = [
+        IsolatedBranchAgent(
+            name=f"{agent.name}Branch",
+            description=agent.description,
+            output_key=agent.output_key,
+            sub_agents=[agent],
+        )
+        for agent in agents
+    ]
+    return ParallelAgent(name=name, sub_agents=branches)
+
+
+def format_branch_timings(state: dict, output_keys) -> str:
+    """Render the per-branch status records stored in session state."""
+    lines = []
+    for output_key in output_keys:
+        status = state.get(branch_status_key(output_key))
+        if not status:
+            lines.append(f"  - {output_key}: not run")
+            continue
+        line = f"  - {status['agent']}: {status['status']} in {status['seconds']:.2f}s"
+        if status.get("error"):
+            line += f" ({status['error']})"
+        lines.append(line)
+    return "\n".join(lines)
@@ -0,0 +1,218 @@
+# pipeline.py
+# Make-like stage graph: each stage records a hash of its inputs and is skipped when nothing changed
+
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = ".pipeline_manifest.json"
+
+_IGNORED_NAMES = {"__pycache__", ".DS_Store"}
+
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def hash_path(path) -> str:
+    """Hash a file's content, or a directory's file names and contents.
+
+    Missing paths hash to a fixed marker so their later appearance is a change.
+    """
+    path = Path(path)
+    digest = hashlib.sha256()
+    if path.is_file():
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+    elif path.is_dir():
+        for child in sorted(path.rglob("*")):
+            if not child.is_file() or _IGNORED_NAMES.intersection(child.parts):
+                continue
+            digest.update(str(child.relative_to(path)).encode("utf-8"))
+            digest.update(hash_path(child).encode("ascii"))
+    else:
+        digest.update(b"<missing>")
+    return digest.hexdigest()
+
+
+class Stage:
+    """One step of the pipeline.
+
+    Args:
+        name: Stage name, also the manifest key
+        run: async callable(context); context is the pipeline's shared dict. Returning
+            False marks the run incomplete: downstream stages still run, but the
+            stage is not recorded as up to date and runs again next time
+        inputs: dict of input name -> file/dir Path or literal str (prompt text, settings)
+        outputs: list of file Paths the stage must produce
+        deps: names of upstream stages; their outputs are hashed as inputs
+    """
+
+    def __init__(self, name, run, inputs=None, outputs=None, deps=None):
+        self.name = name
+        self.run = run
+        self.inputs = inputs or {}
+        self.outputs = [Path(p) for p in (outputs or [])]
+        self.deps = deps or []
+
+
+class StagePipeline:
+    """Runs stages in order, skipping those whose inputs are unchanged.
+
+    A stage's fingerprint covers its declared inputs plus the current content
+    of every upstream stage's outputs, so an edit anywhere upstream (a PDF, a
+    prompt, a hand-edited newsletter_content.txt) reruns exactly the stages
+    that depend on it. Fingerprints are kept in a manifest next to the outputs.
+    """
+
+    def __init__(self, stages, manifest_path):
+        self.stages = {stage.name: stage for stage in stages}
+        self.order = [stage.name for stage in stages]
+        self.manifest_path = Path(manifest_path)
+        for stage in stages:
+            unknown = [d for d in stage.deps if d not in self.stages]
+            if unknown:
+                raise ValueError(f"Stage {stage.name} depends on unknown stages {unknown}")
+
+    def _load_manifest(self) -> dict:
+        try:
+            return json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self, manifest: dict) -> None:
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+        os.replace(tmp_path, self.manifest_path)
+
+    def fingerprint(self, stage: Stage) -> dict:
+        """Per-input hashes for a stage (declared inputs + upstream outputs)."""
+        hashes = {}
+        for name, value in sorted(stage.inputs.items()):
+            hashes[name] = hash_path(value) if isinstance(value, Path) else hash_text(str(value))
+        for dep in stage.deps:
+            for output in self.stages[dep].outputs:
+                hashes[f"{dep}:{output.name}"] = hash_path(output)
+        return hashes
+
+    def status(self) -> dict:
+        """Return {stage: "up-to-date" | "stale" | "never-run"} without running anything."""
+        manifest = self._load_manifest()
+        result = {}
+        for name in self.order:
+            stage = self.stages[name]
+            record = manifest.get(name)
+            if record is None:
+                result[name] = "never-run"
+            elif record["inputs"] != self.fingerprint(stage) or not all(p.exists() for p in stage.outputs):
+                result[name] = "stale"
+            else:
+                result[name] = "up-to-date"
+        return result
+
+    async def run(self, context=None, force=(), only=None) -> dict:
+        """Run the pipeline.
+
+        Args:
+            context: Shared dict passed to every stage's run callable; "stage_fingerprint"
+            is set to a hash of the running stage's inputs
+            force: Stage names to rerun even if up to date
+            only: If given, the stage names to consider; others are left as they are
+
+        Returns:
+            dict: {stage: {"status": "ran" | "incomplete" | "skipped", "seconds": float, "changed_inputs": list}}
+        """
+        context = context if context is not None else {}
+        manifest = self._load_manifest()
+        report = {}
+        for name in self.order:
+            if only is not None and name not in only:
+                continue
+            stage = self.stages[name]
+            inputs = self.fingerprint(stage)
+            previous = manifest.get(name, {}).get("inputs", {})
+            changed = sorted(k for k in set(inputs) | set(previous) if inputs.get(k) != previous.get(k))
+            outputs_present = all(p.exists() for p in stage.outputs)
+
+            if name not in force and not changed and outputs_present:
+                logger.info("Stage %s is up to date, skipping", name)
+                report[name] = {"status": "skipped", "seconds": 0.0, "changed_inputs": []}
+                continue
+
+            logger.info("Running stage %s (changed inputs: %s)", name, changed or "none")
+            # Lets a stage tie resumable work to this exact set of inputs
+            context["stage_fingerprint"] = hash_text(json.dumps(inputs, sort_keys=True))
+            started = time.perf_counter()
+            complete = await stage.run(context) is not False
+            elapsed = time.perf_counter() - started
+
+            missing = [str(p) for p in stage.outputs if not p.exists()]
+            if missing:
+                raise RuntimeError(f"Stage {name} did not produce {missing}")
+            if not complete:
+                logger.warning("Stage %s finished incomplete; it will run again next time", name)
+                manifest.pop(name, None)
+                self._save_manifest(manifest)
+                report[name] = {"status": "incomplete", "seconds": round(elapsed, 3), "changed_inputs": changed}
+                continue
+
+            manifest[name] = {
+                "inputs": inputs,
+                "outputs": {str(p): hash_path(p) for p in stage.outputs},
+                "completed": time.time(),
+                "seconds": round(elapsed, 3),
+            }
+            self._save_manifest(manifest)
+            report[name] = {"status": "ran", "seconds": round(elapsed, 3), "changed_inputs": changed}
+        return report
+
+
+async def run_agent(agent, message: str, state=None, app_name: str = "newsletter_pipeline") -> dict:
+    """Run a single agent to completion on one user message.
+
+    Args:
+        agent: The agent to run as root
+        message: User message text
+        state: Initial session state
+
+    Returns:
+        dict: The session state after the run
+    """
+    # ADK is only loaded when an agent actually runs (the stage graph itself doesn't need it)
+    from google.adk.runners import InMemoryRunner
+    from google.genai import types
+
+    from orchestration.context_budget import get_context_budget
+    from orchestration.instrumentation import get_instrumentation
+
+    runner = InMemoryRunner(agent=agent, app_name=app_name, plugins=[get_context_budget(), get_instrumentation()])
+    session = await runner.session_service.create_session(
+        app_name=app_name, user_id="pipeline", state=dict(state or {})
+    )
+    new_message = types.Content(role="user", parts=[types.Part(text=message)])
+    async for _event in runner.run_async(
+        user_id="pipeline", session_id=session.id, new_message=new_message
+    ):
+        pass
+    session = await runner.session_service.get_session(
+        app_name=app_name, user_id="pipeline", session_id=session.id
+    )
+    return dict(session.state)
+
+
+def format_report(report: dict) -> str:
+    lines = []
+    for name, entry in report.items():
+        if entry["status"] == "skipped":
+            lines.append(f"  - {name}: skipped (up to date)")
+        else:
+            changed = ", ".join(entry["changed_inputs"]) or "forced"
+            lines.append(f"  - {name}: {entry['status']} in {entry['seconds']:.2f}s (changed: {changed})")
+    return "\n".join(lines)
@@ -0,0 +1,182 @@
+# rate_limit.py
+# Process-wide client-side rate limiting and adaptive concurrency for Gemini calls
+
+import asyncio
+import contextlib
+import logging
+import os
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+# HTTP status codes that mean "slow down" (shrink concurrency) vs. merely "try again"
+OVERLOAD_STATUS_CODES = {429, 503}
+RETRYABLE_STATUS_CODES = {429, 500, 503, 504}
+
+
+def jittered_backoff(attempt: int, base: float = 1.0, cap: float = 30.0) -> float:
+    """Full-jitter exponential backoff: uniform(0, min(cap, base * 2**attempt)).
+
+    Randomising the whole interval keeps concurrent callers that failed
+    together from retrying together.
+    """
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class TokenBucket:
+    """Async token bucket refilled continuously at rate_per_minute.
+
+    A single acquisition larger than the capacity is allowed once the bucket
+    is full, so an oversized request waits but never deadlocks.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: float = None):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate_per_second)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1.0) -> float:
+        """Wait until `amount` tokens are available and take them.
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        waited = 0.0
+        async with self._lock:
+            needed = min(amount, self.capacity)
+            while True:
+                self._refill()
+                if self._tokens >= needed:
+                    self._tokens -= amount
+                    return waited
+                delay = (needed - self._tokens) / self.rate_per_second
+                await asyncio.sleep(delay)
+                waited += delay
+
+    def adjust(self, amount: float) -> None:
+        """Take (positive) or give back (negative) tokens after the fact."""
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens - amount)
+
+
+class AdaptiveConcurrency:
+    """AIMD concurrency limit.
+
+    Each success raises the limit by 1/limit (about +1 per round of calls);
+    an overload response halves it, at most once per cooldown window so a
+    burst of 429s from the same wave counts as one signal.
+    """
+
+    def __init__(self, initial: int = 4, minimum: int = 1, maximum: int = 16,
+                 cooldown_seconds: float = 5.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.cooldown_seconds = cooldown_seconds
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self.in_flight -= 1
+                self._condition.notify_all()
+
+    def on_success(self) -> None:
+        self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+
+    def on_overload(self) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown_seconds:
+            return
+        self._last_decrease = now
+        self.limit = max(self.minimum, self.limit / 2)
+        logger.info("Overload signal: concurrency limit reduced to %d", int(self.limit))
+
+
+class GeminiRateLimiter:
+    """Requests/min and tokens/min buckets plus adaptive concurrency.
+
+    Shared by every agent in the process so that all Gemini calls draw from
+    one budget instead of each agent retrying independently.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float,
+                 initial_concurrency: int = 4, max_concurrency: int = 16):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.concurrency = AdaptiveConcurrency(initial=initial_concurrency, maximum=max_concurrency)
+        self.stats = {
+            "requests": 0,
+            "retries": 0,
+            "overloads": 0,
+            "failures": 0,
+            "wait_seconds": 0.0,
+        }
+
+    @contextlib.asynccontextmanager
+    async def request(self, estimated_tokens: int):
+        """Reserve budget for one model call; held for the duration of the call."""
+        waited = await self.requests.acquire(1)
+        waited += await self.tokens.acquire(estimated_tokens)
+        self.stats["wait_seconds"] += waited
+        async with self.concurrency.slot():
+            self.stats["requests"] += 1
+            yield
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """Correct the tokens/min bucket once the real token count is known."""
+        if actual_tokens:
+            self.tokens.adjust(actual_tokens - estimated_tokens)
+
+    def on_success(self) -> None:
+        self.concurrency.on_success()
+
+    def on_error(self, status_code) -> None:
+        if status_code in OVERLOAD_STATUS_CODES:
+            self.stats["overloads"] += 1
+            self.concurrency.on_overload()
+
+    def format_stats(self) -> str:
+        s = self.stats
+        return (
+            f"Gemini rate limiter: {s['requests']} requests, {s['retries']} retries, "
+            f"{s['overloads']} overload responses, {s['failures']} failures, "
+            f"{s['wait_seconds']:.1f}s queued, concurrency limit {int(self.concurrency.limit)}"
+        )
+
+
+_rate_limiter = None
+
+
+def get_rate_limiter() -> GeminiRateLimiter:
+    """Return the process-wide limiter, configured from environment variables.
+
+    GEMINI_RPM (default 60), GEMINI_TPM (default 1,000,000),
+    GEMINI_MAX_CONCURRENCY (default 8).
+    """
+    global _rate_limiter
+    if _rate_limiter is None:
+        max_concurrency = int(os.environ.get("GEMINI_MAX_CONCURRENCY", 8))
+        _rate_limiter = GeminiRateLimiter(
+            requests_per_minute=float(os.environ.get("GEMINI_RPM", 60)),
+            tokens_per_minute=float(os.environ.get("GEMINI_TPM", 1_000_000)),
+            initial_concurrency=max(1, max_concurrency // 2),
+            max_concurrency=max_concurrency,
+        )
+    return _rate_limiter
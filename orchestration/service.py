@@ -0,0 +1,406 @@
+# service.py
+# Long-lived generation service: durable SQLite job queue, warm worker pool, HTTP API and metrics
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import time
+from collections import deque
+from pathlib import Path
+
+from orchestration.batch import normalize_job
+
+logger = logging.getLogger(__name__)
+
+QUEUE_DB_PATH = os.environ.get("NEWSLETTER_QUEUE_DB", "./.cache/jobs.db")
+SERVICE_HOST = os.environ.get("NEWSLETTER_SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.environ.get("NEWSLETTER_SERVICE_PORT", 8765))
+DEFAULT_WORKERS = int(os.environ.get("NEWSLETTER_SERVICE_WORKERS", 3))
+
+# Workers also poll, so jobs enqueued by another process (agent.py --enqueue) are picked up
+POLL_INTERVAL = 1.0
+# Latency percentiles are computed over the most recent jobs
+LATENCY_WINDOW = 1000
+MAX_REQUEST_BYTES = 1024 * 1024
+
+
+def _overlaps(dir_a: str, dir_b: str) -> bool:
+    a, b = Path(dir_a), Path(dir_b)
+    return a == b or a in b.parents or b in a.parents
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def percentile(values, q: float):
+    """Nearest-rank percentile (q in 0..100) of values, or None if there are none."""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    rank = max(1, -(-len(ordered) * q // 100))
+    return round(ordered[int(rank) - 1], 3)
+
+
+class JobQueue:
+    """Durable FIFO of newsletter generation jobs.
+
+    Jobs are batch campaigns (see orchestration.batch) stored in SQLite, so
+    they survive restarts and can be enqueued by other processes. claim() is
+    atomic (BEGIN IMMEDIATE), so several service processes on one host can
+    share a queue.
+    """
+
+    def __init__(self, db_path: str = QUEUE_DB_PATH):
+        self.db_path = str(Path(db_path).absolute())
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS newsletter_jobs ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " name TEXT NOT NULL,"
+                " spec TEXT NOT NULL,"
+                " status TEXT NOT NULL,"
+                " worker TEXT,"
+                " error TEXT,"
+                " result TEXT,"
+                " enqueued REAL NOT NULL,"
+                " started REAL,"
+                " finished REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS newsletter_jobs_status ON newsletter_jobs (status, id)")
+
+    def _connect(self):
+        # Autocommit; transactions that must be atomic are opened explicitly
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def enqueue(self, spec: dict, base_dir=".") -> dict:
+        """Add a job; name defaults to job-<id> and output_dir to ./output/<name>."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            job_id = conn.execute(
+                "INSERT INTO newsletter_jobs (name, spec, status, enqueued) VALUES ('', '{}', 'queued', ?)",
+                (time.time(),),
+            ).lastrowid
+            job = normalize_job(spec, f"job-{job_id}", base_dir)
+            conn.execute(
+                "UPDATE newsletter_jobs SET name = ?, spec = ? WHERE id = ?",
+                (job["name"], json.dumps(job), job_id),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return {"id": job_id, **job}
+
+    def claim(self, worker: str, busy_dirs=()) -> dict:
+        """Mark the oldest queued job running and return it (None if there is none).
+
+        Jobs whose output_dir overlaps one in busy_dirs, or that of a job
+        running in any process sharing the queue, are skipped for now, so two
+        jobs never write to the same directory at once.
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            running = conn.execute("SELECT spec FROM newsletter_jobs WHERE status = 'running'").fetchall()
+            busy_dirs = [*busy_dirs, *(json.loads(spec)["output_dir"] for spec, in running)]
+            rows = conn.execute(
+                "SELECT id, spec, enqueued FROM newsletter_jobs WHERE status = 'queued' ORDER BY id"
+            ).fetchall()
+            for job_id, spec, enqueued in rows:
+                job = json.loads(spec)
+                if any(_overlaps(job["output_dir"], d) for d in busy_dirs):
+                    continue
+                started = time.time()
+                conn.execute(
+                    "UPDATE newsletter_jobs SET status = 'running', worker = ?, started = ? WHERE id = ?",
+                    (worker, started, job_id),
+                )
+                conn.execute("COMMIT")
+                return {"id": job_id, **job, "enqueued": enqueued, "started": started}
+            conn.execute("COMMIT")
+            return None
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def finish(self, job_id: int, status: str, error: str = None, result=None) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE newsletter_jobs SET status = ?, error = ?, result = ?, finished = ? WHERE id = ?",
+                (status, error, json.dumps(result, default=str) if result is not None else None,
+                 time.time(), job_id),
+            )
+
+    def release(self, job_id: int) -> None:
+        """Put a running job back in the queue (e.g. on shutdown); its sessions are resumed."""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE newsletter_jobs SET status = 'queued', worker = NULL, started = NULL WHERE id = ?",
+                (job_id,),
+            )
+
+    def recover(self) -> int:
+        """Requeue jobs left running by a process on this host that no longer exists."""
+        host = socket.gethostname()
+        requeued = 0
+        with self._connect() as conn:
+            for job_id, worker in conn.execute(
+                "SELECT id, worker FROM newsletter_jobs WHERE status = 'running'"
+            ).fetchall():
+                worker_host, _, pid = (worker or "").rpartition(":")
+                if worker_host == host and pid.isdigit() and not _pid_alive(int(pid)):
+                    conn.execute(
+                        "UPDATE newsletter_jobs SET status = 'queued', worker = NULL, started = NULL "
+                        "WHERE id = ? AND status = 'running'",
+                        (job_id,),
+                    )
+                    requeued += 1
+        return requeued
+
+    def get(self, job_id: int) -> dict:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, name, spec, status, error, result, enqueued, started, finished "
+                "FROM newsletter_jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ("id", "name", "spec", "status", "error", "result", "enqueued", "started", "finished")
+        job = dict(zip(keys, row))
+        job["spec"] = json.loads(job["spec"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def counts(self) -> dict:
+        with self._connect() as conn:
+            return dict(conn.execute("SELECT status, COUNT(*) FROM newsletter_jobs GROUP BY status").fetchall())
+
+
+class NewsletterService:
+    """Worker pool that runs queued jobs in one warm process.
+
+    Agents, model clients, rate limiter, sessions and tool caches are
+    created once and shared by all jobs, so a job only pays for its own
+    model and tool calls. An optional HTTP API accepts jobs and reports
+    metrics (queue depth, in-flight jobs, latency percentiles).
+
+    Args:
+        run_job: async callable(job) -> JSON-serializable result; raising marks the job failed
+        queue: JobQueue (default: the one at NEWSLETTER_QUEUE_DB)
+        workers: Jobs processed concurrently
+    """
+
+    def __init__(self, run_job, queue: JobQueue = None, workers: int = DEFAULT_WORKERS):
+        self.run_job = run_job
+        self.queue = queue or JobQueue()
+        self.workers = max(1, workers)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.in_flight = {}
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.queue_waits = deque(maxlen=LATENCY_WINDOW)
+        self.completed = 0
+        self.failed = 0
+        self.started = time.time()
+        self._wakeup = None
+        self._claim_lock = None
+
+    @staticmethod
+    async def _settle(update, *args) -> None:
+        """Run a queue update in a thread and wait for it, even if the worker is cancelled meanwhile.
+
+        Shutdown cancels workers more than once; the job must still end up
+        finished or back in the queue, not left running.
+        """
+        task = asyncio.ensure_future(asyncio.to_thread(update, *args))
+        try:
+            await asyncio.shield(task)
+        except asyncio.CancelledError:
+            await task
+            raise
+
+    async def _work(self, drain: bool) -> None:
+        # Loaded with the jobs' agents (keeps ADK out of enqueueing and the queue API)
+        from orchestration.instrumentation import get_instrumentation, run_label
+
+        while True:
+            # SQLite calls run in a thread, off the event loop. Claims are serialized in this
+            # process so busy_dirs includes the job another worker is claiming; a job claimed by
+            # a worker cancelled mid-claim is requeued by recover() on the next start
+            async with self._claim_lock:
+                busy_dirs = [job["output_dir"] for job in self.in_flight.values()]
+                job = await asyncio.to_thread(self.queue.claim, self.worker_id, busy_dirs)
+                if job is not None:
+                    self.in_flight[job["id"]] = job
+            if job is None:
+                if drain and not self.in_flight:
+                    self._wakeup.set()   # let the other idle workers see it too
+                    return
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            # Spans recorded while this job runs are attributed to it
+            run_label.set(job["name"])
+            self.queue_waits.append(job["started"] - job["enqueued"])
+            logger.info("Service job %s (%s) started", job["id"], job["name"])
+            try:
+                status, error, result = "done", None, None
+                try:
+                    result = await self.run_job(job)
+                except asyncio.CancelledError:
+                    await self._settle(self.queue.release, job["id"])
+                    raise
+                except Exception as e:
+                    status, error = "failed", f"{type(e).__name__}: {e}"
+                    logger.warning("Service job %s (%s) failed: %s", job["id"], job["name"], error)
+                await self._settle(self.queue.finish, job["id"], status, error, result)
+                if status == "done":
+                    self.completed += 1
+                else:
+                    self.failed += 1
+            finally:
+                del self.in_flight[job["id"]]
+                self.latencies.append(time.time() - job["started"])
+                # The job's spans stay in the trace; its per-run usage is no longer needed
+                get_instrumentation().forget_run(job["name"])
+                # A job skipped for its busy output_dir may be claimable now
+                self._wakeup.set()
+
+    def enqueue(self, spec: dict) -> dict:
+        job = self.queue.enqueue(spec)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    def metrics(self, counts: dict = None) -> dict:
+        """Service metrics; counts (queue.counts()) is read from the queue when not given."""
+        if counts is None:
+            counts = self.queue.counts()
+        return {
+            "queue_depth": counts.get("queued", 0),
+            "in_flight": len(self.in_flight),
+            "workers": self.workers,
+            "completed": self.completed,
+            "failed": self.failed,
+            "latency_s": {f"p{q}": percentile(self.latencies, q) for q in (50, 90, 99)},
+            "queue_wait_s": {f"p{q}": percentile(self.queue_waits, q) for q in (50, 90, 99)},
+            "uptime_s": round(time.time() - self.started, 1),
+            "jobs_by_status": counts,
+        }
+
+    def format_metrics(self) -> str:
+        m = self.metrics()
+
+        def fmt(p):
+            return " ".join(f"{k}={v:.2f}s" if v is not None else f"{k}=-" for k, v in p.items())
+
+        return (
+            f"Service: {m['completed']} completed, {m['failed']} failed, {m['in_flight']} in flight, "
+            f"{m['queue_depth']} queued ({m['workers']} workers, up {m['uptime_s']:.0f}s)\n"
+            f"  job latency {fmt(m['latency_s'])}\n"
+            f"  queue wait  {fmt(m['queue_wait_s'])}"
+        )
+
+    # Minimal HTTP/1.1 API (JSON in, JSON out, one request per connection)
+
+    async def _route(self, method: str, path: str, body: bytes):
+        # Queue reads and writes run in a thread so requests do not block the workers
+        if method == "GET" and path == "/healthz":
+            return 200, {"status": "ok"}
+        if method == "GET" and path == "/metrics":
+            return 200, self.metrics(await asyncio.to_thread(self.queue.counts))
+        if method == "POST" and path == "/jobs":
+            try:
+                spec = json.loads(body or b"{}")
+            except ValueError as e:
+                return 400, {"error": f"Invalid JSON: {e}"}
+            if not isinstance(spec, dict):
+                return 400, {"error": "Expected a JSON object"}
+            job = await asyncio.to_thread(self.queue.enqueue, spec)
+            if self._wakeup is not None:
+                self._wakeup.set()
+            return 202, job
+        if method == "GET" and path.startswith("/jobs/"):
+            job_id = path[len("/jobs/"):]
+            job = await asyncio.to_thread(self.queue.get, int(job_id)) if job_id.isdigit() else None
+            return (200, job) if job else (404, {"error": "No such job"})
+        return 404, {"error": f"No route for {method} {path}"}
+
+    async def _handle_http(self, reader, writer) -> None:
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                key, _, value = line.partition(":")
+                headers[key.strip().lower()] = value.strip()
+            length = int(headers.get("content-length", 0))
+            if len(request_line) < 2:
+                status, payload = 400, {"error": "Bad request"}
+            elif length > MAX_REQUEST_BYTES:
+                status, payload = 413, {"error": "Request body too large"}
+            else:
+                body = await reader.readexactly(length) if length else b""
+                status, payload = await self._route(request_line[0].upper(), request_line[1].split("?")[0], body)
+        except Exception as e:
+            logger.warning("Service HTTP request failed: %s", e)
+            status, payload = 500, {"error": str(e)}
+        data = json.dumps(payload, default=str).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {'OK' if status < 400 else 'Error'}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            "Connection: close\r\n\r\n".encode("latin-1") + data
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = SERVICE_HOST, port: int = SERVICE_PORT, drain: bool = False) -> None:
+        """Process jobs until cancelled (or, with drain, until the queue is empty).
+
+        port=None disables the HTTP API; jobs can still be enqueued through
+        the SQLite queue by another process.
+        """
+        self._wakeup = asyncio.Event()
+        self._claim_lock = asyncio.Lock()
+        requeued = await asyncio.to_thread(self.queue.recover)
+        if requeued:
+            logger.info("Requeued %d jobs left running by a stopped service", requeued)
+        server = None
+        if port is not None:
+            server = await asyncio.start_server(self._handle_http, host, port)
+            print(f"Newsletter service listening on http://{host}:{port} ({self.workers} workers)")
+        workers = [asyncio.create_task(self._work(drain)) for _ in range(self.workers)]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            if server is not None:
+                server.close()
+                await server.wait_closed()
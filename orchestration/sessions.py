@@ -0,0 +1,152 @@
+# sessions.py
+# Durable SQLite-backed sessions and resumable agent runs
+
+import logging
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+from google.adk.apps.app import App, ResumabilityConfig
+from google.adk.runners import Runner
+from google.genai import types
+
+from orchestration.context_budget import get_context_budget
+from orchestration.instrumentation import get_instrumentation
+
+logger = logging.getLogger(__name__)
+
+APP_NAME = "newsletter"
+USER_ID = "newsletter"
+
+SESSION_DB_PATH = os.environ.get("NEWSLETTER_SESSION_DB", "./.cache/sessions.db")
+
+_session_services = {}
+
+
+def get_session_service(db_path: str = SESSION_DB_PATH):
+    """Return the process-wide durable session service for db_path.
+
+    Uses ADK's SqliteSessionService when available and falls back to the
+    SQLAlchemy-based DatabaseSessionService on older ADK releases.
+    """
+    db_path = str(Path(db_path).absolute())
+    service = _session_services.get(db_path)
+    if service is None:
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        try:
+            from google.adk.sessions.sqlite_session_service import SqliteSessionService
+            service = SqliteSessionService(db_path)
+        except ImportError:
+            from google.adk.sessions import DatabaseSessionService
+            service = DatabaseSessionService(db_url=f"sqlite+aiosqlite:///{db_path}")
+        _session_services[db_path] = service
+    return service
+
+
+class RunCheckpoints:
+    """Which session/invocation each named run used, and whether it finished.
+
+    Stored in a small SQLite file next to the session database so that a
+    crashed or interrupted process can find the invocation to resume. It is
+    a separate file because these short synchronous writes must never wait
+    on a write lock held by the async session service.
+    """
+
+    def __init__(self, db_path: str = SESSION_DB_PATH):
+        self.db_path = str(Path(db_path).absolute().with_suffix(".checkpoints.db"))
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS newsletter_run_checkpoints ("
+                " run_key TEXT PRIMARY KEY,"
+                " session_id TEXT NOT NULL,"
+                " invocation_id TEXT,"
+                " status TEXT NOT NULL,"
+                " updated REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def get(self, run_key: str):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT session_id, invocation_id, status FROM newsletter_run_checkpoints WHERE run_key = ?",
+                (run_key,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"session_id": row[0], "invocation_id": row[1], "status": row[2]}
+
+    def set(self, run_key: str, session_id: str, invocation_id, status: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO newsletter_run_checkpoints VALUES (?, ?, ?, ?, ?)",
+                (run_key, session_id, invocation_id, status, time.time()),
+            )
+
+
+async def run_agent_resumable(agent, message: str, state=None, run_key: str = None,
+                              db_path: str = SESSION_DB_PATH) -> dict:
+    """Run an agent with a durable session, resuming an interrupted run.
+
+    If the previous run under run_key did not finish (e.g. a 503 or Ctrl-C
+    part-way through), its invocation is resumed in the same session: events
+    and state already recorded (tool results, sub-agent outputs such as
+    internal_insights, external_trends and text_content) are kept and
+    completed agents are not called again. Otherwise a fresh session is
+    created with the given initial state.
+
+    Args:
+        agent: The agent to run as root
+        message: User message text (ignored when resuming)
+        state: Initial session state for a fresh run
+        run_key: Stable name for this run, e.g. "./output:design"; defaults to the agent name
+
+    Returns:
+        dict: The session state after the run
+    """
+    run_key = run_key or agent.name
+    session_service = get_session_service(db_path)
+    checkpoints = RunCheckpoints(db_path)
+    app = App(
+        name=APP_NAME,
+        root_agent=agent,
+        resumability_config=ResumabilityConfig(is_resumable=True),
+        plugins=[get_context_budget(), get_instrumentation()],
+    )
+    runner = Runner(app=app, session_service=session_service)
+
+    checkpoint = checkpoints.get(run_key)
+    session = None
+    invocation_id = None
+    if checkpoint and checkpoint["status"] == "running":
+        session = await session_service.get_session(
+            app_name=APP_NAME, user_id=USER_ID, session_id=checkpoint["session_id"]
+        )
+        if session is not None and checkpoint["invocation_id"]:
+            invocation_id = checkpoint["invocation_id"]
+            logger.info("Resuming %s from invocation %s", run_key, invocation_id)
+        else:
+            session = None
+
+    if session is None:
+        session = await session_service.create_session(
+            app_name=APP_NAME, user_id=USER_ID, state=dict(state or {})
+        )
+        checkpoints.set(run_key, session.id, None, "running")
+        run_kwargs = {"new_message": types.Content(role="user", parts=[types.Part(text=message)])}
+    else:
+        run_kwargs = {"invocation_id": invocation_id}
+
+    async for event in runner.run_async(user_id=USER_ID, session_id=session.id, **run_kwargs):
+        if invocation_id is None and event.invocation_id:
+            invocation_id = event.invocation_id
+            checkpoints.set(run_key, session.id, invocation_id, "running")
+
+    checkpoints.set(run_key, session.id, invocation_id, "completed")
+    session = await session_service.get_session(
+        app_name=APP_NAME, user_id=USER_ID, session_id=session.id
+    )
+    return dict(session.state)
@@ -0,0 +1,241 @@
+# trends.py
+# Trend sources for the research stage: a shared, persisted trend snapshot cache (with TTL) and a local file
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import AsyncGenerator
+
+from google.adk.agents import BaseAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event, EventActions
+from google.genai import types
+
+from func_tools.output_store import atomic_write_text
+
+logger = logging.getLogger(__name__)
+
+# Local trend report used by the "file" trend source (see TREND_SOURCE in agent.py)
+TREND_FILE = os.environ.get("TREND_FILE", "./trends.md")
+TREND_TOPICS = [t.strip() for t in os.environ.get("TREND_TOPICS", "ECAD libraries, PCB layout, PCB design").split(",")
+                if t.strip()]
+TREND_SNAPSHOT_DIR = os.environ.get("TREND_SNAPSHOT_DIR", "./.cache/trends")
+# Seconds a snapshot is reused (0 disables the cache)
+TREND_CACHE_TTL = float(os.environ.get("TREND_CACHE_TTL", 24 * 3600))
+
+# State key with where the external trends of a run came from (source, fetched_at, age)
+TREND_INFO_SUFFIX = "_source"
+
+
+def trend_info_key(output_key: str) -> str:
+    return f"{output_key}{TREND_INFO_SUFFIX}"
+
+
+def format_topics(topics) -> str:
+    """Topic list as inserted into Trend_Finding_Agent_Prompt."""
+    return "\n".join(f"- {topic}" for topic in topics)
+
+
+def read_trend_file(path) -> str:
+    """Trend report text from a local file.
+
+    Plain text/Markdown is used as is. JSON may be a saved snapshot
+    ({"text": ...}) or {"trends": [...]}, rendered as bullet points.
+    """
+    path = Path(path)
+    text = path.read_text(encoding="utf-8")
+    if path.suffix.lower() != ".json":
+        return text.strip()
+    data = json.loads(text)
+    if isinstance(data, dict) and "text" in data:
+        return str(data["text"]).strip()
+    trends = data.get("trends", []) if isinstance(data, dict) else data
+    return "\n".join(f"- {trend}" for trend in trends)
+
+
+class TrendSnapshotCache:
+    """Trend reports on disk, keyed by topic list, prompt and model.
+
+    Trends barely change within a day and are the same for every campaign,
+    so one report is reused by all runs (and processes) until it is older
+    than ttl. Within a process, concurrent runs that miss wait for the one
+    fetch in flight instead of each searching. invalidate() forces the next
+    lookup to fetch again (manual refresh); later runs reuse that fetch.
+    """
+
+    def __init__(self, directory=TREND_SNAPSHOT_DIR, ttl: float = TREND_CACHE_TTL):
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.refresh_before = 0.0
+        self._locks = {}
+        self._loop = None
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "fetches": 0}
+
+    @staticmethod
+    def key(topics, fingerprint: str = "") -> str:
+        payload = json.dumps({"topics": [t.strip().lower() for t in topics], "fingerprint": fingerprint})
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def get(self, key: str):
+        """Fresh snapshot {"text", "topics", "fetched_at", ...} for key, or None."""
+        try:
+            snapshot = json.loads(self._path(key).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        fetched_at = snapshot.get("fetched_at", 0)
+        if fetched_at < self.refresh_before or time.time() - fetched_at >= self.ttl:
+            return None
+        return snapshot
+
+    def record(self, stat: str) -> None:
+        with self._lock:
+            self.stats[stat] += 1
+
+    def put(self, key: str, text: str, topics, **extra) -> dict:
+        snapshot = {"text": text, "topics": list(topics), "fetched_at": time.time(), **extra}
+        if self.ttl > 0:
+            atomic_write_text(self._path(key), json.dumps(snapshot, indent=2))
+        self.record("fetches")
+        return snapshot
+
+    def invalidate(self) -> None:
+        """Treat every snapshot fetched until now as stale."""
+        self.refresh_before = time.time()
+
+    def lock(self, key: str) -> asyncio.Lock:
+        """Per-key lock so concurrent misses share one fetch (locks belong to the running loop)."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._locks = loop, {}
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        return lock
+
+    def format_stats(self) -> str:
+        return (
+            f"Trend snapshots: {self.stats['hits']} hits, {self.stats['misses']} misses, "
+            f"{self.stats['fetches']} fetches (TTL {self.ttl / 3600:g}h)"
+        )
+
+
+_trend_cache = None
+
+
+def get_trend_cache() -> TrendSnapshotCache:
+    """Process-wide trend snapshot cache."""
+    global _trend_cache
+    if _trend_cache is None:
+        _trend_cache = TrendSnapshotCache()
+    return _trend_cache
+
+
+class TrendSourceAgent(BaseAgent):
+    """Fills output_key with a trend report from the configured source.
+
+    With a sub-agent (Trend_Finding_Agent), a fresh snapshot from the
+    TrendSnapshotCache is used when there is one; otherwise the sub-agent
+    runs once and its report becomes the new snapshot. Without a sub-agent,
+    the report is read from trend_file. Either way a
+    <output_key>_source record says where the trends came from.
+    """
+
+    output_key: str
+    topics: list = []
+    fingerprint: str = ""
+    trend_file: str = ""
+
+    def _event(self, ctx: InvocationContext, text: str, info: dict) -> Event:
+        return Event(
+            invocation_id=ctx.invocation_id,
+            author=self.name,
+            branch=ctx.branch,
+            content=types.Content(role="model", parts=[types.Part(text=text)]),
+            actions=EventActions(state_delta={self.output_key: text, trend_info_key(self.output_key): info}),
+        )
+
+    def _snapshot_event(self, ctx: InvocationContext, snapshot: dict) -> Event:
+        info = {"source": "cache", "fetched_at": snapshot["fetched_at"],
+                "age_s": round(time.time() - snapshot["fetched_at"], 1)}
+        return self._event(ctx, snapshot["text"], info)
+
+    async def _run_async_impl(
+        self, ctx: InvocationContext
+    ) -> AsyncGenerator[Event, None]:
+        if not self.sub_agents:
+            text = read_trend_file(self.trend_file)
+            yield self._event(ctx, text, {"source": "file", "path": str(self.trend_file)})
+            return
+
+        cache = get_trend_cache()
+        key = cache.key(self.topics, self.fingerprint)
+        if cache.ttl <= 0:
+            async for event in self._fetch(ctx, cache, key):
+                yield event
+            return
+        snapshot = cache.get(key)
+        if snapshot is None:
+            async with cache.lock(key):
+                # Another run may have fetched it while we waited
+                snapshot = cache.get(key)
+                if snapshot is None:
+                    async for event in self._fetch(ctx, cache, key):
+                        yield event
+                    return
+        cache.record("hits")
+        yield self._snapshot_event(ctx, snapshot)
+
+    async def _fetch(self, ctx: InvocationContext, cache: TrendSnapshotCache, key: str):
+        cache.record("misses")
+        finder = self.sub_agents[0]
+        async for event in finder.run_async(ctx):
+            yield event
+        text = ctx.session.state.get(self.output_key) or ""
+        if not text.strip():
+            # Nothing to share; the branch record shows the missing research
+            return
+        snapshot = cache.put(key, text, self.topics, agent=finder.name)
+        logger.info("Trend snapshot %s fetched by %s", key, finder.name)
+        yield Event(
+            invocation_id=ctx.invocation_id,
+            author=self.name,
+            branch=ctx.branch,
+            actions=EventActions(state_delta={
+                trend_info_key(self.output_key): {"source": "search", "fetched_at": snapshot["fetched_at"]},
+            }),
+        )
+
+
+def build_trend_source(trend_finding_agent=None, output_key: str = "external_trends", topics=None,
+                       fingerprint: str = "", trend_file: str = None,
+                       name: str = "TrendSourceAgent") -> TrendSourceAgent:
+    """Trend source for the research stage.
+
+    Args:
+        trend_finding_agent: Agent that searches for trends (source "search"); None reads trend_file
+        output_key: State key the trend report is written to
+        topics: Trend topics (part of the snapshot key)
+        fingerprint: Anything else that changes the report, e.g. prompt and model
+        trend_file: Local trend report (source "file")
+    """
+    if trend_finding_agent is None:
+        return TrendSourceAgent(name=name, output_key=output_key, topics=list(topics or TREND_TOPICS),
+                                trend_file=str(trend_file or TREND_FILE),
+                                description="Reads the external trend report from a local file")
+    return TrendSourceAgent(
+        name=name,
+        output_key=output_key,
+        topics=list(topics or TREND_TOPICS),
+        fingerprint=fingerprint,
+        description=trend_finding_agent.description,
+        sub_agents=[trend_finding_agent],
+    )
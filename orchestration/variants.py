@@ -0,0 +1,113 @@
+# variants.py
+# A/B variant fan-out: one shared research pass, N concurrent content/design variants
+
+from pathlib import Path
+
+from orchestration.instrumentation import estimate_cost_usd
+
+# Angles cycled across variants so subject lines and copy actually differ
+DEFAULT_BRIEFS = [
+    "Lead with the main benefit in the title; confident, concise tone.",
+    "Open with the problem the reader faces, then the solution; phrase the title as a question.",
+    "Lead with a concrete number or measurable result in the title; data-driven tone.",
+    "Tie the title to the most timely industry trend; create urgency without hype.",
+    "Speak to decision-makers: focus the title on business outcomes and risk reduction.",
+]
+
+
+def build_variant_jobs(count: int, output_dir, templates=(), briefs=None) -> list:
+    """Jobs for run_batch: one per variant, each with its own output directory.
+
+    Briefs and templates are assigned round-robin, so with several style
+    samples the variants also differ in layout.
+    """
+    if count < 1:
+        raise ValueError("At least one variant is required")
+    briefs = briefs or DEFAULT_BRIEFS
+    variants_dir = Path(output_dir) / "variants"
+    jobs = []
+    for i in range(count):
+        name = f"variant-{i + 1}"
+        jobs.append({
+            "name": name,
+            "output_dir": str(variants_dir / name),
+            "brief": briefs[i % len(briefs)],
+            "template": templates[i % len(templates)] if templates else None,
+        })
+    return jobs
+
+
+def compare_variant_runs(research_usage: dict, batch_report: dict, variant_usage: dict,
+                         research_skipped: bool = False) -> dict:
+    """Cost and latency of the shared-research run vs. N independent full runs.
+
+    Seconds are summed run times on both sides (research plus each variant,
+    as if run one after another), so concurrency doesn't skew the comparison;
+    the shared run's measured wall time is reported separately.
+
+    Args:
+        research_usage: usage of one research pass, with "seconds" (from research.json)
+        batch_report: run_batch() report for the variant jobs
+        variant_usage: {variant name: usage dict} measured during this run
+        research_skipped: research was up to date and reused, so it took no time in this run
+    """
+    count = len(batch_report["jobs"])
+    prompt = sum(u["prompt_tokens"] for u in variant_usage.values())
+    completion = sum(u["completion_tokens"] for u in variant_usage.values())
+    calls = sum(u["model_calls"] for u in variant_usage.values())
+    variant_seconds = sum(job["seconds"] for job in batch_report["jobs"])
+    research_seconds = 0.0 if research_skipped else research_usage["seconds"]
+
+    shared_prompt = research_usage["prompt_tokens"] + prompt
+    shared_completion = research_usage["completion_tokens"] + completion
+    independent_prompt = count * research_usage["prompt_tokens"] + prompt
+    independent_completion = count * research_usage["completion_tokens"] + completion
+    shared_cost = estimate_cost_usd(shared_prompt, shared_completion)
+    independent_cost = estimate_cost_usd(independent_prompt, independent_completion)
+    return {
+        "variants": count,
+        "shared": {
+            "model_calls": research_usage["model_calls"] + calls,
+            "tokens": shared_prompt + shared_completion,
+            "cost_usd": shared_cost,
+            # Research once (or not at all, when reused), then every variant
+            "seconds": round(research_seconds + variant_seconds, 3),
+            "wall_seconds": round(research_seconds + batch_report["wall_seconds"], 3),
+        },
+        "independent": {
+            "model_calls": count * research_usage["model_calls"] + calls,
+            "tokens": independent_prompt + independent_completion,
+            "cost_usd": independent_cost,
+            # N full runs one after another
+            "seconds": round(count * research_usage["seconds"] + variant_seconds, 3),
+        },
+        "cost_saved_pct": round(100 * (1 - shared_cost / independent_cost), 1) if independent_cost else 0.0,
+    }
+
+
+def format_variant_report(jobs, batch_report: dict, variant_usage: dict, comparison: dict) -> str:
+    results = {r["name"]: r for r in batch_report["jobs"]}
+    lines = []
+    for job in jobs:
+        result = results[job["name"]]
+        usage = variant_usage.get(job["name"], {})
+        line = (
+            f"  - {job['name']}: {result['status']} in {result['seconds']:.2f}s, "
+            f"{usage.get('model_calls', 0)} model calls, ${usage.get('cost_usd', 0.0):.4f}"
+            + (f", template {job['template']}" if job["template"] else "")
+            + f" -> {job['output_dir']}"
+        )
+        if result.get("error"):
+            line += f" ({result['error']})"
+        lines.append(line)
+    shared, independent = comparison["shared"], comparison["independent"]
+    lines.append(
+        f"  Shared research: {shared['model_calls']} model calls, {shared['tokens']} tokens, "
+        f"${shared['cost_usd']:.4f}, {shared['seconds']:.1f}s ({shared['wall_seconds']:.1f}s wall time)"
+    )
+    lines.append(
+        f"  {comparison['variants']} independent runs (estimated): {independent['model_calls']} model calls, "
+        f"{independent['tokens']} tokens, ${independent['cost_usd']:.4f}, {independent['seconds']:.1f}s"
+    )
+    lines.append(f"  Cost saved: {comparison['cost_saved_pct']:.1f}%")
+    return "\n".join(lines)
@@ -0,0 +1,7 @@
+# conftest.py
+# Makes the repository root importable (agent.py, func_tools, orchestration) when pytest runs from anywhere
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
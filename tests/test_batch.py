@@ -0,0 +1,89 @@
+# test_batch.py
+# Batch manifest jobs: defaults, path resolution and output directory conflicts
+
+import json
+from pathlib import Path
+
+import pytest
+
+from orchestration.batch import DEFAULT_CONCURRENCY, load_manifest, normalize_job, validate_jobs
+
+
+def test_normalize_job_fills_defaults(tmp_path):
+    job = normalize_job({}, "campaign-1", tmp_path)
+
+    assert job["name"] == "campaign-1"
+    assert job["audience"] == ""
+    assert job["template"] == ""
+    assert job["output_dir"] == str((tmp_path / "output" / "campaign-1").resolve())
+    assert job["product_data_dir"] == str((tmp_path / "product_data").resolve())
+    assert job["style_samples_dir"] == str((tmp_path / "style_samples").resolve())
+
+
+def test_normalize_job_keeps_given_fields(tmp_path):
+    absolute = tmp_path / "elsewhere"
+    job = normalize_job(
+        {"name": "launch", "audience": "PCB designers", "output_dir": str(absolute), "product_data_dir": "docs"},
+        "campaign-1",
+        tmp_path,
+    )
+
+    assert job["name"] == "launch"
+    assert job["audience"] == "PCB designers"
+    assert job["output_dir"] == str(absolute)
+    assert job["product_data_dir"] == str((tmp_path / "docs").resolve())
+
+
+def test_normalize_job_does_not_modify_the_campaign(tmp_path):
+    campaign = {"name": "launch"}
+    normalize_job(campaign, "campaign-1", tmp_path)
+    assert campaign == {"name": "launch"}
+
+
+def test_validate_jobs_accepts_separate_directories(tmp_path):
+    validate_jobs([
+        normalize_job({"name": "a"}, "campaign-1", tmp_path),
+        normalize_job({"name": "b"}, "campaign-2", tmp_path),
+    ])
+
+
+def test_validate_jobs_rejects_duplicate_names(tmp_path):
+    jobs = [
+        normalize_job({"name": "a", "output_dir": "out/1"}, "campaign-1", tmp_path),
+        normalize_job({"name": "a", "output_dir": "out/2"}, "campaign-2", tmp_path),
+    ]
+    with pytest.raises(ValueError, match="Duplicate campaign names"):
+        validate_jobs(jobs)
+
+
+@pytest.mark.parametrize("dir_a, dir_b", [
+    ("out/shared", "out/shared"),
+    ("out", "out/nested"),
+    ("out/nested", "out"),
+])
+def test_validate_jobs_rejects_overlapping_output_dirs(tmp_path, dir_a, dir_b):
+    jobs = [
+        normalize_job({"name": "a", "output_dir": dir_a}, "campaign-1", tmp_path),
+        normalize_job({"name": "b", "output_dir": dir_b}, "campaign-2", tmp_path),
+    ]
+    with pytest.raises(ValueError, match="overlapping output directories"):
+        validate_jobs(jobs)
+
+
+def test_validate_jobs_allows_sibling_prefixes(tmp_path):
+    # out/a is not inside out/ab even though the strings share a prefix
+    validate_jobs([
+        normalize_job({"name": "a", "output_dir": "out/a"}, "campaign-1", tmp_path),
+        normalize_job({"name": "b", "output_dir": "out/ab"}, "campaign-2", tmp_path),
+    ])
+
+
+def test_load_manifest_resolves_paths_against_its_directory(tmp_path):
+    manifest = tmp_path / "campaigns.json"
+    manifest.write_text(json.dumps({"campaigns": [{"name": "launch"}, {}]}), encoding="utf-8")
+
+    loaded = load_manifest(manifest)
+
+    assert loaded["concurrency"] == DEFAULT_CONCURRENCY
+    assert [job["name"] for job in loaded["jobs"]] == ["launch", "campaign-2"]
+    assert Path(loaded["jobs"][0]["output_dir"]) == (tmp_path / "output" / "launch").resolve()
@@ -0,0 +1,83 @@
+# test_context_budget.py
+# Structured compaction of research text to a token budget
+
+import pytest
+
+from orchestration.context_budget import compact_text, estimate_tokens, parse_budgets
+
+FILLER = "The weather in the office was pleasant and everyone enjoyed lunch together that day"
+
+
+def research(filler_lines: int = 40) -> str:
+    lines = ["## NeuraForge HDA", "- Cuts layout time by 40% on average"]
+    lines += [f"{FILLER} ({chr(97 + i % 26)}{i // 26})" for i in range(filler_lines)]
+    lines += ["- New launch: cloud library sync for customers", "Closing words"]
+    return "\n".join(lines)
+
+
+def test_text_within_budget_is_returned_unchanged():
+    text = research(2)
+    assert compact_text(text, estimate_tokens(text)) is text
+
+
+def test_compacted_text_fits_the_budget():
+    text = research()
+    for budget in (50, 100, 200):
+        assert estimate_tokens(compact_text(text, budget)) <= budget
+
+
+def test_keeps_headings_metrics_and_selling_points_first():
+    compacted = compact_text(research(), 60)
+    lines = compacted.splitlines()
+
+    # Kept lines stay in their original order, followed by the omission note
+    assert lines[:3] == [
+        "## NeuraForge HDA",
+        "- Cuts layout time by 40% on average",
+        "- New launch: cloud library sync for customers",
+    ]
+    assert FILLER not in compacted
+    assert lines[-1].startswith("[... ") and lines[-1].endswith(" lines omitted to fit the context budget]")
+
+
+def test_omission_note_counts_dropped_lines():
+    text = research(10)
+    compacted = compact_text(text, 60)
+    kept = len(compacted.splitlines()) - 1
+    assert f"[... {14 - kept} of 14 lines omitted" in compacted
+
+
+def test_repeated_lines_are_kept_once():
+    text = "\n".join(["- Cuts layout time by 40%", "-  cuts LAYOUT time by 40%"] * 30 + ["Closing words"] * 20)
+    compacted = compact_text(text, 40)
+    assert compacted.lower().count("cuts layout time") == 1
+    assert compacted.count("Closing words") == 1
+
+
+def test_long_lines_are_split_into_sentences():
+    paragraph = " ".join([f"{FILLER}."] * 6 + ["Customers report 3x faster reviews."] + [f"{FILLER}."] * 6)
+    compacted = compact_text(paragraph, 30)
+    assert compacted.splitlines()[0] == "Customers report 3x faster reviews."
+
+
+def test_a_single_oversized_line_is_truncated():
+    compacted = compact_text("x" * 10_000, 100)
+    assert compacted.startswith("x" * 100)
+    assert estimate_tokens(compacted) <= 100
+
+
+@pytest.mark.parametrize("spec, expected", [
+    ("", {}),
+    ("ContentWritingAgent=6000", {"ContentWritingAgent": 6000}),
+    ("ContentWritingAgent=6000, marketing_coordinator = 4000,", {"ContentWritingAgent": 6000,
+                                                                   "marketing_coordinator": 4000}),
+])
+def test_parse_budgets(spec, expected):
+    assert parse_budgets(spec) == expected
+
+
+def test_a_budget_too_small_for_the_note_keeps_the_start_of_the_first_line():
+    text = research()
+    assert compact_text(text, 3) == "## NeuraForge HDA"[:12]
+    assert compact_text(text, 0) == ""
+    assert compact_text(text, -5) == ""
@@ -0,0 +1,101 @@
+# test_html_postprocess.py
+# CSS inlining and HTML minification of the final newsletter
+
+from func_tools.html_postprocess import inline_css, minify_html
+
+
+def page(style: str, body: str) -> str:
+    return f"<html><head><style>{style}</style></head><body>{body}</body></html>"
+
+
+def test_inline_css_without_style_blocks_is_a_no_op():
+    source = "<html><body><p>Hi</p></body></html>"
+    assert inline_css(source) == (source, 0)
+
+
+def test_inline_css_moves_simple_rules_onto_elements():
+    html, inlined = inline_css(page("p{color:red} .lead{font-size:16px}", '<p class="lead">Hi</p><p>Plain</p>'))
+
+    assert inlined == 2
+    assert '<p class="lead" style="color: red; font-size: 16px">Hi</p>' in html
+    assert '<p style="color: red">Plain</p>' in html
+    # Everything was inlined, so the <style> block is gone
+    assert "<style" not in html
+
+
+def test_inline_css_orders_by_specificity_and_keeps_inline_styles():
+    html, _ = inline_css(page(
+        "#hero p{color:green} p{color:red; margin:0} .lead{color:blue}",
+        '<div id="hero"><p class="lead">A</p><p class="lead" style="color:black">B</p></div>',
+    ))
+
+    # #hero p beats .lead beats p, whatever the source order
+    assert '<p class="lead" style="color: green; margin: 0">A</p>' in html
+    # An existing inline declaration wins over every rule
+    assert '<p class="lead" style="color: black; margin: 0">B</p>' in html
+
+
+def test_inline_css_important_beats_inline_style():
+    html, _ = inline_css(page("td > a{color:green !important}", '<table><tr><td><a href="x" style="color:black">Go</a>'
+                                                                 "</td></tr></table>"))
+    assert '<a href="x" style="color: green">Go</a>' in html
+
+
+def test_inline_css_matches_descendant_and_child_combinators():
+    html, _ = inline_css(page(
+        "td > a{color:green} table a{font-weight:bold}",
+        '<table><tr><td><a href="x">Direct</a><span><a href="y">Nested</a></span></td></tr></table>',
+    ))
+    assert '<a href="x" style="color: green; font-weight: bold">Direct</a>' in html
+    assert '<a href="y" style="font-weight: bold">Nested</a>' in html
+
+
+def test_inline_css_keeps_rules_it_cannot_inline():
+    html, inlined = inline_css(page(
+        "p{color:red} a:hover{color:pink} @media (max-width:600px){p{font-size:14px}} a[href]{color:blue}",
+        '<p>Hi</p><a href="x">Go</a>',
+    ))
+
+    assert inlined == 1
+    assert '<p style="color: red">Hi</p>' in html
+    assert "<style>a:hover{color:pink}@media (max-width:600px){p{font-size:14px}}a[href]{color:blue}</style>" in html
+    assert '<a href="x">Go</a>' in html
+
+
+def test_inline_css_leaves_print_stylesheets_alone():
+    source = '<html><head><style media="print">p{color:red}</style></head><body><p>Hi</p></body></html>'
+    html, inlined = inline_css(source)
+    assert inlined == 0
+    assert "<p>Hi</p>" in html
+
+
+def test_minify_html_collapses_whitespace_and_drops_comments():
+    source = """<html>
+    <!-- editor note -->
+    <body>
+      <p>Hello   <b>big</b>
+         world</p>
+    </body></html>"""
+    assert minify_html(source) == "<html><body><p>Hello <b>big</b> world</p></body></html>"
+
+
+def test_minify_html_keeps_outlook_conditional_comments():
+    source = "<body><!--[if mso]><table><tr><td><![endif]--><p>x</p><!--[if mso]></td></tr></table><![endif]--></body>"
+    assert minify_html(source) == source
+
+
+def test_minify_html_keeps_preformatted_text():
+    source = "<body>\n<pre>  keep\n   this </pre>\n<textarea> a  b </textarea></body>"
+    assert minify_html(source) == "<body><pre>  keep\n   this </pre> <textarea> a  b </textarea></body>"
+
+
+def test_minify_html_minifies_css():
+    source = '<head><style>\n  p {\n    color : red ;\n  }\n  /* note */\n</style></head>' \
+             '<div style="color : red ;  margin: 0 ">x</div>'
+    assert minify_html(source) == '<head><style>p{color:red}</style></head><div style="color:red;margin:0">x</div>'
+
+
+def test_minify_html_is_idempotent():
+    source = page("p { color: red; }", "<table>\n <tr>\n  <td> <a href='x'> Go </a> </td>\n </tr>\n</table>")
+    once = minify_html(source)
+    assert minify_html(once) == once
@@ -0,0 +1,143 @@
+# test_html_validator.py
+# Deterministic newsletter checks, the sections issues point at, and the fixes that need no model
+
+from pathlib import Path
+
+import pytest
+
+from func_tools.html_validator import autofix_html, validate_html
+
+TEMPLATE = (Path(__file__).resolve().parent.parent / "style_samples" / "Sample_Style_Template"
+            / "Sample_Newsletter_Template.html")
+
+HEAD = '<head><meta name="viewport" content="width=device-width"><title>News</title></head>'
+CTA = '<a href="https://example.com" style="background-color:#0a6;color:#fff;padding:12px">Try it</a>'
+
+
+def newsletter(title="<h1>Launch news</h1>", body="<p>Body text</p>", cta=CTA, head=HEAD) -> str:
+    return (
+        f"<!DOCTYPE html><html>{head}<body>"
+        '<table width="600"><tr><td>Header</td></tr>'
+        f"<tr><td>{title}</td></tr>"
+        f"<tr><td>{body}</td></tr>"
+        f"<tr><td>{cta}</td></tr>"
+        "<tr><td>Footer</td></tr></table></body></html>"
+    )
+
+
+def rules(report) -> list:
+    return [issue["rule"] for issue in report["issues"]]
+
+
+def test_valid_newsletter_has_no_issues():
+    report = validate_html(newsletter())
+    assert report["valid"]
+    assert report["issues"] == []
+    assert [s["tag"] for s in report["sections"]] == ["tr"] * 5
+
+
+def test_sample_template_is_valid():
+    report = validate_html(TEMPLATE.read_text(encoding="utf-8"))
+    assert report["valid"]
+    assert report["errors"] == 0
+
+
+@pytest.mark.parametrize("document, rule", [
+    (newsletter(body="<p>x</p><script>alert(1)</script>"), "script"),
+    (newsletter(body='<p onclick="go()">x</p>'), "script"),
+    (newsletter(body='<a href="javascript:void(0)">x</a>'), "script"),
+    (newsletter(head='<head><link rel="stylesheet" href="https://fonts.googleapis.com/css?family=Inter"></head>'),
+     "external_font"),
+    (newsletter(head='<head><link rel="stylesheet" href="https://example.com/site.css"></head>'),
+     "external_stylesheet"),
+    (newsletter(body="<form><input name=q></form>"), "unsupported_element"),
+    (newsletter(body="<div><p>never closed</p>"), "unclosed_tag"),
+    (newsletter(body="<p>x</p></span>"), "stray_end_tag"),
+    (newsletter(cta='<a href="https://example.com">Plain link</a>'), "missing_cta"),
+])
+def test_errors(document, rule):
+    report = validate_html(document)
+    assert rule in rules(report)
+    assert not report["valid"]
+
+
+@pytest.mark.parametrize("document, rule", [
+    (newsletter(cta=CTA.replace("https://example.com", "#")), "cta_link"),
+    (newsletter(body='<table width="800"><tr><td>wide</td></tr></table>'), "too_wide"),
+    (newsletter(head="<head><title>News</title></head>"), "viewport"),
+    (newsletter(body='<img src="logo.png">'), "image_alt"),
+])
+def test_warnings_do_not_invalidate(document, rule):
+    report = validate_html(document)
+    assert rules(report) == [rule]
+    assert report["valid"]
+    assert report["warnings"] == 1
+
+
+def test_issue_points_at_its_section():
+    report = validate_html(newsletter(body="<p>x</p><script>alert(1)</script>"))
+    (issue,) = report["issues"]
+    assert issue["section"] == 2
+    assert issue["offset"] is not None
+
+
+def test_missing_title_targets_the_section_with_the_demoted_heading():
+    report = validate_html(newsletter(title="<h2>Launch news</h2>"))
+    (issue,) = [i for i in report["issues"] if i["rule"] == "missing_title"]
+    assert issue["section"] == 1
+
+
+def test_missing_title_falls_back_to_the_first_text_section():
+    document = newsletter(title="<p>Launch news</p>").replace("<td>Header</td>", "<td></td>")
+    (issue,) = [i for i in validate_html(document)["issues"] if i["rule"] == "missing_title"]
+    assert issue["section"] == 1
+
+
+def test_missing_title_in_the_sample_template_targets_its_header():
+    # The template's title sits in section 0 (section 1 is an empty spacer row)
+    source = TEMPLATE.read_text(encoding="utf-8").replace("<h1", "<h2").replace("</h1>", "</h2>")
+    (issue,) = [i for i in validate_html(source)["issues"] if i["rule"] == "missing_title"]
+    assert issue["section"] == 0
+
+
+def test_missing_cta_targets_the_section_of_the_plain_link():
+    report = validate_html(newsletter(cta='<a href="https://example.com">Plain link</a>'))
+    (issue,) = [i for i in report["issues"] if i["rule"] == "missing_cta"]
+    assert issue["section"] == 3
+
+
+def test_autofix_removes_scripts_and_external_resources():
+    document = newsletter(
+        head='<head><meta name="viewport" content="width=device-width">'
+             '<link rel="stylesheet" href="https://fonts.googleapis.com/css?family=Inter">'
+             '<link rel="icon" href="favicon.ico">'
+             "<style>@import url('https://example.com/x.css'); p{color:red}</style></head>",
+        body='<p onclick="go()">x</p><script>alert(1)</script><a href="javascript:void(0)">y</a>',
+    )
+
+    fixed, fixed_rules = autofix_html(document)
+
+    assert set(fixed_rules) == {"script", "external_font"}
+    assert "<script" not in fixed
+    assert "onclick" not in fixed
+    assert 'href="#"' in fixed
+    assert "fonts.googleapis.com" not in fixed
+    assert "@import" not in fixed
+    # Not a stylesheet, and plain CSS, are left alone
+    assert '<link rel="icon" href="favicon.ico">' in fixed
+    assert "p{color:red}" in fixed
+    assert validate_html(fixed)["errors"] == 0
+
+
+def test_autofix_keeps_local_font_faces():
+    document = newsletter(head="<head><style>@font-face{font-family:X;src:url(x.woff)}"
+                               "@font-face{font-family:Y;src:url(https://cdn.example.com/y.woff)}</style></head>")
+    fixed, fixed_rules = autofix_html(document)
+    assert fixed_rules == ["external_font"]
+    assert "url(x.woff)" in fixed
+    assert "cdn.example.com" not in fixed
+
+
+def test_autofix_leaves_a_clean_document_unchanged():
+    document = newsletter()
+    assert autofix_html(document) == (document, [])
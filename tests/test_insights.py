@@ -0,0 +1,130 @@
+# test_insights.py
+# Merging per-document summaries and the content-hash insights manifest
+
+import json
+
+from orchestration.context_budget import estimate_tokens
+from orchestration.insights import MANIFEST_VERSION, InsightsManifest, document_text, merge_insights
+
+
+def test_merge_insights_sections_in_name_order():
+    merged = merge_insights({"b.pdf": " Second summary \n", "a.pdf": "First summary"}, max_tokens=0)
+    assert merged == "## a.pdf\nFirst summary\n\n## b.pdf\nSecond summary"
+
+
+def test_merge_insights_of_nothing_is_empty():
+    assert merge_insights({}) == ""
+
+
+def test_merge_insights_only_changes_where_a_document_did():
+    summaries = {"a.pdf": "Alpha cuts layout time by 40%", "b.pdf": "Beta adds cloud sync"}
+    before = merge_insights(summaries)
+    after = merge_insights({**summaries, "b.pdf": "Beta adds cloud sync and SSO"})
+    assert before.split("\n\n")[0] == after.split("\n\n")[0]
+
+
+def test_merge_insights_gives_every_document_an_equal_share():
+    long_summary = "\n".join(f"- Feature {i}: cuts review time by {i}%" for i in range(200))
+    merged = merge_insights({"big.pdf": long_summary, "small.pdf": "- Small: saves 5 minutes"}, max_tokens=400)
+
+    big, small = merged.split("\n\n## small.pdf\n")
+    assert estimate_tokens(big) <= 200 + 10
+    assert small == "- Small: saves 5 minutes"
+    assert "lines omitted to fit the context budget" in big
+
+
+def test_document_text_marks_pages_and_skips_blank_ones():
+    text = document_text(["First page", "  ", "Third page"], max_tokens=0)
+    assert text == "[page 1]\nFirst page\n[page 3]\nThird page"
+
+
+def test_manifest_key_covers_content_and_fingerprint():
+    key = InsightsManifest.key("abc", "prompt v1")
+    assert key.startswith("abc:")
+    assert key == InsightsManifest.key("abc", "prompt v1")
+    assert key != InsightsManifest.key("abc", "prompt v2")
+    assert key != InsightsManifest.key("abd", "prompt v1")
+
+
+def test_manifest_persists_entries(tmp_path):
+    path = tmp_path / "insights.json"
+    manifest = InsightsManifest(path)
+    key = InsightsManifest.key("abc")
+    assert manifest.get(key) is None
+
+    manifest.put(key, "docs/a.pdf", "Summary", pages=3)
+
+    entry = InsightsManifest(path).get(key)
+    assert entry["source"] == "docs/a.pdf"
+    assert entry["summary"] == "Summary"
+    assert entry["pages"] == 3
+    assert json.loads(path.read_text(encoding="utf-8"))["version"] == MANIFEST_VERSION
+
+
+def test_manifest_ignores_other_versions_and_corrupt_files(tmp_path):
+    path = tmp_path / "insights.json"
+    path.write_text(json.dumps({"version": MANIFEST_VERSION + 1, "documents": {"k": {"summary": "old"}}}),
+                    encoding="utf-8")
+    assert InsightsManifest(path).get("k") is None
+
+    path.write_text("{not json", encoding="utf-8")
+    assert InsightsManifest(path).get("k") is None
+
+
+def test_merge_insights_of_many_documents_keeps_first_lines_within_the_budget():
+    summaries = {
+        f"product_{i:03d}.pdf": f"- Model {i} cuts layout time by {i % 50}%\n"
+        + "\n".join(f"- Detail {j}: {j}% faster reviews" for j in range(60))
+        for i in range(300)
+    }
+    merged = merge_insights(summaries, max_tokens=4000)
+
+    assert estimate_tokens(merged) <= 4000
+    assert merged.startswith("## product_000.pdf\n- Model 0 cuts layout time by 0%\n\n## product_001.pdf\n")
+    assert "Detail" not in merged
+    kept = merged.count("## product_")
+    assert 0 < kept < 300
+    assert merged.endswith(f"{300 - kept} documents omitted to fit the context budget]")
+
+
+def test_merge_insights_drops_whole_documents_rather_than_cutting_them():
+    summaries = {f"doc_{i}.pdf": "- Saves 5 minutes per review\n- More detail" for i in range(10)}
+    merged = merge_insights(summaries, max_tokens=50)
+
+    assert estimate_tokens(merged) <= 50
+    sections = merged.split("\n\n")
+    assert len(sections) > 1
+    assert sections[-1].endswith(f"{11 - len(sections)} documents omitted to fit the context budget]")
+    assert all(section == f"## doc_{i}.pdf\n- Saves 5 minutes per review" for i, section in enumerate(sections[:-1]))
+
+
+def test_manifest_instances_keep_each_others_entries(tmp_path):
+    path = tmp_path / "insights.json"
+    a, b = InsightsManifest(path), InsightsManifest(path)
+    assert a.get("k0") is None and b.get("k0") is None
+
+    a.put("k1", "a.pdf", "First", pages=1)
+    b.put("k2", "b.pdf", "Second", pages=2)
+
+    on_disk = InsightsManifest(path)
+    assert on_disk.get("k1")["summary"] == "First"
+    assert on_disk.get("k2")["summary"] == "Second"
+
+
+def test_manifest_prunes_documents_no_longer_in_the_directory(tmp_path):
+    path = tmp_path / "insights.json"
+    manifest = InsightsManifest(path)
+    manifest.put(InsightsManifest.key("kept", "v1"), "a.pdf", "Kept", pages=1, directory="/docs")
+    manifest.put(InsightsManifest.key("kept", "v2"), "a.pdf", "Kept, new prompt", pages=1, directory="/docs")
+    manifest.put(InsightsManifest.key("gone"), "b.pdf", "Gone", pages=1, directory="/docs")
+    manifest.put(InsightsManifest.key("other"), "c.pdf", "Other directory", pages=1, directory="/elsewhere")
+
+    assert manifest.prune("/docs", ["kept"]) == 1
+    assert manifest.prune("/docs", ["kept"]) == 0
+
+    on_disk = InsightsManifest(path)
+    assert on_disk.get(InsightsManifest.key("gone")) is None
+    assert on_disk.get(InsightsManifest.key("kept", "v1"))["summary"] == "Kept"
+    assert on_disk.get(InsightsManifest.key("kept", "v2")) is not None
+    assert on_disk.get(InsightsManifest.key("other"))["summary"] == "Other directory"
+    assert manifest.stats["pruned"] == 1
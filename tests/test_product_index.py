@@ -0,0 +1,66 @@
+# test_product_index.py
+# ProductIndex refresh: content-hash tracking, removed and changed documents, failed extractions
+
+import shutil
+from pathlib import Path
+
+from func_tools.pdf_cache import PdfTextCache
+from func_tools.product_index import ProductIndex
+
+MOCK_PDF = Path(__file__).resolve().parent.parent / "product_data" / "Mock_Product_Data.pdf"
+
+
+def make_index(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    shutil.copy(MOCK_PDF, docs / "product.pdf")
+    return docs, ProductIndex(tmp_path / "index.json", cache=PdfTextCache(tmp_path / "pdf_cache"))
+
+
+def query(index):
+    """A query built from the indexed text, so it matches whatever the mock PDF says."""
+    return " ".join(next(iter(index.chunks.values()))["text"].split()[:8])
+
+
+def test_refresh_indexes_new_documents_once(tmp_path):
+    docs, index = make_index(tmp_path)
+
+    assert index.refresh(docs) == {"added": 1, "updated": 0, "removed": 0, "unchanged": 0, "failed": 0}
+    assert index.search(query(index))
+    assert index.refresh(docs) == {"added": 0, "updated": 0, "removed": 0, "unchanged": 1, "failed": 0}
+
+    # The saved index is loaded by a new instance
+    reloaded = ProductIndex(tmp_path / "index.json", cache=PdfTextCache(tmp_path / "pdf_cache"))
+    assert reloaded.search(query(index)) == index.search(query(index))
+
+
+def test_refresh_drops_removed_documents(tmp_path):
+    docs, index = make_index(tmp_path)
+    index.refresh(docs)
+    terms = query(index)
+
+    (docs / "product.pdf").unlink()
+
+    assert index.refresh(docs)["removed"] == 1
+    assert index.search(terms) == []
+    assert index.chunks == {}
+
+
+def test_changed_document_that_fails_to_extract_is_no_longer_searchable(tmp_path):
+    docs, index = make_index(tmp_path)
+    index.refresh(docs)
+    terms = query(index)
+
+    (docs / "product.pdf").write_bytes(b"%PDF-1.4\nnot really a PDF any more\n")
+
+    counts = index.refresh(docs)
+    assert counts["failed"] == 1
+    assert counts["unchanged"] == 0
+    assert index.search(terms) == []
+    assert index.chunks == {}
+    assert str(docs / "product.pdf") in index.failed
+
+    # Also gone from the saved index, and not retried until the file changes again
+    reloaded = ProductIndex(tmp_path / "index.json", cache=PdfTextCache(tmp_path / "pdf_cache"))
+    assert reloaded.search(terms) == []
+    assert index.refresh(docs)["failed"] == 1
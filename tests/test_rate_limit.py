@@ -0,0 +1,94 @@
+# test_rate_limit.py
+# TokenBucket on a fake clock: refill, waiting, oversized acquisitions and adjustments
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from orchestration import rate_limit
+from orchestration.rate_limit import TokenBucket
+
+
+class FakeClock:
+    """time.monotonic / asyncio.sleep stand-in: sleeping advances the clock instantly."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    # Only this module's clock is faked; the event loop keeps the real one
+    monkeypatch.setattr(rate_limit, "time", SimpleNamespace(monotonic=clock.monotonic))
+    monkeypatch.setattr(rate_limit.asyncio, "sleep", clock.sleep)
+    return clock
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_starts_full(clock):
+    bucket = TokenBucket(rate_per_minute=60)
+    assert run(bucket.acquire(60)) == 0.0
+    assert clock.sleeps == []
+
+
+def test_waits_for_refill(clock):
+    bucket = TokenBucket(rate_per_minute=60, capacity=1)
+    run(bucket.acquire(1))
+
+    # 60/min is one token per second
+    waited = run(bucket.acquire(1))
+    assert waited == pytest.approx(1.0)
+
+
+def test_refill_is_capped_at_capacity(clock):
+    bucket = TokenBucket(rate_per_minute=60, capacity=5)
+    run(bucket.acquire(5))
+    clock.now += 3600
+
+    assert run(bucket.acquire(5)) == 0.0
+    assert run(bucket.acquire(1)) == pytest.approx(1.0)
+
+
+def test_oversized_acquisition_waits_for_a_full_bucket_then_goes_into_debt(clock):
+    bucket = TokenBucket(rate_per_minute=60, capacity=10)
+    run(bucket.acquire(4))
+
+    # Waits only until the bucket is full again (4s), not for 25 tokens
+    assert run(bucket.acquire(25)) == pytest.approx(4.0)
+    # The 15-token debt (plus the one token) has to be refilled first
+    assert run(bucket.acquire(1)) == pytest.approx(16.0)
+
+
+def test_adjust_takes_and_gives_back_tokens(clock):
+    bucket = TokenBucket(rate_per_minute=60, capacity=10)
+    run(bucket.acquire(10))
+
+    bucket.adjust(-4)   # the request used fewer tokens than estimated
+    assert run(bucket.acquire(4)) == 0.0
+
+    bucket.adjust(-100)   # never above capacity
+    bucket.adjust(5)   # used more than estimated
+    assert run(bucket.acquire(10)) == pytest.approx(5.0)
+
+
+def test_concurrent_acquisitions_are_served_in_turn(clock):
+    bucket = TokenBucket(rate_per_minute=60, capacity=1)
+
+    async def main():
+        return await asyncio.gather(*(bucket.acquire(1) for _ in range(3)))
+
+    assert sorted(run(main())) == pytest.approx([0.0, 1.0, 1.0])
+    assert clock.now == pytest.approx(1002.0)
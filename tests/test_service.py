@@ -0,0 +1,120 @@
+# test_service.py
+# JobQueue: FIFO claims, output_dir conflicts, finish/release and recovery of dead workers
+
+import socket
+
+from orchestration.service import JobQueue, percentile
+
+
+def make_queue(tmp_path):
+    return JobQueue(tmp_path / "jobs.db")
+
+
+def test_claim_returns_oldest_queued_job(tmp_path):
+    queue = make_queue(tmp_path)
+    first = queue.enqueue({"name": "first"}, base_dir=tmp_path)
+    queue.enqueue({"name": "second"}, base_dir=tmp_path)
+
+    job = queue.claim("host:1")
+
+    assert job["id"] == first["id"]
+    assert job["name"] == "first"
+    assert job["output_dir"] == first["output_dir"]
+    assert job["started"] >= job["enqueued"]
+    assert queue.get(first["id"])["status"] == "running"
+    assert queue.counts() == {"running": 1, "queued": 1}
+
+
+def test_claim_on_empty_queue_returns_none(tmp_path):
+    queue = make_queue(tmp_path)
+    assert queue.claim("host:1") is None
+    queue.enqueue({}, base_dir=tmp_path)
+    queue.claim("host:1")
+    assert queue.claim("host:1") is None
+
+
+def test_enqueue_defaults_name_and_output_dir(tmp_path):
+    queue = make_queue(tmp_path)
+    job = queue.enqueue({}, base_dir=tmp_path)
+    assert job["name"] == f"job-{job['id']}"
+    assert job["output_dir"] == str((tmp_path / "output" / job["name"]).resolve())
+
+
+def test_claim_skips_jobs_writing_to_a_busy_directory(tmp_path):
+    queue = make_queue(tmp_path)
+    shared = queue.enqueue({"name": "shared-2", "output_dir": "out/shared/run"}, base_dir=tmp_path)
+    other = queue.enqueue({"name": "other", "output_dir": "out/other"}, base_dir=tmp_path)
+
+    # A running job writes to out/shared, which contains shared-2's directory
+    job = queue.claim("host:1", busy_dirs=[str(tmp_path / "out" / "shared")])
+    assert job["id"] == other["id"]
+
+    # Skipped jobs stay queued and are claimed once their directory is free
+    assert queue.claim("host:1", busy_dirs=[str(tmp_path / "out" / "shared")]) is None
+    assert queue.claim("host:1")["id"] == shared["id"]
+
+
+def test_claim_skips_directories_of_jobs_running_in_another_process(tmp_path):
+    a, b = make_queue(tmp_path), make_queue(tmp_path)
+    first = a.enqueue({"name": "first", "output_dir": "out/shared"}, base_dir=tmp_path)
+    second = a.enqueue({"name": "second", "output_dir": "out/shared"}, base_dir=tmp_path)
+    other = a.enqueue({"name": "other", "output_dir": "out/other"}, base_dir=tmp_path)
+
+    assert a.claim("host:1")["id"] == first["id"]
+    # b knows nothing of a's jobs in memory, but the running row keeps out/shared busy
+    assert b.claim("host:2")["id"] == other["id"]
+    assert b.claim("host:2") is None
+
+    a.finish(first["id"], "done")
+    assert b.claim("host:2")["id"] == second["id"]
+
+
+def test_finish_and_release(tmp_path):
+    queue = make_queue(tmp_path)
+    done = queue.enqueue({"name": "done"}, base_dir=tmp_path)
+    failed = queue.enqueue({"name": "failed"}, base_dir=tmp_path)
+    released = queue.enqueue({"name": "released"}, base_dir=tmp_path)
+    for _ in range(3):
+        queue.claim("host:1")
+
+    queue.finish(done["id"], "done", result={"html": "newsletter.html"})
+    queue.finish(failed["id"], "failed", error="RuntimeError: boom")
+    queue.release(released["id"])
+
+    assert queue.get(done["id"])["result"] == {"html": "newsletter.html"}
+    assert queue.get(failed["id"])["error"] == "RuntimeError: boom"
+    assert queue.get(released["id"])["status"] == "queued"
+    assert queue.claim("host:2")["id"] == released["id"]
+
+
+def test_claims_are_shared_between_queue_instances(tmp_path):
+    # Two service processes on one database never get the same job
+    a, b = make_queue(tmp_path), make_queue(tmp_path)
+    ids = {a.enqueue({}, base_dir=tmp_path)["id"] for _ in range(4)}
+
+    claimed = [q.claim(f"host:{n}")["id"] for n, q in enumerate((a, b, a, b))]
+
+    assert sorted(claimed) == sorted(ids)
+    assert a.claim("host:0") is None
+
+
+def test_recover_requeues_jobs_of_dead_local_workers(tmp_path):
+    queue = make_queue(tmp_path)
+    host = socket.gethostname()
+    dead = queue.enqueue({"name": "dead"}, base_dir=tmp_path)
+    alive = queue.enqueue({"name": "alive"}, base_dir=tmp_path)
+    remote = queue.enqueue({"name": "remote"}, base_dir=tmp_path)
+    queue.claim(f"{host}:999999999")
+    queue.claim(f"{host}:1")   # pid 1 always exists
+    queue.claim("some-other-host:999999999")
+
+    assert queue.recover() == 1
+    assert queue.get(dead["id"])["status"] == "queued"
+    assert queue.get(alive["id"])["status"] == "running"
+    assert queue.get(remote["id"])["status"] == "running"
+
+
+def test_percentile():
+    assert percentile([], 50) is None
+    assert percentile([3.0, 1.0, 2.0], 50) == 2.0
+    assert percentile(range(1, 101), 99) == 99
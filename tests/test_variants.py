@@ -0,0 +1,47 @@
+# test_variants.py
+# Variant jobs and the shared-research vs. independent-runs comparison
+
+from orchestration.variants import DEFAULT_BRIEFS, build_variant_jobs, compare_variant_runs
+
+RESEARCH = {"model_calls": 4, "prompt_tokens": 1000, "completion_tokens": 200, "cost_usd": 0.0, "seconds": 30.0}
+
+
+def batch(*seconds, wall_seconds):
+    return {"jobs": [{"name": f"variant-{i + 1}", "seconds": s} for i, s in enumerate(seconds)],
+            "wall_seconds": wall_seconds}
+
+
+def usage(calls=2, prompt=500, completion=100):
+    return {"model_calls": calls, "prompt_tokens": prompt, "completion_tokens": completion}
+
+
+def test_build_variant_jobs_cycles_briefs_and_templates(tmp_path):
+    jobs = build_variant_jobs(3, tmp_path, templates=["a", "b"])
+    assert [job["name"] for job in jobs] == ["variant-1", "variant-2", "variant-3"]
+    assert [job["template"] for job in jobs] == ["a", "b", "a"]
+    assert [job["brief"] for job in jobs] == DEFAULT_BRIEFS[:3]
+    assert jobs[0]["output_dir"] == str(tmp_path / "variants" / "variant-1")
+
+
+def test_comparison_sums_run_times_on_both_sides():
+    comparison = compare_variant_runs(RESEARCH, batch(10.0, 12.0, 14.0, wall_seconds=15.0),
+                                      {f"variant-{i}": usage() for i in (1, 2, 3)})
+    shared, independent = comparison["shared"], comparison["independent"]
+
+    assert shared["seconds"] == 30.0 + 36.0
+    assert shared["wall_seconds"] == 30.0 + 15.0
+    assert independent["seconds"] == 3 * 30.0 + 36.0
+    assert shared["model_calls"] == 4 + 6
+    assert independent["model_calls"] == 3 * 4 + 6
+    assert shared["tokens"] == 1200 + 1800
+    assert independent["tokens"] == 3 * 1200 + 1800
+    assert comparison["cost_saved_pct"] > 0
+
+
+def test_reused_research_takes_no_time_in_the_shared_run():
+    comparison = compare_variant_runs(RESEARCH, batch(10.0, 12.0, wall_seconds=12.5),
+                                      {"variant-1": usage(), "variant-2": usage()}, research_skipped=True)
+
+    assert comparison["shared"]["seconds"] == 22.0
+    assert comparison["shared"]["wall_seconds"] == 12.5
+    assert comparison["independent"]["seconds"] == 2 * 30.0 + 22.0